@@ -1,13 +1,65 @@
-from flask import Flask, render_template, jsonify, request, send_file
-from services.analysis import Analysis
-import matplotlib.pyplot as plt
+from functools import wraps
+from flask import Flask, Response, render_template, jsonify, request, send_file, make_response
+from config import Config
+from services.analysis import open_analysis
+from services.cache import ResponseCache
+from services.database import pool_stats
+from services.executor import analysis_task, run_concurrently
+from services.price_segments import PriceSegmentProvider
+from services.shards import CITY_NAMES, SchemaOutdatedError, UnknownCityError, outdated_shards, shard_paths, shard_versions
+from services.wordcloud_renderer import WordcloudRenderer
 import io
-import base64
-import sqlite3
-import numpy as np
-from wordcloud import WordCloud
 
 app = Flask(__name__)
+# Migrations write to every shard and can take minutes on a large table, so they
+# run as an explicit step (or from the crawler), never on import
+outdated = outdated_shards()
+if outdated:
+    raise SchemaOutdatedError(
+        "Database schema is not up to date: "
+        + ", ".join(f"{city} ({path})" for city, path in outdated.items())
+        + "; run `python -m services.shards migrate` first"
+    )
+response_cache = ResponseCache()
+price_segments = PriceSegmentProvider()
+if Config.WARM_PRICE_SEGMENTS:
+    price_segments.warm()
+wordclouds = WordcloudRenderer()
+if Config.WORDCLOUD_PRERENDER:
+    wordclouds.watch()
+
+def cached_api(view):
+    """Serve a JSON view from response_cache, keyed by path and query args.
+
+    The cache is dropped whenever any city shard's data version moves, and every
+    response carries a strong ETag so revalidating clients get a 304.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.RESPONSE_CACHE_ENABLED:
+            return view(*args, **kwargs)
+        key = (request.path, tuple(sorted((k, v) for k, v in request.args.items(multi=True) if v != "")))
+        version = shard_versions()
+        entry = response_cache.get(key, version)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = response_cache.set(key, version, response.get_data(), response.mimetype)
+
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    return wrapper
+
+@app.errorhandler(UnknownCityError)
+def unknown_city(error):
+    return jsonify({"error": f"Không có dữ liệu cho thành phố {error.args[0]}"}), 404
+
+def request_city():
+    """?city=<slug> selects one city's shard, ?city=all queries every shard; default is Config.DEFAULT_CITY."""
+    return request.args.get('city') or None
 
 @app.route('/')
 def index():
@@ -25,20 +77,44 @@ def apartment_area():
 def map():
     return render_template('map.html')
 
+def trim_location(location, city=None):
+    """"Quận Hải Châu, Đà Nẵng" -> "Hải Châu"; across all cities the city is kept so districts stay apart."""
+    location = location.replace("Quận ", "")
+    if city != "all":
+        location = location.replace(f", {CITY_NAMES.get(city or Config.DEFAULT_CITY, '')}", "")
+    return location
+
+def format_demand(rows, city=None):
+    return [{"district": trim_location(row[0], city), "count": row[1]} for row in rows]
+
+def format_price_series(rows):
+    return [{"year_month": row[0], "avg_price": row[1]} for row in rows]
+
+def format_area(rows, city=None):
+    result = {}
+    for location, area_group, count in rows:
+        trimmed_location = trim_location(location, city)
+        if trimmed_location not in result:
+            result[trimmed_location] = {}
+        result[trimmed_location][area_group] = count
+    return result
+
 # Q1
 @app.route('/api/apartment-demand')
+@cached_api
 def api_apartment_demand():
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
+    city = request_city()
 
-    analysis = Analysis()
-    data_sale = analysis.get_apartment_demand(is_selling=1, year=year, month=month)
-    data_rent = analysis.get_apartment_demand(is_selling=0, year=year, month=month)
-    analysis.close()
+    data_sale, data_rent = run_concurrently(
+        analysis_task("get_apartment_demand", is_selling=1, year=year, month=month, city=city),
+        analysis_task("get_apartment_demand", is_selling=0, year=year, month=month, city=city),
+    )
 
     return jsonify({
-        "sale": [{"district": (row[0]).replace("Quận ", "").replace(", Đà Nẵng", ""), "count": row[1]} for row in data_sale],
-        "rent": [{"district": (row[0]).replace("Quận ", "").replace(", Đà Nẵng", ""), "count": row[1]} for row in data_rent]
+        "sale": format_demand(data_sale, city),
+        "rent": format_demand(data_rent, city)
     })
 
 @app.route('/apartment-price-per-sqm')
@@ -47,205 +123,168 @@ def apartment_price_per_sqm():
 
 # Q2
 @app.route('/api/average-sale-price-per-sqm')
+@cached_api
 def api_apartment_sale_price_per_sqm():
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
     district = request.args.get('district')
     if district == "Tất cả Quận": district = None
 
-    analysis = Analysis()
-    data_sale = analysis.get_avg_price_data(is_selling=1, year=year, month=month, district=district)
-    analysis.close()
+    with open_analysis(request_city()) as analysis:
+        data_sale = analysis.get_avg_price_data(is_selling=1, year=year, month=month, district=district)
 
     return jsonify({
-        "average_price_data_sale": [
-            {"year_month": row[0], "avg_price": row[1]} for row in data_sale
-        ]
+        "average_price_data_sale": format_price_series(data_sale)
     })
 
 @app.route('/api/average-rent-price-per-sqm')
+@cached_api
 def api_apartment_rent_price_per_sqm():
     year = request.args.get('year', type=int)
     month = request.args.get('month', type=int)
     district = request.args.get('district')
     if district == "Tất cả Quận": district = None
 
-    analysis = Analysis()
-    data_rent = analysis.get_avg_price_data(is_selling=0, year=year, month=month, district=district)
-    analysis.close()
+    with open_analysis(request_city()) as analysis:
+        data_rent = analysis.get_avg_price_data(is_selling=0, year=year, month=month, district=district)
 
     return jsonify({
-        "average_price_data_rent": [
-            {"year_month": row[0], "avg_price": row[1]} for row in data_rent
-        ]
+        "average_price_data_rent": format_price_series(data_rent)
     })
 
 @app.route('/api/apartment-area-selling')
+@cached_api
 def api_apartment_area_selling():
-    analysis = Analysis()
-    data = analysis.get_apartment_area_selling()
-    analysis.close()
-
-    result = {}
-    for location, area_group, count in data:
-        trimmed_location = location.replace("Quận ", "").replace(", Đà Nẵng", "")
-        if trimmed_location not in result:
-            result[trimmed_location] = {}
-        result[trimmed_location][area_group] = count
+    with open_analysis(request_city()) as analysis:
+        data = analysis.get_apartment_area_selling()
 
-    return jsonify(result)
+    return jsonify(format_area(data, request_city()))
 
 @app.route('/api/apartment-area-renting')
+@cached_api
 def api_apartment_area_renting():
-    analysis = Analysis()
-    data = analysis.get_apartment_area_renting()
-    analysis.close()
+    with open_analysis(request_city()) as analysis:
+        data = analysis.get_apartment_area_renting()
 
-    result = {}
-    for location, area_group, count in data:
-        trimmed_location = location.replace("Quận ", "").replace(", Đà Nẵng", "")
-        if trimmed_location not in result:
-            result[trimmed_location] = {}
-        result[trimmed_location][area_group] = count
+    return jsonify(format_area(data, request_city()))
+
+# Q1 + Q2 + area buckets for sale and rent in one response
+@app.route('/api/dashboard')
+@cached_api
+def api_dashboard():
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    district = request.args.get('district')
+    if district == "Tất cả Quận": district = None
+
+    with open_analysis(request_city()) as analysis:
+        snapshot = analysis.get_dashboard_snapshot(year=year, month=month, district=district)
 
-    return jsonify(result)
+    city = request_city()
+    return jsonify({
+        "demand": {
+            "sale": format_demand(snapshot["demand"][1], city),
+            "rent": format_demand(snapshot["demand"][0], city)
+        },
+        "area": {
+            "selling": format_area(snapshot["area"][1], city),
+            "renting": format_area(snapshot["area"][0], city)
+        },
+        "price_per_sqm": {
+            "sale": format_price_series(snapshot["price_per_sqm"][1]),
+            "rent": format_price_series(snapshot["price_per_sqm"][0])
+        },
+        "districts": snapshot["districts"]
+    })
 
 @app.route('/api/apartment_demand_wordcloud')
 def api_apartment_demand_wordcloud():
     is_selling = request.args.get('is_selling', type=int)
-    analysis = Analysis()
-    data = analysis.get_apartment_demand(is_selling=is_selling)
-    analysis.close()
-
-    district_counts = {(row[0]).replace("Quận ", "").replace(", Đà Nẵng", ""): row[1] for row in data}
-
-    wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(district_counts)
-
-    img_io = io.BytesIO()
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation="bilinear")
-    plt.axis("off")
-    plt.savefig(img_io, format="PNG", bbox_inches="tight")
-    img_io.seek(0)
-
-    return send_file(img_io, mimetype="image/png")
-
-def get_data_from_db():
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
-    query = """
-        SELECT id, title, price, location, is_selling FROM danang_batdongsan
-    """
-    cursor.execute(query)
-    data = cursor.fetchall()
-    conn.close()
-    return data
-
-def categorize_price(price, is_selling):
-    if is_selling:
-        if price < 3e9:
-            return "1-3 tỷ"
-        elif price < 5e9:
-            return "3-5 tỷ"
-        elif price < 10e9:
-            return "5-10 tỷ"
-        else:
-            return ">10 tỷ"
-    else:
-        if price < 5e6:
-            return "Dưới 5 triệu"
-        elif price < 10e6:
-            return "5-10 triệu"
-        elif price < 20e6:
-            return "10-20 triệu"
-        else:
-            return ">20 triệu"
-
-def count_listings_by_price_and_location(data, is_selling):
-    locations = [
-        "Quận Sơn Trà, Đà Nẵng",
-        "Quận Ngũ Hành Sơn, Đà Nẵng",
-        "Quận Hải Châu, Đà Nẵng",
-        "Quận Liên Chiểu, Đà Nẵng",
-        "Quận Thanh Khê, Đà Nẵng"
-    ]
-    if is_selling:
-        price_categories = ["1-3 tỷ", "3-5 tỷ", "5-10 tỷ", ">10 tỷ"]
-    else:
-        price_categories = ["Dưới 5 triệu", "5-10 triệu", "10-20 triệu", ">20 triệu"]
-
-    stats = {loc: {cat: 0 for cat in price_categories} for loc in locations}
-
-    for _, _, price, location, selling in data:
-        if location in locations and selling == is_selling:
-            category = categorize_price(price, is_selling)
-            stats[location][category] += 1
-
-    return stats
-
-def analyze_data(data):
-    selling_stats = count_listings_by_price_and_location(data, is_selling=1)
-    renting_stats = count_listings_by_price_and_location(data, is_selling=0)
-    return selling_stats, renting_stats
-
-def plot_data(stats):
-    plt.figure(figsize=(10, 6))
-    price_categories = list(next(iter(stats.values())).keys())
-
-    for location, values in stats.items():
-        y_values = [values[cat] for cat in price_categories]
-        plt.plot(price_categories, y_values, marker='o', label=location)
-
-    plt.xlabel("Mức giá")
-    plt.ylabel("Số lượng tin")
-    plt.title("Phân bố số lượng tin rao bán/cho thuê theo mức giá và khu vực")
-    plt.legend()
-    plt.grid()
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    encoded_img = base64.b64encode(img.getvalue()).decode('utf8')
-    plt.close()
-    return encoded_img
-
-data = get_data_from_db()
-selling_stats, renting_stats = analyze_data(data)
-selling_plot = plot_data(selling_stats)
-renting_plot = plot_data(renting_stats)
+    etag, png = wordclouds.get(is_selling)
+    return send_file(io.BytesIO(png), mimetype="image/png", etag=etag)
 
 @app.route('/index3')
 def index3():
-    return render_template('index3.html',
-                           selling_stats=selling_stats,
-                           renting_stats=renting_stats,
-                           selling_plot=selling_plot,
-                           renting_plot=renting_plot)
+    return render_template('index3.html', **price_segments.get())
 
 @app.route('/api/available-districts')
+@cached_api
 def api_available_districts():
-    analysis = Analysis()
-    districts = [row[0] for row in analysis.api_available_districts()]
-    analysis.close()
+    with open_analysis(request_city()) as analysis:
+        districts = [row[0] for row in analysis.api_available_districts()]
 
     return jsonify({"districts": districts})
 
 #Q5
 @app.route('/api/apartment-map')
+@cached_api
 def api_apartment_map():
-    analysis = Analysis()
-    data = analysis.get_apartment_locations(is_selling=1)
-    analysis.close()
-
-    return jsonify([
-        {
-            "latitude": float(row[4].split(",")[0]),
-            "longitude": float(row[4].split(",")[1]),
-            "price": row[0],
-            "area": row[1]
-        }
-        for row in data
-    ])
+    is_selling = request.args.get('is_selling', default=1, type=int)
+    zoom = request.args.get('zoom', default=12, type=int)
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    district = request.args.get('district')
+    if district == "Tất cả Quận": district = None
+
+    bbox = request.args.get('bbox')
+    if bbox:
+        try:
+            south, west, north, east = (float(value) for value in bbox.split(","))
+        except ValueError:
+            return jsonify({"error": "bbox phải có dạng south,west,north,east"}), 400
+        bbox = (south, west, north, east)
+    else:
+        bbox = (-90.0, -180.0, 90.0, 180.0)
+
+    filters = {"min_price": min_price, "max_price": max_price, "district": district}
+    with open_analysis(request_city()) as analysis:
+        if zoom >= Config.MAP_CLUSTER_MAX_ZOOM and analysis.count_apartments_in_bbox(is_selling, bbox, **filters) <= Config.MAP_MAX_POINTS:
+            points = analysis.get_apartments_in_bbox(is_selling, bbox, **filters)
+            clusters = None
+        else:
+            # Web Mercator tiles are 256px wide and span 360 / 2**zoom degrees of longitude
+            cell_size = Config.MAP_CLUSTER_CELL_PX * 360.0 / (256 * 2 ** min(max(zoom, 0), 22))
+            clusters = analysis.get_apartment_clusters(is_selling, bbox, cell_size, **filters)
+
+    if clusters is None:
+        return jsonify({
+            "mode": "points",
+            "items": [
+                {"latitude": lat, "longitude": lng, "price": price, "area": area}
+                for lat, lng, price, area in points
+            ]
+        })
+
+    return jsonify({
+        "mode": "clusters",
+        "items": [
+            {
+                "latitude": lat,
+                "longitude": lng,
+                "count": count,
+                "avg_price": avg_price,
+                "min_price": min_p,
+                "max_price": max_p,
+                "avg_area": avg_area
+            }
+            for lat, lng, count, avg_price, min_p, max_p, avg_area in clusters
+        ]
+    })
+
+@app.route('/api/cities')
+@cached_api
+def api_cities():
+    return jsonify({
+        "default": Config.DEFAULT_CITY,
+        "cities": [{"slug": city, "name": CITY_NAMES.get(city, city)} for city in shard_paths()]
+    })
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    return jsonify({
+        "response_cache": response_cache.stats(),
+        "connection_pools": pool_stats(),
+    })
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+normalize_address_fields: once per distinct value/tuple vs. the row-wise version of a baseline revision.
+
+Both versions normalize the same frame (data.db, then a scaled synthetic
+copy, each loaded and put through step 2 by the working-tree cleaner) and
+must produce equal frames: same values, NA positions, dtypes and
+categories. The median time of ``--repeat`` runs is reported with the
+number of distinct values the new version actually normalizes.
+
+    python -m benchmarks.address_normalization --scale 20
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.cleaning_chunked import CLEANER_DIR
+from benchmarks.synthetic_data import generate
+from config import Config
+
+sys.path.insert(0, CLEANER_DIR)
+from data_cleaning_preprocessing import DanangRealEstateCleaner  # noqa: E402
+
+
+def baseline_class(rev, directory):
+    """DanangRealEstateCleaner as of ``rev``, imported under another module name."""
+    path = os.path.join(directory, "baseline_cleaning.py")
+    source = subprocess.run(["git", "show", f"{rev}:data_preprocessing_visualization/data_cleaning_preprocessing.py"],
+                            cwd=CLEANER_DIR, capture_output=True, check=True).stdout
+    with open(path, "wb") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("baseline_cleaning", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DanangRealEstateCleaner
+
+
+def prepared_frame(db_name):
+    cleaner = DanangRealEstateCleaner(db_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaner.load_data()
+        cleaner.handle_missing_invalid_data()
+    return cleaner.df
+
+
+def normalize(cls, frame, repeat):
+    """Median seconds of normalize_address_fields on copies of ``frame``, and the last result."""
+    samples = []
+    for _ in range(repeat):
+        cleaner = cls(None)
+        cleaner.df = frame.copy(deep=True)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cleaner.normalize_address_fields()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), cleaner.df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="copies of data.db in the synthetic table")
+    parser.add_argument("--baseline-rev", default="1c4c832", help="git revision with the row-wise normalization")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="address_normalization_") as workdir:
+        baseline = baseline_class(args.baseline_rev, workdir)
+        scaled_db = os.path.join(workdir, "scaled.db")
+        generate(args.scale, scaled_db, apply_migrations=False)
+
+        print(f"Baseline {args.baseline_rev} vs. working tree; median of {args.repeat}")
+        print("| Table | Rows | Distinct location / street / (ward, district, city) | Baseline ms | Factorized ms | Speed-up | Equal |")
+        print("|---|---:|---|---:|---:|---:|---|")
+        for name, db_name in (("data.db", Config.DB_NAME), (f"data.db x{args.scale}", scaled_db)):
+            frame = prepared_frame(db_name)
+            distinct = [frame[col].nunique(dropna=False) for col in ("location", "street")]
+            distinct.append(len(frame[["ward", "district", "city"]].drop_duplicates()))
+            baseline_s, expected = normalize(baseline, frame, args.repeat)
+            factorized_s, actual = normalize(DanangRealEstateCleaner, frame, args.repeat)
+            try:
+                pd.testing.assert_frame_equal(actual, expected)
+                equal = True
+            except AssertionError as error:
+                print(error)
+                equal = False
+            print(f"| {name} | {len(frame):,} | {' / '.join(f'{count:,}' for count in distinct)} | "
+                  f"{baseline_s * 1000:.0f} | {factorized_s * 1000:.0f} | {baseline_s / factorized_s:.1f}x | "
+                  f"{'yes' if equal else 'NO'} |")
+            if not equal:
+                raise SystemExit(f"Factorized normalize_address_fields differs from {args.baseline_rev} on {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Endpoint and query benchmark suite against scaled synthetic data.
+
+For each scale a synthetic copy of danang_batdongsan is generated
+(benchmarks/synthetic_data.py); a fresh interpreter then imports app.py against
+it, drives every /api/* route through the Flask test client at each requested
+concurrency and records latency percentiles, throughput and how far the RSS
+peaked above its starting point during that run (the kernel's high-water mark
+is reset before each one; Linux only), plus the EXPLAIN QUERY PLAN and timing
+of every Analysis query; the peak RSS of the whole run is kept per scale. Results are written as JSON so two runs can be diffed with --compare.
+
+    python -m benchmarks.api_suite --scales 10 100 --concurrency 1 8 --output benchmarks/results/api_suite.json
+    python -m benchmarks.api_suite --compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.synthetic_data import generate
+
+# Query strings used for routes that take arguments; other /api/* routes get none.
+ROUTE_ARGS = {
+    "/api/apartment-demand": "year=2025&month=8",
+    "/api/average-sale-price-per-sqm": "year=2025&district=Quận Hải Châu",
+    "/api/average-rent-price-per-sqm": "year=2025",
+    "/api/apartment-map": "bbox=15.9,108.0,16.2,108.4&zoom=12",
+    "/api/apartment_demand_wordcloud": "is_selling=1",
+    "/api/dashboard": "year=2025",
+}
+
+ANALYSIS_CALLS = [
+    ("get_apartment_demand", (1,), {}),
+    ("get_apartment_demand", (0, 2025, 8), {}),
+    ("get_avg_price_data", (1,), {}),
+    ("get_avg_price_data", (0, 2025), {"district": "Quận Hải Châu"}),
+    ("get_apartment_area_selling", (), {}),
+    ("get_apartment_area_renting", (), {}),
+    ("api_available_districts", (), {}),
+    ("get_apartment_locations", (1,), {}),
+    ("count_apartments_in_bbox", (1, (15.9, 108.0, 16.2, 108.4)), {}),
+    ("get_apartments_in_bbox", (1, (16.05, 108.2, 16.06, 108.21)), {}),
+    ("get_apartment_clusters", (1, (15.9, 108.0, 16.2, 108.4), 0.02), {}),
+    ("get_dashboard_snapshot", (), {"year": 2025}),
+]
+
+
+def _proc_status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise OSError(f"{field} missing from /proc/self/status")
+
+
+def reset_peak_rss():
+    """Restart the RSS high-water mark at the current RSS and return it; None where that is not possible (not Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status_mb("VmRSS")
+    except OSError:
+        return None
+
+
+def peak_rss_mb():
+    """RSS high-water mark since the last reset_peak_rss() (since start where it cannot be reset)."""
+    try:
+        return _proc_status_mb("VmHWM")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def drive_route(app, url, requests, concurrency):
+    rss_before = reset_peak_rss()
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = app.test_client()
+        local = []
+        for _ in iter(lambda: next(counter, None), None):
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                with lock:
+                    errors.append(response.status_code)
+            local.append(elapsed * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        # Memory this route added at its peak, whatever earlier routes left resident
+        "peak_rss_added_mb": round(peak_rss_mb() - rss_before, 1) if rss_before is not None else None,
+    }
+
+
+def profile_queries(db_name, repeat):
+    from services.analysis import Analysis
+
+    explain = sqlite3.connect(db_name)
+    results = {}
+    for method, args, kwargs in ANALYSIS_CALLS:
+        name = f"{method}{args}{kwargs or ''}"
+        analysis = Analysis(db_name)
+        statements = []
+        analysis.db.conn.set_trace_callback(statements.append)
+        getattr(analysis, method)(*args, **kwargs)
+        analysis.db.conn.set_trace_callback(None)
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            getattr(analysis, method)(*args, **kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+        analysis.close()
+
+        plans = []
+        for sql in statements:
+            if sql.lstrip().upper().startswith("SELECT"):
+                plans.append([row[3] for row in explain.execute("EXPLAIN QUERY PLAN " + sql)])
+        results[name] = {"median_ms": round(statistics.median(samples), 3), "plans": plans}
+    explain.close()
+    return results
+
+
+def run_worker(db_name, requests, concurrency_levels, repeat):
+    """Runs inside a fresh interpreter whose DB_NAME points at the synthetic copy."""
+    start = time.perf_counter()
+    from app import app
+    import_s = time.perf_counter() - start
+
+    routes = sorted(rule.rule for rule in app.url_map.iter_rules() if rule.rule.startswith("/api/"))
+    report = {"import_s": round(import_s, 3), "routes": {}, "queries": profile_queries(db_name, repeat)}
+    # The routes reset the high-water mark, so the whole run's peak is the largest one seen
+    peak = peak_rss_mb()
+    for route in routes:
+        url = f"{route}?{ROUTE_ARGS[route]}" if route in ROUTE_ARGS else route
+        app.test_client().get(url)  # first hit builds lazy state (word clouds, connections)
+        peak = max(peak, peak_rss_mb())
+        report["routes"][url] = {}
+        for concurrency in concurrency_levels:
+            report["routes"][url][str(concurrency)] = drive_route(app, url, requests, concurrency)
+            peak = max(peak, peak_rss_mb())
+    report["peak_rss_mb"] = round(peak, 1)
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scales, requests, concurrency_levels, repeat, with_cache, workdir):
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpu_count": os.cpu_count(),
+        "response_cache": with_cache,
+        "scales": [],
+    }
+    for scale in scales:
+        db_name = os.path.join(workdir, f"danang_x{scale}.db")
+        dataset = generate(scale, db_name)
+        env = dict(
+            os.environ, DB_NAME=db_name, WARM_PRICE_SEGMENTS="0", WORDCLOUD_PRERENDER="0",
+            WORDCLOUD_CACHE_DIR=os.path.join(workdir, f"wordcloud_x{scale}"),
+            RESPONSE_CACHE_ENABLED="1" if with_cache else "0", MPLBACKEND="Agg",
+        )
+        command = [sys.executable, "-m", "benchmarks.api_suite", "--worker", db_name,
+                   "--requests", str(requests), "--repeat", str(repeat),
+                   "--concurrency", *map(str, concurrency_levels)]
+        out = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        dataset.update(json.loads(out.stdout.strip().splitlines()[-1]))
+        results["scales"].append(dataset)
+        print(f"x{scale}: {dataset['rows']:,} rows, peak RSS {dataset['peak_rss_mb']} MB", file=sys.stderr)
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    old_scales = {entry["scale"]: entry for entry in old["scales"]}
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    print("| Scale | Route | Concurrency | p95 before (ms) | p95 after (ms) | Change | Peak RSS added before (MB) | Peak RSS added after (MB) |")
+    print("|---:|---|---:|---:|---:|---:|---:|---:|")
+    for entry in new["scales"]:
+        before = old_scales.get(entry["scale"])
+        if before is None:
+            continue
+        for url, levels in entry["routes"].items():
+            for concurrency, stats in levels.items():
+                previous = before["routes"].get(url, {}).get(concurrency)
+                if previous is None or not previous["p95_ms"]:
+                    continue
+                change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+                print(f"| x{entry['scale']} | `{url}` | {concurrency} | {previous['p95_ms']:.2f} | "
+                      f"{stats['p95_ms']:.2f} | {change:+.0f}% | {previous.get('peak_rss_added_mb', '-')} | "
+                      f"{stats.get('peak_rss_added_mb', '-')} |")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per Analysis query")
+    parser.add_argument("--with-cache", action="store_true", help="keep the /api response cache enabled")
+    parser.add_argument("--workdir", help="directory for the synthetic databases (default: a temp dir)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two JSON reports")
+    parser.add_argument("--worker", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.requests, args.concurrency, args.repeat), ensure_ascii=False))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="api_suite_")
+    os.makedirs(workdir, exist_ok=True)
+    results = run_suite(args.scales, args.requests, args.concurrency, args.repeat, args.with_cache, workdir)
+    report = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
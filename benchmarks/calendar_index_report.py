@@ -0,0 +1,142 @@
+"""
+Before/after report for the typed calendar columns (posted_year/posted_month).
+
+Builds a scaled copy of danang_batdongsan, times the old substr(posted_time, ...)
+queries on the un-migrated table, applies services.schema.migrate() and times
+the rewritten Analysis queries on the same rows.
+
+    python -m benchmarks.calendar_index_report --scale 100 --output benchmarks/results/calendar_indexes.md
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from config import Config
+from services.analysis import Analysis
+from services.schema import migrate
+
+OLD_DEMAND = """
+    SELECT location, COUNT(*) as num_listings
+    FROM danang_batdongsan
+    WHERE is_selling = ? AND substr(posted_time, 7, 4) = ? AND substr(posted_time, 4, 2) = ?
+    GROUP BY location ORDER BY num_listings DESC;
+"""
+OLD_AVG_PRICE = """
+    SELECT substr(posted_time, 4, 7) AS month_year, AVG(price / area) AS avg_price_per_sqm
+    FROM danang_batdongsan
+    WHERE is_selling = ? AND area > 0 AND district = ? AND substr(posted_time, 7, 4) = ?
+    GROUP BY month_year ORDER BY month_year DESC;
+"""
+NEW_DEMAND = """
+    SELECT location, COUNT(*) as num_listings
+    FROM danang_batdongsan
+    WHERE is_selling = ? AND posted_year = ? AND posted_month = ?
+    GROUP BY location ORDER BY num_listings DESC;
+"""
+NEW_AVG_PRICE = """
+    SELECT printf('%02d-%04d', posted_month, posted_year) AS month_year, AVG(price / area) AS avg_price_per_sqm
+    FROM danang_batdongsan
+    WHERE is_selling = ? AND area > 0 AND district = ? AND posted_year = ?
+    GROUP BY posted_year, posted_month ORDER BY month_year DESC;
+"""
+
+
+def build_scaled_copy(source, target, scale):
+    shutil.copyfile(source, target)
+    conn = sqlite3.connect(target)
+    columns = "title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates"
+    with conn:
+        conn.execute("CREATE TEMP TABLE seed AS SELECT " + columns + " FROM danang_batdongsan")
+        for _ in range(scale - 1):
+            conn.execute(f"INSERT INTO danang_batdongsan ({columns}) SELECT {columns} FROM seed")
+    rows = conn.execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+    conn.close()
+    return rows
+
+
+def time_query(conn, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def run(scale, repeat, source=Config.DB_NAME):
+    workdir = tempfile.mkdtemp(prefix="calendar_bench_")
+    db_path = os.path.join(workdir, "scaled.db")
+    try:
+        rows = build_scaled_copy(source, db_path, scale)
+        cases = [
+            ("get_apartment_demand(is_selling=1, year=2025, month=8)", OLD_DEMAND, NEW_DEMAND,
+             (1, "2025", "08"), (1, 2025, 8)),
+            ("get_avg_price_data(is_selling=1, year=2025, district='Quận Hải Châu')", OLD_AVG_PRICE, NEW_AVG_PRICE,
+             (1, "Quận Hải Châu", "2025"), (1, "Quận Hải Châu", 2025)),
+        ]
+
+        conn = sqlite3.connect(db_path)
+        before = [(query_plan(conn, old, old_params), time_query(conn, old, old_params, repeat))
+                  for _, old, _, old_params, _ in cases]
+        conn.close()
+
+        start = time.perf_counter()
+        migrate(db_path)
+        migrate_seconds = time.perf_counter() - start
+
+        conn = sqlite3.connect(db_path)
+        after = [(query_plan(conn, new, new_params), time_query(conn, new, new_params, repeat))
+                 for _, _, new, _, new_params in cases]
+        conn.close()
+
+        # The rewritten Analysis methods must return what the old SQL returned.
+        analysis = Analysis(db_path)
+        old_conn = sqlite3.connect(db_path)
+        assert sorted(analysis.get_apartment_demand(1, 2025, 8)) == sorted(old_conn.execute(OLD_DEMAND, cases[0][3]).fetchall())
+        analysis.close()
+        old_conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    lines = [
+        "# Calendar columns: before/after",
+        "",
+        f"Rows in danang_batdongsan: {rows:,} (data.db x{scale}); median of {repeat} runs.",
+        f"Migration (add columns, backfill, indexes, ANALYZE): {migrate_seconds:.2f}s",
+        "",
+        "| Query | Before (ms) | After (ms) | Speed-up |",
+        "|---|---:|---:|---:|",
+    ]
+    for (name, *_), (_, old_ms), (_, new_ms) in zip(cases, before, after):
+        lines.append(f"| `{name}` | {old_ms:.2f} | {new_ms:.2f} | {old_ms / new_ms:.1f}x |")
+    for (name, *_), (old_plan, _), (new_plan, _) in zip(cases, before, after):
+        lines += ["", f"## `{name}`", "", "Before:", "```"] + old_plan + ["```", "After:", "```"] + new_plan + ["```"]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report = run(args.scale, args.repeat)
+    print(report)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
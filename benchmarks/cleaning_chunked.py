@@ -0,0 +1,114 @@
+"""
+Peak memory and time of DanangRealEstateCleaner in memory vs. chunk by chunk.
+
+A scaled synthetic copy of danang_batdongsan (without the migration
+columns, like a crawler database) gets a copy number appended to the
+titles of all but every fifth copy, so most copies survive deduplication
+and the rest are removed as title+street+posted_time duplicates. Each run
+cleans it in a fresh interpreter and reports the peak RSS (VmHWM) and wall
+time; every chunked run must write a byte-identical CSV and the same
+SQLite table as the in-memory run. Needs the pandas pinned in
+requirements.txt (the cleaner predates pandas 3's string dtype).
+
+    python -m benchmarks.cleaning_chunked --scale 20 --chunk-sizes 20000 100000
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic_data import generate
+
+CLEANER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_preprocessing_visualization")
+
+CHILD = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, sys.argv[1])
+from data_cleaning_preprocessing import DanangRealEstateCleaner
+
+def high_water_kb():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+
+db_name, output, chunk_size, store, work_dir = sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5], sys.argv[6]
+before = high_water_kb()
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    cleaner = DanangRealEstateCleaner(db_name)
+    if chunk_size:
+        cleaner.run_chunked_cleaning(chunk_size, store, output, work_dir)
+    else:
+        cleaner.run_complete_cleaning(output)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "peak_mb": (high_water_kb() - before) / 1024}))
+"""
+
+
+def distinct_copies(db_name, base_rows):
+    """Make copies distinct listings again, except every fifth copy, which stays a repost."""
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.execute("""
+            UPDATE danang_batdongsan SET title = title || ' #' || ((id - 1) / ?)
+            WHERE id > ? AND ((id - 1) / ?) % 5 != 0
+        """, (base_rows, base_rows, base_rows))
+        rows = conn.execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+    conn.close()
+    return rows
+
+
+def run(db_name, output, chunk_size, store, work_dir):
+    out = subprocess.run([sys.executable, "-c", CHILD, CLEANER_DIR, db_name, output, str(chunk_size), store, work_dir],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def table_rows(path):
+    conn = sqlite3.connect(path)
+    schema = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'cleaned_danang_batdongsan'").fetchone()
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(cleaned_danang_batdongsan)")]
+    typed = ", ".join(f'"{col}", typeof("{col}")' for col in columns)
+    rows = conn.execute(f"SELECT {typed} FROM cleaned_danang_batdongsan").fetchall()
+    conn.close()
+    return schema, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="copies of data.db in the synthetic table")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dedup-stores", nargs="+", choices=["memory", "disk"], default=["memory", "disk"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cleaning_chunked_") as workdir:
+        db_name = os.path.join(workdir, "scaled.db")
+        base_rows = generate(1, db_name, apply_migrations=False)["rows"]
+        generate(args.scale, db_name, apply_migrations=False)
+        rows = distinct_copies(db_name, base_rows)
+
+        expected_csv = os.path.join(workdir, "in_memory.csv")
+        baseline = run(db_name, expected_csv, 0, "memory", workdir)
+        expected_table = table_rows(expected_csv.replace(".csv", ".db"))
+        print(f"{rows:,} source rows -> {len(expected_table[1]):,} cleaned; {os.cpu_count()} CPU(s)")
+        print("| Mode | Peak RSS added MB | Seconds | Same CSV | Same table |")
+        print("|---|---:|---:|---|---|")
+        print(f"| in memory | {baseline['peak_mb']:.0f} | {baseline['seconds']:.1f} | - | - |")
+        for chunk_size in args.chunk_sizes:
+            for store in args.dedup_stores:
+                output = os.path.join(workdir, f"chunked_{chunk_size}_{store}.csv")
+                result = run(db_name, output, chunk_size, store, workdir)
+                same_csv = filecmp.cmp(expected_csv, output, shallow=False)
+                same_table = table_rows(output.replace(".csv", ".db")) == expected_table
+                print(f"| chunks of {chunk_size:,}, {store} dedup | {result['peak_mb']:.0f} | {result['seconds']:.1f} | "
+                      f"{'yes' if same_csv else 'NO'} | {'yes' if same_table else 'NO'} |")
+                if not (same_csv and same_table):
+                    raise SystemExit(f"Chunked cleaning ({chunk_size}, {store}) differs from the in-memory run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Per-step time and per-column memory of DanangRealEstateCleaner: typed columns vs. a baseline revision.
+
+The baseline (by default the revision that still stored "N/A" strings in
+latitude/longitude, posted_time and posted_year/month/day and kept the
+address columns as object) is read from git into a temporary directory.
+Both versions clean the same scaled synthetic copy of danang_batdongsan in
+a fresh interpreter; the time of every step, the memory of every column of
+the cleaned frame (deep, so string contents count) and the peak RSS are
+compared, and both must write a byte-identical CSV and the same SQLite
+table. The baseline needs the pandas pinned in requirements.txt.
+
+    python -m benchmarks.cleaning_dtypes --scale 20
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.cleaning_chunked import CLEANER_DIR, distinct_copies, table_rows
+from benchmarks.synthetic_data import generate
+
+STEPS = ["load_data", "handle_missing_invalid_data", "normalize_address_fields", "remove_duplicates",
+         "handle_outliers_and_transformations", "save_cleaned_data"]
+
+CHILD = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, sys.argv[1])
+from data_cleaning_preprocessing import DanangRealEstateCleaner
+
+def high_water_kb():
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+
+db_name, output, steps = sys.argv[2], sys.argv[3], sys.argv[4].split(",")
+cleaner = DanangRealEstateCleaner(db_name)
+before = high_water_kb()
+seconds = {}
+with contextlib.redirect_stdout(io.StringIO()):
+    for step in steps:
+        started = time.perf_counter()
+        if step == "save_cleaned_data":
+            memory = cleaner.df.memory_usage(index=False, deep=True)
+            dtypes = cleaner.df.dtypes.astype(str)
+            getattr(cleaner, step)(output)
+        else:
+            getattr(cleaner, step)()
+        seconds[step] = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "peak_mb": (high_water_kb() - before) / 1024,
+                  "memory_mb": {col: int(size) / 1024 / 1024 for col, size in memory.items()},
+                  "dtypes": dtypes.to_dict()}))
+"""
+
+
+def checkout(rev, directory):
+    """The cleaner (and its helper module, if the revision has one) as of ``rev``."""
+    os.makedirs(directory)
+    for name in ("data_cleaning_preprocessing.py", "cleaning_sketches.py"):
+        out = subprocess.run(["git", "show", f"{rev}:data_preprocessing_visualization/{name}"],
+                             cwd=CLEANER_DIR, capture_output=True)
+        if out.returncode == 0:
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(out.stdout)
+    return directory
+
+
+def run(cleaner_dir, db_name, output):
+    out = subprocess.run([sys.executable, "-c", CHILD, cleaner_dir, db_name, output, ",".join(STEPS)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="copies of data.db in the synthetic table")
+    parser.add_argument("--baseline-rev", default="8381dc7", help="git revision of the cleaner to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cleaning_dtypes_") as workdir:
+        db_name = os.path.join(workdir, "scaled.db")
+        base_rows = generate(1, db_name, apply_migrations=False)["rows"]
+        generate(args.scale, db_name, apply_migrations=False)
+        rows = distinct_copies(db_name, base_rows)
+
+        baseline_csv, typed_csv = os.path.join(workdir, "baseline.csv"), os.path.join(workdir, "typed.csv")
+        baseline = run(checkout(args.baseline_rev, os.path.join(workdir, "baseline")), db_name, baseline_csv)
+        typed = run(CLEANER_DIR, db_name, typed_csv)
+        same_csv = filecmp.cmp(baseline_csv, typed_csv, shallow=False)
+        same_table = table_rows(baseline_csv.replace(".csv", ".db")) == table_rows(typed_csv.replace(".csv", ".db"))
+
+        print(f"{rows:,} source rows; baseline {args.baseline_rev} vs. working tree; {os.cpu_count()} CPU(s)")
+        print("| Step | Baseline s | Typed s |")
+        print("|---|---:|---:|")
+        for step in STEPS:
+            print(f"| {step} | {baseline['seconds'][step]:.2f} | {typed['seconds'][step]:.2f} |")
+        print(f"| total | {sum(baseline['seconds'].values()):.2f} | {sum(typed['seconds'].values()):.2f} |")
+        print(f"| peak RSS added, MB | {baseline['peak_mb']:.0f} | {typed['peak_mb']:.0f} |")
+
+        print("\n| Column | Baseline dtype | Baseline MB | Typed dtype | Typed MB |")
+        print("|---|---|---:|---|---:|")
+        for col in sorted(typed["memory_mb"], key=typed["memory_mb"].get, reverse=True):
+            print(f"| {col} | {baseline['dtypes'].get(col, '-')} | {baseline['memory_mb'].get(col, 0):.2f} | "
+                  f"{typed['dtypes'][col]} | {typed['memory_mb'][col]:.2f} |")
+        print(f"| total | | {sum(baseline['memory_mb'].values()):.2f} | | {sum(typed['memory_mb'].values()):.2f} |")
+        print(f"\nSame CSV: {'yes' if same_csv else 'NO'}; same SQLite table: {'yes' if same_table else 'NO'}")
+        if not (same_csv and same_table):
+            raise SystemExit("Typed cleaner output differs from the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Daily cleaning time: incremental (watermark) runs vs. a full rebuild of cleaned_danang_batdongsan.
+
+A scaled, migrated synthetic copy of danang_batdongsan (copies made
+distinct as in benchmarks.cleaning_chunked) is cleaned in full without its
+last ``--new-rows`` rows, as yesterday's run; every tenth of those rows is
+then turned into a repost of an older listing (same title, street and
+posted_time) and, as a re-crawl would, every ``--repriced-every``-th older
+listing gets a new price in place (same id). The incremental mode cleans
+only the rows whose change_seq moved, skipping or replacing the reposts
+and refreshing the repriced rows, and its time is compared with cleaning
+the whole table again. The kept listings must be the ones a full rebuild
+keeps (skip mode) or yesterday's minus the replaced or refreshed ones plus
+every appended row (update mode), and rows may only differ in the
+outlier-derived columns, since incremental runs reuse the 1%-99% bounds of
+the last full run; a refreshed row must not keep yesterday's price.
+
+    python -m benchmarks.cleaning_incremental --scale 20 --new-rows 500 5000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.cleaning_chunked import CLEANER_DIR, distinct_copies
+from benchmarks.synthetic_data import generate
+from services.schema import migrate
+
+# Columns that depend on the outlier bounds
+BOUND_COLUMNS = {"price", "area", "price_per_sqm", "price_log", "area_log"}
+
+CHILD = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, sys.argv[1])
+from data_cleaning_preprocessing import DanangRealEstateCleaner
+
+db_name, output, mode = sys.argv[2], sys.argv[3], sys.argv[4]
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    cleaner = DanangRealEstateCleaner(db_name)
+    if mode == "full":
+        cleaner.run_complete_cleaning(output)
+        result = {}
+    else:
+        result = cleaner.run_incremental_cleaning(output, mode)
+result["seconds"] = time.perf_counter() - started
+print(json.dumps(result))
+"""
+
+
+def run(db_name, output, mode):
+    out = subprocess.run([sys.executable, "-c", CHILD, CLEANER_DIR, db_name, output, mode],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def cleaned_rows(path):
+    """id -> row of the cleaned table, plus the column names."""
+    conn = sqlite3.connect(path)
+    cursor = conn.execute("SELECT * FROM cleaned_danang_batdongsan ORDER BY rowid")
+    columns = [column[0] for column in cursor.description]
+    rows = {row[columns.index("id")]: row for row in cursor}
+    conn.close()
+    return columns, rows
+
+
+def differing_columns(expected, actual, columns):
+    return {columns[i] for i in range(len(columns)) if expected[i] != actual[i]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="copies of data.db in the synthetic table")
+    parser.add_argument("--new-rows", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--repriced-every", type=int, default=100, help="older listings repriced in place")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cleaning_incremental_") as workdir:
+        pristine = os.path.join(workdir, "pristine.db")
+        base_rows = generate(1, pristine, apply_migrations=False)["rows"]
+        generate(args.scale, pristine, apply_migrations=False)
+        rows = distinct_copies(pristine, base_rows)
+        migrate(pristine)
+
+        today_db = os.path.join(workdir, "today.db")
+        print(f"{rows:,} source rows; {os.cpu_count()} CPU(s)")
+        print("| New rows | Mode | Seconds | Appended | Skipped | Replaced | Refreshed | Same listings as full rebuild | "
+              "Rows differing outside outlier columns |")
+        print("|---:|---|---:|---:|---:|---:|---:|---|---:|")
+
+        for new_rows in args.new_rows:
+            cutoff = rows - new_rows
+            shutil.copy(pristine, today_db)
+            conn = sqlite3.connect(today_db)
+            with conn:
+                # Every tenth new row reposts a listing from the first copy (property_code is unique)
+                conn.execute("""
+                    UPDATE danang_batdongsan
+                    SET (title, street, posted_time) = (SELECT o.title, o.street, o.posted_time FROM danang_batdongsan o
+                                                        WHERE o.id = (danang_batdongsan.id - 1) % ? + 1)
+                    WHERE id > ? AND id % 10 = 0
+                """, (base_rows, cutoff))
+            conn.close()
+            yesterday_db = os.path.join(workdir, "yesterday.db")
+            shutil.copy(today_db, yesterday_db)
+            conn = sqlite3.connect(yesterday_db)
+            with conn:
+                conn.execute("DELETE FROM danang_batdongsan WHERE id > ?", (cutoff,))
+            conn.close()
+            conn = sqlite3.connect(today_db)
+            with conn:
+                # Re-crawled listings: the upsert changes the price under the same id
+                conn.execute("""
+                    UPDATE danang_batdongsan SET price = price * 1.1
+                    WHERE id <= ? AND id % ? = 0
+                """, (cutoff, args.repriced_every))
+            conn.close()
+            yesterday_csv = os.path.join(workdir, "yesterday.csv")
+            run(yesterday_db, yesterday_csv, "full")
+            _, yesterday = cleaned_rows(yesterday_csv.replace(".csv", ".db"))
+            # Repriced listings yesterday's run kept; the others were dropped there as duplicates
+            stale = {row_id for row_id in yesterday if row_id % args.repriced_every == 0}
+
+            full_csv = os.path.join(workdir, f"full_{new_rows}.csv")
+            rebuild = run(today_db, full_csv, "full")
+            columns, expected = cleaned_rows(full_csv.replace(".csv", ".db"))
+            print(f"| {new_rows:,} | full rebuild | {rebuild['seconds']:.2f} | {len(expected):,} | - | - | - | - | - |")
+
+            for mode in ("skip", "update"):
+                output = os.path.join(workdir, f"{mode}_{new_rows}.csv")
+                shutil.copy(yesterday_csv, output)
+                shutil.copy(yesterday_csv.replace(".csv", ".db"), output.replace(".csv", ".db"))
+                result = run(today_db, output, mode)
+                _, actual = cleaned_rows(output.replace(".csv", ".db"))
+                if mode == "skip":
+                    same = actual.keys() == expected.keys()
+                    compared = expected.keys()
+                else:
+                    # Yesterday's listings minus the replaced (or refreshed) ones, plus every appended row;
+                    # a repriced listing counts as the newest copy and may replace the one a full rebuild keeps
+                    changed = {row_id for row_id in actual if row_id > cutoff or row_id % args.repriced_every == 0}
+                    same = actual.keys() <= yesterday.keys() | changed \
+                        and len(actual) == len(yesterday) - result["replaced"] - result["refreshed"] + result["appended"]
+                    compared = actual.keys() & expected.keys()
+                differing = sum(1 for row_id in compared
+                                if differing_columns(expected[row_id], actual[row_id], columns) - BOUND_COLUMNS)
+                # A refreshed row has the new price (or 0 as an outlier), never yesterday's
+                price = columns.index("price")
+                left_stale = sum(1 for row_id in stale & actual.keys()
+                                 if yesterday[row_id][price] and actual[row_id][price] == yesterday[row_id][price])
+                print(f"| {new_rows:,} | incremental, {mode} | {result['seconds']:.2f} | {result['appended']:,} | "
+                      f"{result['skipped']:,} | {result['replaced']:,} | {result['refreshed']:,} of {len(stale):,} | "
+                      f"{'yes' if same else 'NO'} | {differing} |")
+                if not same or differing or left_stale or result["refreshed"] != len(stale):
+                    raise SystemExit(f"Incremental cleaning ({mode}, {new_rows} new rows) differs from a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
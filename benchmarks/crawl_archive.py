@@ -0,0 +1,81 @@
+"""
+Fetch-to-archive crawl vs. offline re-parse of the archive (crawl_data/parse_archive.py).
+
+Crawls the local fixture server once with the HTML archive enabled, then
+rebuilds the listings from the archive alone into fresh databases with
+process pools of several sizes. Every rebuild must save exactly the rows of
+the online crawl; the archive's size and compression ratio are reported.
+
+    python -m benchmarks.crawl_archive --pages 20 --processes 1 2 4
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import CATEGORIES, FixtureServer, build_fixtures, crawled_rows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+from parse_archive import parse_archive  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8, help="detail-page threads of the online crawl")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="crawl_archive_") as workdir:
+        fixtures = os.path.join(workdir, "mogi")
+        build_fixtures(fixtures, pages=args.pages, per_page=args.per_page)
+        archive_path = os.path.join(workdir, "crawl_archive.db")
+        online_db = os.path.join(workdir, "online.db")
+
+        server = FixtureServer(fixtures).start()
+        try:
+            crawler = RealEstateCrawler(online_db, workers=args.workers, requests_per_second=1000,
+                                        burst=args.workers, archive_path=archive_path)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for category in CATEGORIES:
+                    crawler.start_crawling(f"{server.base_url}/{category}")
+            online_s = time.perf_counter() - started
+            stats = crawler.archive.stats
+            crawler.close_connection()
+        finally:
+            server.stop()
+        expected = crawled_rows(online_db)
+
+        conn = sqlite3.connect(archive_path)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        print(f"Archive: {stats['pages']} pages, {stats['raw_bytes'] / 1024 / 1024:.1f} MB of HTML stored as "
+              f"{stats['stored_bytes'] / 1024 / 1024:.2f} MB ({stats['raw_bytes'] / stats['stored_bytes']:.1f}x), "
+              f"file {os.path.getsize(archive_path) / 1024 / 1024:.2f} MB")
+        print(f"CPUs: {os.cpu_count()}")
+        print("| Stage | Seconds | Rows | Identical to online crawl |")
+        print("|---|---:|---:|---|")
+        print(f"| online crawl + archive ({args.workers} detail workers) | {online_s:.2f} | {len(expected)} | - |")
+        for processes in args.processes:
+            offline_db = os.path.join(workdir, f"offline_{processes}.db")
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                parse_archive(archive_path, offline_db, processes=processes)
+            elapsed = time.perf_counter() - started
+            rows = crawled_rows(offline_db)
+            print(f"| offline re-parse, {processes} process(es) | {elapsed:.2f} | {len(rows)} | "
+                  f"{'yes' if rows == expected else 'NO'} |")
+            if rows != expected:
+                raise SystemExit(f"Re-parse with {processes} processes saved different rows than the online crawl")
+
+
+if __name__ == "__main__":
+    main()
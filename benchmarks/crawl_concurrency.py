@@ -0,0 +1,85 @@
+"""
+Serial vs. concurrent detail fetching in RealEstateCrawler against the local fixture server.
+
+Both runs crawl the same saved pages under the same per-host rate limit;
+the server adds a fixed latency to every response and, for the concurrent
+run, answers a share of requests with 429/503 so the retry path is
+exercised. The collected rows must be identical.
+
+    python -m benchmarks.crawl_concurrency --workers 8 --rate 20 --latency 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import CATEGORIES, FixtureServer, build_fixtures, crawled_rows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+
+
+def crawl(server, workdir, workers, rate, burst):
+    db_name = os.path.join(workdir, f"crawl_{workers}.db")
+    crawler = RealEstateCrawler(db_name, workers=workers,
+                                requests_per_second=rate, burst=burst, retry_backoff=0.05)
+    server.reset_stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for category in CATEGORIES:
+            crawler.start_crawling(f"{server.base_url}/{category}")
+    elapsed = time.perf_counter() - started
+    crawler.close_connection()
+    rows = crawled_rows(db_name)
+
+    times = [t for t, _ in server.requests]
+    # Busiest one-second window seen by the server, to check the rate limiter
+    peak = max(sum(1 for u in times if t <= u < t + 1) for t in times) if times else 0
+    return rows, {
+        "seconds": elapsed,
+        "requests": len(times),
+        "injected_errors": server.injected_errors,
+        "max_in_flight": server.max_in_flight,
+        "peak_requests_per_s": peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second per host")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of 429/503 responses in the concurrent run")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="crawl_fixtures_") as workdir:
+        fixtures = os.path.join(workdir, "mogi")
+        build_fixtures(fixtures, pages=args.pages, per_page=args.per_page)
+        server = FixtureServer(fixtures, latency=args.latency, seed=1).start()
+        try:
+            serial_rows, serial = crawl(server, workdir, 1, args.rate, args.burst)
+            server.error_rate = args.error_rate
+            concurrent_rows, concurrent = crawl(server, workdir, args.workers, args.rate, args.burst)
+        finally:
+            server.stop()
+
+    if serial_rows != concurrent_rows:
+        raise SystemExit("Concurrent crawl collected different rows than the serial crawl")
+
+    print(f"{len(serial_rows)} listings, {args.rate:g} req/s per host, {args.latency * 1000:.0f} ms latency; rows identical")
+    print("| Mode | Seconds | Requests | Injected 429/503 | Max in flight | Peak req in 1 s |")
+    print("|---|---:|---:|---:|---:|---:|")
+    for name, r in (("serial", serial), (f"{args.workers} workers", concurrent)):
+        print(f"| {name} | {r['seconds']:.2f} | {r['requests']} | {r['injected_errors']} | "
+              f"{r['max_in_flight']} | {r['peak_requests_per_s']} |")
+
+
+if __name__ == "__main__":
+    main()
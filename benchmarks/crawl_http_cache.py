@@ -0,0 +1,110 @@
+"""
+Keep-alive session and on-disk conditional-GET cache of RealEstateCrawler, against the local fixture server.
+
+Runs the same crawl several times over one fixture set: without a cache,
+cold, warm after a share of detail pages changed (always revalidating),
+warm with a one-hour max age, and with a cache budget too small to hold
+everything. Every run must collect the same rows.
+
+    python -m benchmarks.crawl_http_cache --pages 3 --changed 0.1
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import CATEGORIES, FixtureServer, build_fixtures, crawled_rows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+
+
+def crawl(server, workdir, workers, **cache_options):
+    # A fresh database per run, so every run inserts the rows it crawled
+    db_name = os.path.join(workdir, f"crawl_{time.monotonic_ns()}.db")
+    crawler = RealEstateCrawler(db_name, workers=workers,
+                                requests_per_second=1000, **cache_options)
+    server.reset_stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for category in CATEGORIES:
+            crawler.start_crawling(f"{server.base_url}/{category}")
+    elapsed = time.perf_counter() - started
+    crawler.close_connection()
+    report = crawler.http_cache.report() if crawler.http_cache else {}
+    return crawled_rows(db_name), {
+        "seconds": elapsed,
+        "requests": len(server.requests),
+        "connections": server.connections,
+        "not_modified": server.not_modified,
+        "bytes_sent": server.bytes_sent,
+        "hit_ratio": report.get("hit_ratio", 0.0),
+        "bytes_saved": report.get("bytes_saved", 0),
+        "evictions": report.get("evictions", 0),
+        "cache_bytes": report.get("size_bytes", 0),
+    }
+
+
+def touch_detail_pages(fixtures, share, seed=1):
+    """Change the bytes (not the parsed fields) of a share of detail pages so their ETag changes."""
+    pages = [os.path.join(root, name) for root, _, names in os.walk(fixtures)
+             for name in names if not name.startswith("page-")]
+    changed = random.Random(seed).sample(pages, int(len(pages) * share))
+    for path in changed:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("<!-- cập nhật -->\n")
+    return len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--changed", type=float, default=0.1, help="share of detail pages changed between crawls")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="crawl_cache_") as workdir:
+        fixtures = os.path.join(workdir, "mogi")
+        cache_dir = os.path.join(workdir, "http")
+        build_fixtures(fixtures, pages=args.pages, per_page=args.per_page)
+        server = FixtureServer(fixtures).start()
+        try:
+            baseline, stats = crawl(server, workdir, args.workers)
+            runs.append(("no cache", stats))
+            rows, stats = crawl(server, workdir, args.workers, cache_dir=cache_dir, cache_max_age=0)
+            runs.append(("cold cache", stats))
+            assert rows == baseline
+            changed = touch_detail_pages(fixtures, args.changed)
+            rows, stats = crawl(server, workdir, args.workers, cache_dir=cache_dir, cache_max_age=0)
+            runs.append((f"warm, {changed} pages changed, max age 0", stats))
+            assert rows == baseline
+            rows, stats = crawl(server, workdir, args.workers, cache_dir=cache_dir, cache_max_age=3600)
+            runs.append(("warm, max age 1 h", stats))
+            assert rows == baseline
+            small_budget = stats["cache_bytes"] // 4
+            shutil.rmtree(cache_dir)
+            rows, stats = crawl(server, workdir, args.workers, cache_dir=cache_dir,
+                                cache_max_age=0, cache_max_bytes=small_budget)
+            runs.append((f"cold, budget {small_budget // 1024} KiB", stats))
+            assert rows == baseline and stats["cache_bytes"] <= small_budget
+        finally:
+            server.stop()
+
+    print(f"{len(baseline)} listings, {args.workers} workers; rows identical in every run")
+    print("| Run | Seconds | Requests | Connections | 304s | Bytes sent | Hit ratio | Bytes saved | Evictions |")
+    print("|---|---:|---:|---:|---:|---:|---:|---:|---:|")
+    for name, r in runs:
+        print(f"| {name} | {r['seconds']:.2f} | {r['requests']} | {r['connections']} | {r['not_modified']} | "
+              f"{r['bytes_sent']:,} | {r['hit_ratio']:.1%} | {r['bytes_saved']:,} | {r['evictions']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Daily refresh cost: full re-crawl vs. incremental crawl of RealEstateCrawler, against the local fixture server.
+
+Day 1 is crawled in full into a fresh database. On day 2 the site has
+``--new`` new listings at the top of each category and ``--repriced``
+listings with a new price; the day-1 database is then refreshed once with
+a full crawl and once with ``incremental=True``. Both must end with one
+row per listing and the new listings and prices applied.
+
+    python -m benchmarks.crawl_incremental --pages 10 --new 5 --repriced 5
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import CATEGORIES, FixtureServer, build_fixtures
+from config import Config
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+
+
+def crawl(server, db_name, workers, incremental):
+    crawler = RealEstateCrawler(db_name, workers=workers, requests_per_second=1000, incremental=incremental)
+    server.reset_stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        for category in CATEGORIES:
+            crawler.start_crawling(f"{server.base_url}/{category}")
+        crawler.save_to_database()
+    elapsed = time.perf_counter() - started
+    crawler.close_connection()
+    summary = next(line for line in log.getvalue().splitlines() if line.startswith("Dữ liệu đã được lưu"))
+    return {"seconds": elapsed, "requests": len(server.requests), "summary": summary.split(": ", 1)[1]}
+
+
+def reprice(source, target, count):
+    """Copy of ``source`` where the ``count`` newest listings of each category cost 10% more."""
+    conn = sqlite3.connect(target)
+    sqlite3.connect(source).backup(conn)
+    for is_selling in CATEGORIES.values():
+        conn.execute("""
+            UPDATE danang_batdongsan SET price = round(price * 1.1, -6)
+            WHERE id IN (SELECT id FROM danang_batdongsan WHERE is_selling = ? ORDER BY id LIMIT ?)
+        """, (is_selling, count))
+    conn.commit()
+    conn.close()
+
+
+def listings(db_name):
+    conn = sqlite3.connect(db_name)
+    rows = dict(conn.execute("SELECT property_code, price FROM danang_batdongsan"))
+    total = conn.execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+    conn.close()
+    return rows, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--new", type=int, default=5, help="new listings per category on day 2")
+    parser.add_argument("--repriced", type=int, default=5, help="repriced listings per category on day 2")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="crawl_incremental_") as workdir:
+        day1, day2 = os.path.join(workdir, "day1"), os.path.join(workdir, "day2")
+        source = os.path.join(workdir, "source.db")
+        build_fixtures(day1, pages=args.pages, per_page=args.per_page, skip=args.new)
+        reprice(Config.DB_NAME, source, args.new + args.repriced)
+        build_fixtures(day2, source, pages=args.pages, per_page=args.per_page)
+        expected, _ = listings(source)
+
+        server = FixtureServer(day1, latency=args.latency).start()
+        try:
+            day1_db = os.path.join(workdir, "day1.db")
+            initial = crawl(server, day1_db, args.workers, incremental=False)
+            server.directory = day2
+            runs = {}
+            for name, incremental in (("full re-crawl", False), ("incremental", True)):
+                db_name = os.path.join(workdir, f"{name}.db")
+                shutil.copy(day1_db, db_name)
+                runs[name] = crawl(server, db_name, args.workers, incremental)
+                rows, total = listings(db_name)
+                if total != len(rows):
+                    raise SystemExit(f"{name}: {total} rows for {len(rows)} listings")
+                runs[name]["rows"] = total
+                runs[name]["stale_prices"] = sum(expected.get(code, price) != price for code, price in rows.items())
+        finally:
+            server.stop()
+
+    print(f"Day 1: {initial['requests']} requests in {initial['seconds']:.2f}s; {initial['summary']}")
+    print(f"Day 2: +{args.new} new and {args.repriced} repriced listings per category, "
+          f"{args.latency * 1000:.0f} ms latency, {args.workers} workers")
+    print("| Refresh | Seconds | Requests | Rows | Stale prices | Result |")
+    print("|---|---:|---:|---:|---:|---|")
+    for name, r in runs.items():
+        print(f"| {name} | {r['seconds']:.2f} | {r['requests']} | {r['rows']} | {r['stale_prices']} | {r['summary']} |")
+
+
+if __name__ == "__main__":
+    main()
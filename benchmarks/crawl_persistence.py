@@ -0,0 +1,171 @@
+"""
+Insert throughput and crash/resume of RealEstateCrawler's batched persistence.
+
+Part 1 writes the listings of data.db, in the crawler's row format, into a
+fresh migrated database (rollup triggers included): with the previous
+one-INSERT-per-row save in the default rollback journal (one commit at the
+end, and committing every row), then through ``flush`` in executemany
+batches of several sizes under WAL.
+
+Part 2 crawls the local fixture server, kills the crawl after a given page,
+resumes it with a new crawler and checks that the saved rows equal those of
+an uninterrupted crawl.
+
+    python -m benchmarks.crawl_persistence --batch-sizes 50 200 1000 --crash-after 7
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import CATEGORIES, FixtureServer, build_fixtures, crawled_rows
+from config import Config
+from services.schema import migrate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+
+LEGACY_INSERT_SQL = """
+    INSERT INTO danang_batdongsan (title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates, detail_url, posted_date, posted_year, posted_month, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+def source_rows(limit):
+    conn = sqlite3.connect(Config.DB_NAME)
+    rows = [list(row) + [None] for row in conn.execute("""
+        SELECT title, price, area, location, street, ward, district, city, bedrooms, bathrooms,
+               posted_time, is_selling, property_code, coordinates
+        FROM danang_batdongsan
+        WHERE posted_time GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'
+        ORDER BY id LIMIT ?
+    """, (limit,))]
+    conn.close()
+    return rows
+
+
+def fresh_crawler(db_name, batch_size=200):
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler = RealEstateCrawler(db_name, batch_size=batch_size)
+        crawler.create_table()
+        migrate(db_name)
+    return crawler
+
+
+def legacy_insert(db_name, rows, commit_every_row=False):
+    """The save_to_database loop before batching: one execute per row, one commit, default journal.
+
+    ``commit_every_row`` is the naive way to make that loop durable while crawling.
+    """
+    crawler = fresh_crawler(db_name)
+    crawler.close_connection()
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    cursor = conn.cursor()
+    params = []
+    for row in rows:
+        posted = time.strptime(row[10], "%d-%m-%Y")
+        latitude, longitude = crawler.parse_coordinates(row[13])
+        params.append(row + [time.strftime("%Y-%m-%d", posted), posted.tm_year, posted.tm_mon, latitude, longitude])
+    # Timed like flush(): statements and commit only, not the row preparation
+    started = time.perf_counter()
+    for row in params:
+        cursor.execute(LEGACY_INSERT_SQL, row)
+        if commit_every_row:
+            conn.commit()
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+
+def batched_insert(db_name, rows, batch_size):
+    crawler = fresh_crawler(db_name, batch_size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start in range(0, len(rows), batch_size):
+            crawler.data = [list(row) for row in rows[start:start + batch_size]]
+            crawler.flush()
+    crawler.close_connection()
+    return crawler.write_stats["seconds"]
+
+
+class CrashingCrawler(RealEstateCrawler):
+    """Dies right after fetching page ``crash_after`` of the first category, before it is saved."""
+
+    def __init__(self, *args, crash_after, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.crash_after = crash_after
+
+    def fetch_page_data(self, url, is_selling):
+        result = super().fetch_page_data(url, is_selling)
+        if url.endswith(f"?cp={self.crash_after}"):
+            raise KeyboardInterrupt(url)
+        return result
+
+
+def crawl(crawler, server):
+    server.reset_stats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for category in CATEGORIES:
+            crawler.start_crawling(f"{server.base_url}/{category}")
+    crawler.close_connection()
+    return [path for _, path in server.requests]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="listings written in part 1 (capped by data.db)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=40, help="flush size used in part 2")
+    parser.add_argument("--crash-after", type=int, default=7, help="page of the first category the crawl dies on")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="crawl_persistence_") as workdir:
+        rows = source_rows(args.rows)
+        print(f"Part 1: {len(rows):,} listings into a migrated table with rollup triggers")
+        print("| Write path | Seconds | Rows/s |")
+        print("|---|---:|---:|")
+        elapsed = legacy_insert(os.path.join(workdir, "legacy.db"), rows)
+        print(f"| execute per row, one commit, rollback journal (before) | {elapsed:.2f} | {len(rows) / elapsed:,.0f} |")
+        elapsed = legacy_insert(os.path.join(workdir, "per_row.db"), rows, commit_every_row=True)
+        print(f"| execute + commit per row, rollback journal | {elapsed:.2f} | {len(rows) / elapsed:,.0f} |")
+        for batch_size in args.batch_sizes:
+            elapsed = batched_insert(os.path.join(workdir, f"batch_{batch_size}.db"), rows, batch_size)
+            print(f"| executemany x{batch_size}, WAL | {elapsed:.2f} | {len(rows) / elapsed:,.0f} |")
+
+        fixtures = os.path.join(workdir, "mogi")
+        build_fixtures(fixtures, pages=args.pages, per_page=args.per_page)
+        server = FixtureServer(fixtures).start()
+        try:
+            complete_db, resumed_db = os.path.join(workdir, "complete.db"), os.path.join(workdir, "resumed.db")
+            crawl(RealEstateCrawler(complete_db, requests_per_second=1000, batch_size=args.batch_size), server)
+            crashing = CrashingCrawler(resumed_db, requests_per_second=1000, batch_size=args.batch_size,
+                                       crash_after=args.crash_after)
+            try:
+                crawl(crashing, server)
+            except KeyboardInterrupt:
+                crashing.close_connection()
+            saved_before_resume = len(crawled_rows(resumed_db))
+            requested = crawl(RealEstateCrawler(resumed_db, requests_per_second=1000, batch_size=args.batch_size), server)
+        finally:
+            server.stop()
+
+        complete, resumed = crawled_rows(complete_db), crawled_rows(resumed_db)
+        first_page = next(path for path in requested if "?cp=" in path)
+        print(f"\nPart 2: crawl killed on page {args.crash_after} with {saved_before_resume} rows saved "
+              f"(batch {args.batch_size}); resumed at {first_page}")
+        print(f"Resumed crawl: {len(resumed)} rows, uninterrupted crawl: {len(complete)} rows, "
+              f"identical: {resumed == complete}")
+        if resumed != complete:
+            raise SystemExit("Resumed crawl saved different rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Category-by-category crawling vs. the (base_url, page) work-queue scheduler, as categories are added.
+
+For 1, 2, 4, ... categories of the same size on the local fixture server
+(fixed latency per response), the crawl runs once the way ``__main__`` used
+to (each category to completion, one page at a time, detail pages in
+parallel) and once through CrawlScheduler with the same detail workers
+plus parallel listing pages under an adaptive in-flight budget. A final run
+injects 429/503 responses to show the budget backing off. Every scheduled
+run must save the same rows as the sequential one (compared as sets, since
+categories are interleaved).
+
+    python -m benchmarks.crawl_scheduler --categories 1 2 4 --pages 5 --latency 0.1
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.crawler_fixtures import FixtureServer, build_fixtures, crawled_rows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+from crawl_data_script import RealEstateCrawler  # noqa: E402
+from crawl_scheduler import CrawlScheduler  # noqa: E402
+
+CITIES = ["da-nang", "ha-noi", "ho-chi-minh", "hai-phong", "can-tho", "nha-trang", "hue", "vung-tau"]
+
+
+def categories_for(count):
+    """``count`` categories alternating sale and rent, one city after another."""
+    return {f"{CITIES[i // 2]}/{'mua' if i % 2 == 0 else 'thue'}-nha-dat": int(i % 2 == 0) for i in range(count)}
+
+
+def crawl(server, db_name, categories, scheduled, args):
+    crawler = RealEstateCrawler(db_name, workers=args.workers, requests_per_second=1000, burst=args.workers,
+                                retry_backoff=0.05, max_in_flight=args.max_in_flight if scheduled else None)
+    base_urls = [f"{server.base_url}/{category}" for category in categories]
+    server.reset_stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if scheduled:
+            CrawlScheduler(crawler, args.page_workers).run(base_urls)
+        else:
+            for base_url in base_urls:
+                crawler.start_crawling(base_url)
+    elapsed = time.perf_counter() - started
+    crawler.close_connection()
+    return crawled_rows(db_name), {
+        "seconds": elapsed,
+        "requests": len(server.requests),
+        "max_in_flight": server.max_in_flight,
+        "decreases": crawler.metrics.total("crawler_concurrency_decreases_total"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--categories", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pages", type=int, default=5, help="listing pages per category")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every response")
+    parser.add_argument("--workers", type=int, default=16, help="detail-page threads (both modes)")
+    parser.add_argument("--page-workers", type=int, default=4, help="listing pages crawled at once by the scheduler")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of 429/503 responses in the last run")
+    args = parser.parse_args()
+
+    print(f"{args.pages} pages x {args.per_page} listings per category, {args.latency * 1000:.0f} ms latency, "
+          f"{args.workers} detail workers; scheduler: {args.page_workers} page workers, budget {args.max_in_flight}")
+    print("| Categories | Mode | Seconds | Requests | Max in flight | Limit decreases | Rows | Same rows |")
+    print("|---:|---|---:|---:|---:|---:|---:|---|")
+    with tempfile.TemporaryDirectory(prefix="crawl_scheduler_") as workdir:
+        for count in args.categories:
+            categories = categories_for(count)
+            fixtures = os.path.join(workdir, f"mogi_{count}")
+            build_fixtures(fixtures, pages=args.pages, per_page=args.per_page, categories=categories)
+            server = FixtureServer(fixtures, latency=args.latency, seed=1).start()
+            runs = [("category by category", False, 0.0), ("scheduler", True, 0.0)]
+            if count == args.categories[-1] and args.error_rate:
+                runs.append((f"scheduler, {args.error_rate:.0%} 429/503", True, args.error_rate))
+            try:
+                expected = None
+                for name, scheduled, error_rate in runs:
+                    server.error_rate = error_rate
+                    db_name = os.path.join(workdir, f"crawl_{count}_{len(name)}_{error_rate}.db")
+                    rows, stats = crawl(server, db_name, categories, scheduled, args)
+                    expected = expected if expected is not None else sorted(rows)
+                    same = sorted(rows) == expected
+                    print(f"| {count} | {name} | {stats['seconds']:.2f} | {stats['requests']} | {stats['max_in_flight']} | "
+                          f"{stats['decreases'] if scheduled else '-'} | {len(rows)} | {'yes' if same else 'NO'} |")
+                    if not same:
+                        raise SystemExit(f"{name} saved different rows than the sequential crawl")
+            finally:
+                server.stop()
+
+
+if __name__ == "__main__":
+    main()
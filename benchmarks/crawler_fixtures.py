@@ -0,0 +1,308 @@
+"""
+Local stand-in for mogi.vn serving saved listing and detail HTML.
+
+``build_fixtures`` writes listing pages (``<category>/page-N.html``) and
+detail pages (``<category>/<slug>.html``) in mogi.vn's markup from rows of
+danang_batdongsan; ``FixtureServer`` serves a fixture directory over HTTP
+with ETag/Last-Modified validators, keep-alive, optional per-request
+latency and injected 429/503 responses, and records what it served so
+crawler runs can be checked against it.
+
+    python -m benchmarks.crawler_fixtures --build /tmp/mogi --serve --port 8765
+    python crawl_data/crawl_data_script.py --host http://127.0.0.1:8765
+"""
+
+import argparse
+import email.utils
+import hashlib
+import html
+import os
+import random
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config import Config
+
+CATEGORIES = {"da-nang/mua-nha-dat": 1, "da-nang/thue-nha-dat": 0}
+
+DISTRICTS = ["Hải Châu", "Thanh Khê", "Sơn Trà", "Ngũ Hành Sơn", "Liên Chiểu", "Cẩm Lệ", "Hòa Vang"]
+PROPERTY_TYPES = ["Nhà mặt tiền", "Nhà hẻm", "Căn hộ chung cư", "Đất nền", "Biệt thự", "Văn phòng", "Phòng trọ"]
+
+# Site chrome around the listings (menus, sidebar, tracking script), so page
+# sizes and tag counts are closer to the live site than the bare listings.
+PAGE_HEADER = """<header class="top-bar"><nav><ul class="menu">
+{menu}
+</ul></nav></header>
+<script type="application/ld+json">{{"@context": "https://schema.org", "itemListElement": [{ld}]}}</script>
+""".format(
+    menu="\n".join(f'<li class="menu-item"><a href="/da-nang/{kind}-{i}">{name} quận {district}</a></li>'
+                   for i, (name, district) in enumerate((n, d) for n in PROPERTY_TYPES for d in DISTRICTS)
+                   for kind in ("mua", "thue")),
+    ld=", ".join(f'{{"@type": "ListItem", "position": {i}, "name": "Tin {i}", "url": "https://example.invalid/{i}"}}'
+                 for i in range(120)),
+)
+
+PAGE_FOOTER = """<aside class="side-bar"><ul class="links">
+{links}
+</ul></aside>
+<footer><div class="footer-links">{links}</div><p>Thông tin chỉ mang tính tham khảo.</p></footer>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}} gtag('js', new Date());</script>
+""".format(links="\n".join(f'<li><a href="/da-nang/{i}">Giá nhà đất quận {district} tháng {i % 12 + 1}</a></li>'
+                            for i, district in enumerate(DISTRICTS * 12)))
+
+LISTING_PAGE = """<!DOCTYPE html>
+<html lang="vi"><head><meta charset="utf-8"><title>Nhà đất Đà Nẵng - Trang {page}</title></head>
+<body>
+{header}
+<div class="property-listing">
+<ul class="props">
+{items}
+</ul>
+<ul class="pagination">{pagination}</ul>
+</div>
+{footer}
+</body></html>
+"""
+
+LISTING_ITEM = """<li>
+  <div class="prop-info">
+    <a class="link-overlay" href="/{path}"></a>
+    <h2 class="prop-title">{title}</h2>
+    <div class="prop-addr">{location}</div>
+    <ul class="prop-attr"><li>{area} m²</li><li>{bedrooms} PN</li><li>{bathrooms} WC</li></ul>
+    <div class="price">{price}</div>
+    <div class="prop-created">{posted_time}</div>
+  </div>
+</li>"""
+
+DETAIL_PAGE = """<!DOCTYPE html>
+<html lang="vi"><head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+{header}
+<h1>{title}</h1>
+<div class="address">{address}</div>
+<div class="info-attrs clearfix">
+  <div class="info-attr clearfix"><span>Diện tích đất</span><span>{area} m²</span></div>
+  <div class="info-attr clearfix"><span>Phòng ngủ</span><span>{bedrooms}</span></div>
+  <div class="info-attr clearfix"><span>Mã BĐS</span><span>{property_code}</span></div>
+</div>
+<div class="map-content"><iframe title="map" data-src="https://www.google.com/maps/embed/v1/place?key=demo&q={coordinates}&zoom=15"></iframe></div>
+{footer}
+</body></html>
+"""
+
+
+def format_price(price):
+    """Render a VND amount the way mogi.vn shows it (the crawler parses it back)."""
+    price = int(price or 0)
+    ty, trieu, nghin = price // 1_000_000_000, price % 1_000_000_000 // 1_000_000, price % 1_000_000 // 1_000
+    if ty:
+        return f"{ty} tỷ {trieu} triệu" if trieu else f"{ty} tỷ"
+    if trieu:
+        return f"{trieu} triệu {nghin} nghìn" if nghin else f"{trieu} triệu"
+    return "Thỏa thuận"
+
+
+def pagination(category, page, pages):
+    """mogi.vn-style pager: the pages around ``page`` plus a link to the last one."""
+    links = [f'<li><a href="/{category}?cp={n}">{n}</a></li>'
+             for n in range(max(1, page - 2), min(pages, page + 2) + 1)]
+    links.append(f'<li><a href="/{category}?cp={pages}">»</a></li>')
+    return "".join(links)
+
+
+def build_fixtures(target_dir, source=Config.DB_NAME, pages=3, per_page=20, skip=0, categories=CATEGORIES):
+    """Write ``pages`` listing pages per category plus one detail page per listing.
+
+    Listings are taken in id order after the first ``skip`` of each category,
+    so a fixture set built with ``skip=k`` is the site as it was before the
+    first ``k`` listings were posted. ``categories`` maps a path to is_selling;
+    categories of the same kind get consecutive, non-overlapping listings.
+    """
+    conn = sqlite3.connect(source)
+    written = 0
+    offsets = {}
+    for category, is_selling in categories.items():
+        os.makedirs(os.path.join(target_dir, category), exist_ok=True)
+        offset = offsets.get(is_selling, skip)
+        offsets[is_selling] = offset + pages * per_page
+        rows = conn.execute("""
+            SELECT id, title, price, area, location, street, ward, district, city,
+                   bedrooms, bathrooms, posted_time, property_code, coordinates
+            FROM danang_batdongsan WHERE is_selling = ? ORDER BY id LIMIT ? OFFSET ?
+        """, (is_selling, pages * per_page, offset)).fetchall()
+        for page in range(1, pages + 2):
+            items = []
+            # The page after the last one has an empty list, as on the live site
+            for row in rows[(page - 1) * per_page:page * per_page] if page <= pages else []:
+                (row_id, title, price, area, location, street, ward, district, city,
+                 bedrooms, bathrooms, posted_time, property_code, coordinates) = row
+                path = f"{category}/tin-{row_id}-id{property_code}"
+                escaped = {k: html.escape(str(v or "")) for k, v in {
+                    "title": title, "location": location, "property_code": property_code,
+                    "address": ", ".join(str(part or "") for part in (street, ward, district, city)),
+                    "coordinates": coordinates,
+                }.items()}
+                items.append(LISTING_ITEM.format(
+                    path=path, title=escaped["title"], location=escaped["location"],
+                    area=int(area or 0), bedrooms=bedrooms or 0, bathrooms=bathrooms or 0,
+                    price=format_price(price), posted_time=(posted_time or "").replace("-", "/"),
+                ))
+                with open(os.path.join(target_dir, f"{path}.html"), "w", encoding="utf-8") as f:
+                    f.write(DETAIL_PAGE.format(
+                        header=PAGE_HEADER, footer=PAGE_FOOTER, title=escaped["title"], address=escaped["address"], area=int(area or 0),
+                        bedrooms=bedrooms or 0, property_code=escaped["property_code"],
+                        coordinates=escaped["coordinates"],
+                    ))
+                written += 1
+            with open(os.path.join(target_dir, category, f"page-{page}.html"), "w", encoding="utf-8") as f:
+                f.write(LISTING_PAGE.format(header=PAGE_HEADER, footer=PAGE_FOOTER, page=page, items="\n".join(items),
+                                            pagination=pagination(category, page, pages)))
+            written += 1
+    conn.close()
+    return written
+
+
+def crawled_rows(db_name):
+    """Listing rows a crawl saved, in insertion order, for comparing crawler runs."""
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("""
+        SELECT title, price, area, location, street, ward, district, city, bedrooms, bathrooms,
+               posted_time, is_selling, property_code, coordinates, detail_url
+        FROM danang_batdongsan ORDER BY id
+    """).fetchall()
+    conn.close()
+    return rows
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves ``directory`` on 127.0.0.1; ``/<category>?cp=N`` maps to ``<category>/page-N.html``."""
+
+    daemon_threads = True
+
+    def __init__(self, directory, port=0, latency=0.0, error_rate=0.0, seed=None):
+        super().__init__(("127.0.0.1", port), FixtureHandler)
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = []
+            self.connections = 0
+            self.not_modified = 0
+            self.bytes_sent = 0
+            self.injected_errors = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((time.monotonic(), self.path))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            inject = server.random.random() < server.error_rate
+            if inject:
+                server.injected_errors += 1
+                status = 429 if server.random.random() < 0.5 else 503
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            if inject:
+                self.send_response(status)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.serve_file()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def serve_file(self):
+        parts = urlsplit(self.path)
+        page = parse_qs(parts.query).get("cp", [None])[0]
+        name = parts.path.strip("/") + (f"/page-{page}" if page else "") + ".html"
+        path = os.path.join(self.server.directory, name)
+        if ".." in name or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+        if self.headers.get("If-None-Match") == etag:
+            with self.server.lock:
+                self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--build", metavar="DIR", required=True, help="fixture directory (built if missing)")
+    parser.add_argument("--source", default=Config.DB_NAME)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--skip", type=int, default=0, help="leave out the newest N listings of each category")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/503")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.build):
+        print(f"{build_fixtures(args.build, args.source, args.pages, args.per_page, args.skip)} files written to {args.build}")
+    if args.serve:
+        server = FixtureServer(args.build, args.port, args.latency, args.error_rate)
+        print(f"Serving {args.build} at {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
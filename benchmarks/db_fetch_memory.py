@@ -0,0 +1,130 @@
+"""
+Peak memory and time of full-table reads: fetchall() vs. Database's streaming and columnar fetches.
+
+Each mode runs in a fresh interpreter against a scaled synthetic copy of
+danang_batdongsan; the peak RSS it adds on top of the interpreter with
+pandas/numpy imported and the pool connection open (mmap off, so only
+memory the fetch itself allocates counts) is reported, along with the
+wall time. Columnar and DataFrame results are checked against
+pandas.read_sql_query, and both price-segment builds must agree.
+
+    python -m benchmarks.db_fetch_memory --scale 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import generate
+
+SQL = "SELECT * FROM danang_batdongsan"
+
+MODES = {
+    "fetchall": "fetchall() list of tuples",
+    "fetchall_frame": "pd.DataFrame(fetchall())",
+    "read_sql": "pd.read_sql_query",
+    "iter_query": "iter_query(), streamed aggregate",
+    "query_columns": "query_columns() numpy arrays",
+    "query_frame": "query_frame() DataFrame",
+    "segments_list": "price segments from a fetched list",
+    "segments_stream": "price segments streamed",
+}
+
+CHILD = """
+import json, sys, time
+import numpy as np
+import pandas as pd
+from config import Config
+from services.database import Database
+from services import price_segments
+
+
+def high_water_kb():
+    # ru_maxrss survives fork/exec and would report the parent's peak; VmHWM is per process image
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+
+
+# Memory-mapped database pages would show up in RSS as if they were result rows
+Config.DB_MMAP_SIZE = 0
+mode, db_name, batch_size, sql = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+db = Database(db_name)
+db.query("SELECT 1")
+before = high_water_kb()
+started = time.perf_counter()
+if mode == "fetchall":
+    result = len(db.query(sql))
+elif mode == "fetchall_frame":
+    rows = db.query(sql)
+    result = len(pd.DataFrame(rows, columns=[column[0] for column in db.cursor.description]))
+    del rows
+elif mode == "read_sql":
+    result = len(pd.read_sql_query(sql, db.conn))
+elif mode == "iter_query":
+    result = sum(row[2] or 0 for row in db.iter_query(sql, batch_size=batch_size))
+elif mode == "query_columns":
+    result = float(np.nansum(db.query_columns(sql, batch_size=batch_size)["price"]))
+elif mode == "query_frame":
+    result = len(db.query_frame(sql, batch_size=batch_size))
+elif mode == "segments_list":
+    result = repr(price_segments.analyze_data(list(price_segments.get_data_from_db(db_name))))
+elif mode == "segments_stream":
+    result = repr(price_segments.analyze_data(price_segments.get_data_from_db(db_name)))
+elapsed = time.perf_counter() - started
+peak = high_water_kb()
+print(json.dumps({"seconds": elapsed, "peak_mb": (peak - before) / 1024, "result": result}))
+"""
+
+
+def run_mode(mode, db_name, batch_size):
+    out = subprocess.run([sys.executable, "-c", CHILD, mode, db_name, str(batch_size), SQL],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def check_equivalence(db_name, batch_size):
+    import sqlite3
+
+    import numpy as np
+    import pandas as pd
+
+    from services.database import Database
+
+    expected = pd.read_sql_query(SQL, sqlite3.connect(db_name))
+    with Database(db_name) as db:
+        pd.testing.assert_frame_equal(db.query_frame(SQL, batch_size=batch_size), expected)
+        columns = db.query_columns(SQL, batch_size=batch_size)
+    for name in expected.columns:
+        assert np.array_equal(pd.Series(columns[name]).isna(), expected[name].isna()), name
+    return len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="copies of data.db in the synthetic table")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="db_fetch_memory_") as workdir:
+        db_name = os.path.join(workdir, "scaled.db")
+        generate(args.scale, db_name)
+        rows = check_equivalence(db_name, args.batch_size)
+        print(f"{rows:,} rows x {SQL!r}, batch size {args.batch_size}; query_frame/query_columns match read_sql_query")
+        print("| Mode | Peak RSS added MB | Seconds |")
+        print("|---|---:|---:|")
+        results = {}
+        for mode in args.modes:
+            results[mode] = run_mode(mode, db_name, args.batch_size)
+            print(f"| {MODES[mode]} | {results[mode]['peak_mb']:.1f} | {results[mode]['seconds']:.2f} |")
+        if "segments_list" in results and "segments_stream" in results:
+            if results["segments_list"]["result"] != results["segments_stream"]["result"]:
+                raise SystemExit("Streamed price segments differ from the fetched-list build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+ListingDeduplicator: time, recall of planted reposts and survivorship, from data.db up to a million rows.
+
+A synthetic copy of danang_batdongsan ``max(--scales)`` times data.db is
+made distinct as in benchmarks.cleaning_chunked (every fifth copy stays
+an exact repost), loaded and put through cleaning steps 2-3 once; each
+copy's areas are also scaled by 1.25 ** copy so copies are not near
+duplicates of each other either. For every scale, the rows of the first ``scale``
+copies get ``--repost-rate`` reposts planted: a new property_code, a week
+later, the title edited (a word dropped or a phrase appended), price and
+area moved by up to 3%, coordinates by up to ~50 m and the street left
+empty. The run reports the engine's time with exact keys only and with
+near duplicates, against the legacy remove_duplicates, the share of
+planted reposts clustered with their original, and how often
+survivorship then drops the (less complete) repost.
+
+    python -m benchmarks.listing_dedup --scales 1 5 20 64
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.cleaning_chunked import CLEANER_DIR, distinct_copies
+from benchmarks.synthetic_data import generate
+
+sys.path.insert(0, CLEANER_DIR)
+from data_cleaning_preprocessing import DanangRealEstateCleaner  # noqa: E402
+from listing_dedup import ListingDeduplicator  # noqa: E402
+
+SUFFIXES = [" - chính chủ", " giá tốt", " cần bán gấp", " liên hệ ngay"]
+
+
+def prepared_frame(db_name, base_rows):
+    cleaner = DanangRealEstateCleaner(db_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaner.load_data()
+        cleaner.handle_missing_invalid_data()
+        cleaner.normalize_address_fields()
+    df = cleaner.df
+    copy = (df['id'].to_numpy() - 1) // base_rows
+    df['area'] = df['area'] * 1.25 ** copy
+    return df
+
+
+def edited_title(title, rng):
+    words = title.split()
+    if len(words) > 6 and rng.random() < 0.5:
+        del words[rng.integers(2, len(words))]
+        return " ".join(words)
+    return title + SUFFIXES[rng.integers(len(SUFFIXES))]
+
+
+def plant_reposts(df, rate, rng):
+    """df plus reposts of a sample of its complete-enough rows, and the (original id, repost id) pairs."""
+    eligible = df.index[df['title'].notna() & (df['price'] > 0) & (df['area'] > 0) & df['street'].notna()]
+    originals = rng.choice(eligible, size=int(len(df) * rate), replace=False)
+    reposts = df.loc[originals].copy()
+    n = len(reposts)
+    reposts['id'] = df['id'].max() + 1 + np.arange(n)
+    reposts['title'] = [edited_title(title, rng) for title in reposts['title']]
+    reposts['price'] = (reposts['price'] * (1 + rng.uniform(-0.03, 0.03, n))).round(-3)
+    reposts['area'] = (reposts['area'] * (1 + rng.uniform(-0.03, 0.03, n))).round(1)
+    for col in ('latitude', 'longitude'):
+        reposts[col] = reposts[col] + rng.uniform(-0.0004, 0.0004, n)
+    reposts['property_code'] = reposts['property_code'] + "-repost"
+    reposts['posted_time'] = reposts['posted_time'] + pd.Timedelta(days=7)
+    reposts['street'] = pd.Series(pd.NA, index=reposts.index, dtype=df['street'].dtype)
+    planted = pd.DataFrame({'original': df.loc[originals, 'id'].to_numpy(), 'repost': reposts['id'].to_numpy()})
+    return pd.concat([df, reposts], ignore_index=True), planted
+
+
+def timed(run):
+    started = time.perf_counter()
+    result = run()
+    return time.perf_counter() - started, result
+
+
+def legacy_remove_duplicates(df):
+    cleaner = DanangRealEstateCleaner(None)
+    cleaner.df = df
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaner.remove_duplicates()
+    return cleaner.df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 5, 20, 64], help="copies of data.db")
+    parser.add_argument("--repost-rate", type=float, default=0.02, help="planted reposts per row")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory(prefix="listing_dedup_") as workdir:
+        db_name = os.path.join(workdir, "scaled.db")
+        base_rows = generate(1, db_name, apply_migrations=False)["rows"]
+        generate(max(args.scales), db_name, apply_migrations=False)
+        distinct_copies(db_name, base_rows)
+        frame = prepared_frame(db_name, base_rows)
+
+        print(f"Repost rate {args.repost_rate:.0%}; {os.cpu_count()} CPU(s)")
+        print("| Rows | Legacy s | Engine, exact keys s | Engine, near duplicates s | Rows/s | "
+              "Clusters (near) | Rows removed | Reposts found | Repost dropped |")
+        print("|---:|---:|---:|---:|---:|---|---:|---:|---:|")
+        for scale in sorted(args.scales):
+            df, planted = plant_reposts(frame[frame['id'] <= scale * base_rows], args.repost_rate, rng)
+            legacy_s, _ = timed(lambda: legacy_remove_duplicates(df))
+            exact_s, _ = timed(lambda: ListingDeduplicator(near_duplicates=False).deduplicate(df))
+            engine = ListingDeduplicator()
+            near_s, (kept, report) = timed(lambda: engine.deduplicate(df))
+
+            position = pd.Series(np.arange(len(df)), index=df['id'].to_numpy())
+            labels, _ = engine.cluster(df)
+            original_label = labels[position[planted['original']].to_numpy()]
+            found = original_label == labels[position[planted['repost']].to_numpy()]
+            repost_dropped = (~planted.loc[found, 'repost'].isin(kept['id'])).mean() if found.any() else float("nan")
+            near = int((report['match'] == 'near').sum())
+            print(f"| {len(df):,} | {legacy_s:.2f} | {exact_s:.2f} | {near_s:.2f} | {len(df) / near_s:,.0f} | "
+                  f"{len(report):,} ({near:,}) | {len(df) - len(kept):,} | {found.mean():.1%} | {repost_dropped:.1%} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Requests/sec of the dashboard under gunicorn's threaded (gthread) workers, for each thread count.
+
+The app serves a migrated synthetic copy of danang_batdongsan
+(benchmarks/synthetic_data.py) with the response cache disabled, so every
+request does its query work. Clients open a new connection per request.
+Results are written as JSON, in the layout of benchmarks/api_suite.py.
+benchmarks/results/load_test.json is the run that compared an ASGI mode
+(uvicorn + a2wsgi) with gunicorn at the same workers and threads; it was
+no faster, and was dropped.
+
+    python -m benchmarks.load_test --scale 10 --workers 1 --threads 1 8 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.api_suite import git_revision, percentile
+from benchmarks.synthetic_data import generate
+
+URLS = [
+    "/api/apartment-demand",
+    "/api/apartment-demand?year=2025&month=8",
+    "/api/average-sale-price-per-sqm?year=2025",
+    "/api/average-rent-price-per-sqm",
+    "/api/apartment-area-selling",
+    "/api/apartment-area-renting",
+    "/api/available-districts",
+    "/api/dashboard?year=2025",
+    "/api/apartment-map?bbox=15.9,108.0,16.2,108.4&zoom=12",
+]
+
+
+def server_command(port, workers, threads):
+    return [sys.executable, "-m", "gunicorn", "app:app", "--worker-class", "gthread",
+            "--workers", str(workers), "--threads", str(threads),
+            "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/available-districts")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def drive(port, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        i = offset
+        local = []
+        while time.perf_counter() < stop_at:
+            url = URLS[i % len(URLS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                conn.request("GET", url)
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status != 200:
+                    raise RuntimeError(response.status)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def run_server(db_name, workers, threads, concurrency, duration):
+    port = free_port()
+    env = dict(os.environ, DB_NAME=db_name, RESPONSE_CACHE_ENABLED="0",
+               WORDCLOUD_PRERENDER="0", WARM_PRICE_SEGMENTS="0", MPLBACKEND="Agg")
+    server = subprocess.Popen(server_command(port, workers, threads), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+        drive(port, concurrency, 1.0)  # warm the connection pool and page cache
+        return drive(port, concurrency, duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=10, help="copies of data.db in the synthetic table")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8], help="request threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        db_name = os.path.join(workdir, f"danang_x{args.scale}.db")
+        dataset = generate(args.scale, db_name)
+        results = {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+            "rows": dataset["rows"],
+            "workers": args.workers,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "servers": {},
+        }
+        print(f"{dataset['rows']:,} rows; {args.workers} worker(s); {args.concurrency} clients; {os.cpu_count()} CPU(s)")
+        print("| Server | Requests | Errors | req/s | p50 ms | p95 ms | p99 ms |")
+        print("|---|---:|---:|---:|---:|---:|---:|")
+        for threads in args.threads:
+            server = f"gunicorn, {threads} thread{'s' if threads > 1 else ''}"
+            r = run_server(db_name, args.workers, threads, args.concurrency, args.duration)
+            results["servers"][server] = r
+            print(f"| {server} | {r['requests']} | {r['errors']} | {r['throughput_rps']:.1f} | "
+                  f"{r['p50_ms']:.1f} | {r['p95_ms']:.1f} | {r['p99_ms']:.1f} |")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
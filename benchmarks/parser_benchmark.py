@@ -0,0 +1,144 @@
+"""
+Listing/detail page parsing speed of crawl_data/listing_parser.py vs. the original full-page BeautifulSoup parse.
+
+The corpus is a directory of saved pages (``page-*.html`` are listing pages,
+everything else detail pages); by default one is built with
+benchmarks/crawler_fixtures.py. Every backend must extract exactly the
+fields the original code extracted from every page.
+
+    python -m benchmarks.parser_benchmark --pages 20 --repeat 3
+    python -m benchmarks.parser_benchmark --corpus /path/to/saved/mogi/pages
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.crawler_fixtures import build_fixtures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_data"))
+import listing_parser  # noqa: E402
+
+
+def reference_listing_page(html):
+    """fetch_page_data's parsing before listing_parser.py, minus the price/date conversion."""
+    soup = BeautifulSoup(html, "html.parser")
+    listings = soup.find("ul", class_="props")
+    if listings is None or not listings.find_all("li"):
+        return None
+    results = []
+    for listing in listings.find_all("li"):
+        try:
+            title = listing.find("h2", class_="prop-title").text.strip()
+            price = listing.find("div", class_="price").text.strip()
+            area = float(re.findall(r'(\d+)', listing.find("ul", class_="prop-attr").find_all("li")[0].text.strip())[0])
+            bedrooms = int(re.search(r'(\d+) PN', listing.text).group(1)) if re.search(r'(\d+) PN', listing.text) else 0
+            bathrooms = int(re.search(r'(\d+) WC', listing.text).group(1)) if re.search(r'(\d+) WC', listing.text) else 0
+            location = listing.find("div", class_="prop-addr").text.strip()
+            posted_time = listing.find("div", class_="prop-created").text.strip()
+            link = listing.find("a", class_="link-overlay")
+            results.append((title, price, area, bedrooms, bathrooms, location, posted_time, link["href"] if link else None))
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            results.append(e)
+    return results
+
+
+def reference_detail_page(html):
+    """fetch_details' parsing before listing_parser.py."""
+    soup = BeautifulSoup(html, "html.parser")
+    coordinates = ''
+    iframe_tag = soup.find("iframe", title="map")
+    if iframe_tag:
+        iframe_src = iframe_tag.get("data-src")
+        if iframe_src and "q=" in iframe_src:
+            coordinates = iframe_src.split("q=")[-1].split("&")[0]
+    property_code = ''
+    info_attrs = soup.find("div", class_="info-attrs")
+    if info_attrs:
+        for info_attr in info_attrs.find_all("div", class_="info-attr"):
+            if info_attr.find("span", string="Mã BĐS"):
+                property_code = info_attr.find_all("span")[1].text.strip()
+                break
+    address_tag = soup.find("div", class_="address")
+    detailed_address = address_tag.text.strip() if address_tag else ''
+    street, ward, district, city = None, None, None, None
+    if detailed_address:
+        location_parts = detailed_address.split(", ")
+        if len(location_parts) >= 4:
+            street, ward, district, city = location_parts[:4]
+    return property_code, street, ward, district, city, coordinates
+
+
+def comparable(result):
+    # Invalid <li> entries only need to be invalid in both; the messages differ between backends
+    if result is None or isinstance(result, tuple):
+        return result
+    return ["invalid" if isinstance(item, Exception) else item for item in result]
+
+
+def load_corpus(directory):
+    listing_pages, detail_pages = [], []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            if name.endswith(".html"):
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    (listing_pages if name.startswith("page-") else detail_pages).append(f.read())
+    return listing_pages, detail_pages
+
+
+def time_parser(parse, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [parse(html) for html in pages]
+        best = min(best, time.perf_counter() - started)
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="directory of saved pages (default: build fixtures)")
+    parser.add_argument("--pages", type=int, default=20, help="listing pages per category when building fixtures")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="parser_corpus_") as workdir:
+        corpus = args.corpus or os.path.join(workdir, "mogi")
+        if not args.corpus:
+            build_fixtures(corpus, pages=args.pages, per_page=args.per_page)
+        listing_pages, detail_pages = load_corpus(corpus)
+
+    backends = ["reference (html.parser, full page)", "html.parser + SoupStrainer"]
+    if listing_parser.lxml is not None:
+        backends.append("lxml")
+    size_mb = sum(len(html.encode("utf-8")) for html in listing_pages + detail_pages) / 1024 / 1024
+    print(f"Corpus: {len(listing_pages)} listing pages, {len(detail_pages)} detail pages, {size_mb:.1f} MB; best of {args.repeat}")
+    print("| Parser | Listing pages/s | Detail pages/s | Fields identical |")
+    print("|---|---:|---:|---|")
+
+    expected = None
+    for name in backends:
+        if name.startswith("reference"):
+            parse_listing, parse_detail = reference_listing_page, reference_detail_page
+        else:
+            backend = name.split(" ")[0]
+            parse_listing = lambda html, backend=backend: listing_parser.parse_listing_page(html, backend)
+            parse_detail = lambda html, backend=backend: listing_parser.parse_detail_page(html, backend)
+        listings, listing_s = time_parser(parse_listing, listing_pages, args.repeat)
+        details, detail_s = time_parser(parse_detail, detail_pages, args.repeat)
+        results = [comparable(r) for r in listings] + details
+        expected = expected or results
+        print(f"| {name} | {len(listing_pages) / listing_s:,.1f} | {len(detail_pages) / detail_s:,.1f} | "
+              f"{'yes' if results == expected else 'NO'} |")
+        if results != expected:
+            raise SystemExit(f"{name} extracted different fields than the reference parser")
+
+
+if __name__ == "__main__":
+    main()
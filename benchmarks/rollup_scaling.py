@@ -0,0 +1,70 @@
+"""
+Dashboard query latency as danang_batdongsan grows, answered from listing_rollup.
+
+    python -m benchmarks.rollup_scaling --scales 1 10 100
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.calendar_index_report import build_scaled_copy
+from config import Config
+from services.analysis import Analysis
+from services.schema import migrate
+
+CALLS = [
+    ("get_apartment_demand(1)", lambda a: a.get_apartment_demand(1)),
+    ("get_apartment_demand(0, 2025, 8)", lambda a: a.get_apartment_demand(0, 2025, 8)),
+    ("get_avg_price_data(1)", lambda a: a.get_avg_price_data(1)),
+    ("get_avg_price_data(0, district)", lambda a: a.get_avg_price_data(0, district="Quận Hải Châu")),
+    ("get_apartment_area_selling()", lambda a: a.get_apartment_area_selling()),
+    ("get_apartment_area_renting()", lambda a: a.get_apartment_area_renting()),
+]
+
+
+def run(scales, repeat, source=Config.DB_NAME):
+    results = {}
+    for scale in scales:
+        workdir = tempfile.mkdtemp(prefix="rollup_bench_")
+        db_path = os.path.join(workdir, "scaled.db")
+        try:
+            rows = build_scaled_copy(source, db_path, scale)
+            migrate(db_path)
+            analysis = Analysis(db_path)
+            timings = {}
+            for name, call in CALLS:
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    call(analysis)
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[name] = statistics.median(samples)
+            assert analysis.check_rollup_consistency() == []
+            analysis.close()
+            analysis.db.pool.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results[rows] = timings
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.scales, args.repeat)
+    header = "| Query | " + " | ".join(f"{rows:,} rows (ms)" for rows in results) + " |"
+    print(header)
+    print("|---|" + "---:|" * len(results))
+    for name, _ in CALLS:
+        print(f"| `{name}` | " + " | ".join(f"{timings[name]:.3f}" for timings in results.values()) + " |")
+
+
+if __name__ == "__main__":
+    main()
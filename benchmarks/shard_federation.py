@@ -0,0 +1,184 @@
+"""
+Per-city shards queried through FederatedAnalysis vs. one table holding every city.
+
+Builds one large shard (data.db scaled up, the default city) and several
+small ones (data.db relabelled as other cities), plus a monolithic
+database with all of their rows. Every federated query must return what
+the monolith returns; their latencies are compared with the fan-out run
+in parallel and serially. Finally a shard's rollup is rebuilt while
+another writer commits to a small shard, and to the monolith while the
+monolith is rebuilt, to show a rebuild only locks its own shard.
+
+    python -m benchmarks.shard_federation --big-scale 10 --cities 3
+"""
+
+import argparse
+import math
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic_data import generate
+from config import Config
+from services.analysis import Analysis, FederatedAnalysis
+from services.schema import rebuild_rollups
+from services.shards import CITY_NAMES, rebuild_shard
+
+LISTING_COLUMNS = """title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time,
+    is_selling, property_code, coordinates, detail_url, posted_date, posted_year, posted_month, latitude, longitude"""
+
+QUERIES = [
+    ("dashboard snapshot", "get_dashboard_snapshot", (), {"year": 2024}),
+    ("demand, sale", "get_apartment_demand", (1,), {}),
+    ("area buckets, rent", "get_apartment_area_renting", (), {}),
+    ("price/m2, sale", "get_avg_price_data", (1,), {}),
+    ("map count, whole country", "count_apartments_in_bbox", (1, (-90.0, -180.0, 90.0, 180.0)), {}),
+    ("map clusters, zoom 8", "get_apartment_clusters", (1, (-90.0, -180.0, 90.0, 180.0), 60 * 360.0 / (256 * 2 ** 8)), {}),
+]
+
+
+def relabel(path, city, index):
+    """Turn a copy of data.db into another city: names, property codes and a shifted position."""
+    name = CITY_NAMES[city]
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("""
+            UPDATE danang_batdongsan
+            SET location = replace(location, 'Đà Nẵng', ?), city = ?, property_code = ? || '-' || property_code,
+                latitude = latitude - ?, longitude = longitude - ?
+        """, (name, name, city, 2.0 * index, 1.0 * index))
+    conn.close()
+
+
+def build_monolith(target, shards):
+    shutil.copy(shards[Config.DEFAULT_CITY], target)
+    conn = sqlite3.connect(target)
+    for city, path in shards.items():
+        if city == Config.DEFAULT_CITY:
+            continue
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        with conn:
+            conn.execute(f"INSERT INTO danang_batdongsan ({LISTING_COLUMNS}) SELECT {LISTING_COLUMNS} FROM shard.danang_batdongsan")
+        conn.execute("DETACH DATABASE shard")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def normalized(value):
+    """Comparable form of a query result: row order ignored where the SQL leaves ties unordered."""
+    if isinstance(value, dict):
+        return {key: normalized(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((tuple(row) if isinstance(row, (list, tuple)) else row for row in value),
+                      key=lambda row: tuple((item is None, str(item)) for item in (row if isinstance(row, tuple) else (row,))))
+    return value
+
+
+def same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def timed(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def write_latency_during_rebuild(rebuild, db_name):
+    """Commit latency (ms) of a one-row insert/delete on ``db_name`` started while ``rebuild`` runs."""
+    thread = threading.Thread(target=rebuild)
+    thread.start()
+    time.sleep(0.05)
+    conn = sqlite3.connect(db_name, timeout=60)
+    started = time.perf_counter()
+    with conn:
+        row_id = conn.execute("INSERT INTO danang_batdongsan (title, is_selling) VALUES ('probe', 1)").lastrowid
+        conn.execute("DELETE FROM danang_batdongsan WHERE id = ?", (row_id,))
+    elapsed = time.perf_counter() - started
+    conn.close()
+    thread.join()
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--big-scale", type=int, default=10, help="copies of data.db in the default city's shard")
+    parser.add_argument("--cities", type=int, default=3, help="small shards besides the default city")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = Config.DB_NAME
+    with tempfile.TemporaryDirectory(prefix="shard_federation_") as workdir:
+        shard_dir = os.path.join(workdir, "shards")
+        os.makedirs(shard_dir)
+        Config.DB_NAME, Config.SHARD_DIR = os.path.join(shard_dir, f"{Config.DEFAULT_CITY}.db"), shard_dir
+        generate(args.big_scale, Config.DB_NAME, source)
+        shards = {Config.DEFAULT_CITY: Config.DB_NAME}
+        others = [city for city in CITY_NAMES if city != Config.DEFAULT_CITY][:args.cities]
+        for index, city in enumerate(others, start=1):
+            shards[city] = os.path.join(shard_dir, f"{city}.db")
+            generate(1, shards[city], source)
+            relabel(shards[city], city, index)
+        monolith_db = os.path.join(workdir, "monolith.db")
+        build_monolith(monolith_db, shards)
+
+        sizes = {city: sqlite3.connect(path).execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+                 for city, path in shards.items()}
+        print(f"Shards: {', '.join(f'{city} {count:,}' for city, count in sizes.items())} rows; "
+              f"monolith {sum(sizes.values()):,}; {os.cpu_count()} CPU(s); median of {args.repeat}")
+
+        monolith = Analysis(monolith_db)
+        parallel = FederatedAnalysis(shards)
+        serial = FederatedAnalysis(shards, executor=ThreadPoolExecutor(max_workers=1))
+        big_only = Analysis(shards[Config.DEFAULT_CITY])
+        small_only = Analysis(shards[others[0]])
+        print("| Query | Monolith ms | Federated, parallel ms | Federated, serial ms | Largest shard alone ms "
+              "| One small shard alone ms | Same result |")
+        print("|---|---:|---:|---:|---:|---:|---|")
+        for name, method, query_args, kwargs in QUERIES:
+            expected = normalized(getattr(monolith, method)(*query_args, **kwargs))
+            actual = normalized(getattr(parallel, method)(*query_args, **kwargs))
+            ok = same(expected, actual)
+            timings = [timed(lambda analysis=analysis: getattr(analysis, method)(*query_args, **kwargs), args.repeat)
+                       for analysis in (monolith, parallel, serial, big_only, small_only)]
+            print(f"| {name} | " + " | ".join(f"{ms:.1f}" for ms in timings) + f" | {'yes' if ok else 'NO'} |")
+            if not ok:
+                raise SystemExit(f"Federated {method} differs from the monolith")
+        monolith.close()
+        big_only.close()
+        small_only.close()
+        serial.executor.shutdown()
+
+        small_city = others[0]
+        rebuild_s = []
+        shard_ms = write_latency_during_rebuild(lambda: rebuild_s.append(rebuild_shard(Config.DEFAULT_CITY)), shards[small_city])
+
+        def rebuild_monolith():
+            started = time.perf_counter()
+            conn = sqlite3.connect(monolith_db)
+            with conn:
+                rebuild_rollups(conn)
+            conn.close()
+            rebuild_s.append(time.perf_counter() - started)
+        monolith_ms = write_latency_during_rebuild(rebuild_monolith, monolith_db)
+        print(f"\nRollup rebuild of {Config.DEFAULT_CITY}: {rebuild_s[0]:.2f}s; a write to {small_city} meanwhile "
+              f"committed in {shard_ms:.1f} ms")
+        print(f"Rollup rebuild of the monolith: {rebuild_s[1]:.2f}s; a write meanwhile committed in {monolith_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Import time of app.py against scaled copies of danang_batdongsan.
+
+Each scale gets its own migrated copy; ``import app`` is timed in a fresh
+interpreter with the background warm-up disabled, and the price-segment
+snapshot that used to be built at import is timed separately on first use.
+
+    python -m benchmarks.startup_time --scales 1 10 100
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.calendar_index_report import build_scaled_copy
+from config import Config
+from services.schema import migrate
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+start = time.perf_counter()
+app.price_segments.get()
+first_use = time.perf_counter() - start
+print(json.dumps({"import_s": imported, "first_index3_s": first_use}))
+"""
+
+
+def measure(db_path, repeat):
+    env = dict(os.environ, DB_NAME=db_path, WARM_PRICE_SEGMENTS="0", MPLBACKEND="Agg")
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("| Rows | import app (s) | first /index3 build (s) |")
+    print("|---:|---:|---:|")
+    for scale in args.scales:
+        workdir = tempfile.mkdtemp(prefix="startup_bench_")
+        db_path = os.path.join(workdir, "scaled.db")
+        try:
+            rows = build_scaled_copy(Config.DB_NAME, db_path, scale)
+            migrate(db_path)
+            result = measure(db_path, args.repeat)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"| {rows:,} | {result['import_s']:.3f} | {result['first_index3_s']:.3f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Scaled synthetic copies of danang_batdongsan.
+
+Every real listing is replayed ``scale`` times with its district, location,
+ward, posted_time and is_selling unchanged, price and area jittered by up to
+±10% and coordinates by up to ~200 m, so the district/price/area/date
+distributions of the real data carry over while rows stay distinct.
+
+    python -m benchmarks.synthetic_data --scale 100 --output /tmp/danang_x100.db
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+from config import Config
+from services.schema import migrate
+
+BASE_COLUMNS = [
+    "title", "price", "area", "location", "street", "ward", "district", "city",
+    "bedrooms", "bathrooms", "posted_time", "is_selling", "property_code", "coordinates",
+]
+
+# Uniform in [-1, 1] from SQLite's 64-bit random()
+UNIT_NOISE = "((abs(random()) % 200001) - 100000) / 100000.0"
+
+
+def generate(scale, target, source=Config.DB_NAME, apply_migrations=True):
+    """Write ``scale`` jittered copies of the source listings into a fresh ``target`` database."""
+    if os.path.exists(target):
+        os.remove(target)
+    started = time.perf_counter()
+    conn = sqlite3.connect(target)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"""
+        CREATE TABLE danang_batdongsan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT, price REAL, area REAL, location TEXT, street TEXT, ward TEXT,
+            district TEXT, city TEXT, bedrooms INTEGER, bathrooms INTEGER, posted_time TEXT,
+            is_selling BOOLEAN, property_code TEXT, coordinates TEXT
+        );
+    """)
+    conn.execute("ATTACH DATABASE ? AS source", (source,))
+    columns = ", ".join(BASE_COLUMNS)
+    conn.execute(f"CREATE TEMP TABLE seed AS SELECT {columns} FROM source.danang_batdongsan")
+    conn.execute("DETACH DATABASE source")
+
+    jittered = f"""
+        title,
+        CASE WHEN copy = 0 THEN price ELSE round(price * (1 + 0.1 * {UNIT_NOISE}), -3) END,
+        CASE WHEN copy = 0 THEN area ELSE round(area * (1 + 0.1 * {UNIT_NOISE}), 1) END,
+        location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling,
+        CASE WHEN copy = 0 THEN property_code ELSE property_code || '-' || copy END,
+        CASE
+            WHEN copy = 0 OR instr(coordinates, ',') = 0 THEN coordinates
+            ELSE printf('%.7f,%.7f',
+                        CAST(substr(coordinates, 1, instr(coordinates, ',') - 1) AS REAL) + 0.002 * {UNIT_NOISE},
+                        CAST(substr(coordinates, instr(coordinates, ',') + 1) AS REAL) + 0.002 * {UNIT_NOISE})
+        END
+    """
+    with conn:
+        for copy in range(scale):
+            conn.execute(f"INSERT INTO danang_batdongsan ({columns}) SELECT {jittered} FROM (SELECT *, ? AS copy FROM seed)", (copy,))
+    rows = conn.execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+    conn.close()
+
+    if apply_migrations:
+        migrate(target)
+    return {"scale": scale, "rows": rows, "generate_s": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--source", default=Config.DB_NAME)
+    args = parser.parse_args()
+    print(generate(args.scale, args.output, args.source))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,41 @@
+import os
+
+
 class Config:
-    DB_NAME = 'data.db'
-    DB_PATH = 'sqlite:///' + DB_NAME
\ No newline at end of file
+    DB_NAME = os.environ.get('DB_NAME', 'data.db')
+    DB_PATH = 'sqlite:///' + DB_NAME
+
+    # One database per city: DEFAULT_CITY lives in DB_NAME, every other city in
+    # SHARD_DIR/<city>.db (the crawler's --city writes there; see services/shards.py)
+    DEFAULT_CITY = os.environ.get('DEFAULT_CITY', 'da-nang')
+    SHARD_DIR = os.environ.get('SHARD_DIR', 'shards')
+    SHARD_QUERY_WORKERS = 4  # shards queried at once by FederatedAnalysis
+
+    # Read-only connection pool used by services.database.Database
+    DB_POOL_SIZE = 8
+    DB_POOL_TIMEOUT = 5.0  # seconds to wait for a free connection
+    DB_STATEMENT_CACHE_SIZE = 256
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_CACHE_SIZE = -64 * 1024  # negative = KiB, i.e. 64 MiB page cache
+    DB_FETCH_BATCH_SIZE = 10000  # rows per fetchmany() in Database.iter_query/query_columns
+
+    # In-process cache for /api responses, invalidated when the data changes
+    RESPONSE_CACHE_MAX_ENTRIES = 512
+    RESPONSE_CACHE_TTL = 3600  # seconds
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+
+    # Build the /index3 price-segment snapshot on a background thread at startup
+    WARM_PRICE_SEGMENTS = os.environ.get('WARM_PRICE_SEGMENTS', '1') == '1'
+
+    # Rendered /api/apartment_demand_wordcloud images
+    WORDCLOUD_CACHE_DIR = os.environ.get('WORDCLOUD_CACHE_DIR', 'cache/wordcloud')
+    WORDCLOUD_PRERENDER = os.environ.get('WORDCLOUD_PRERENDER', '1') == '1'
+    WORDCLOUD_WATCH_INTERVAL = 5.0  # seconds between data version checks
+
+    # /api/apartment-map: grid-cluster below this zoom or when a viewport holds too many points
+    MAP_CLUSTER_MAX_ZOOM = 15
+    MAP_MAX_POINTS = 1000
+    MAP_CLUSTER_CELL_PX = 60  # cluster cell edge in screen pixels
+
+    # Concurrency: independent queries of one request
+    QUERY_WORKERS = 8
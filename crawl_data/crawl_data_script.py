@@ -1,16 +1,94 @@
+import argparse
+import os
+import random
 import requests
 import sqlite3
 import re
-from bs4 import BeautifulSoup
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urljoin
 import time
 
+# config.py và services/ nằm ở thư mục gốc của repo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl_metrics import PARSE_BUCKETS, CrawlMetrics
+from crawl_scheduler import CrawlScheduler
+from http_cache import HttpCache
+from listing_parser import default_backend, parse_detail_page, parse_last_page, parse_listing_page
+from page_archive import PageArchive
+from rate_limiter import AdaptiveConcurrency, HostRateLimiter
+from config import Config
+from services.schema import migrate
+
+# Trạng thái HTTP đáng thử lại: bị giới hạn tốc độ hoặc lỗi tạm thời phía server
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# URL chi tiết của mogi.vn kết thúc bằng "-id<Mã BĐS>"
+LISTING_ID_PATTERN = re.compile(r'-id(\d+)(?:$|[?#])')
+
+# Tin đã có (cùng Mã BĐS hoặc URL chi tiết) chỉ được cập nhật giá và ngày đăng khi chúng thay đổi
+UPSERT_LISTING_SQL = """
+    INSERT INTO danang_batdongsan (title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates, detail_url, posted_date, posted_year, posted_month, latitude, longitude)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (property_code) WHERE property_code <> '' DO UPDATE SET
+        price = excluded.price, posted_time = excluded.posted_time, posted_date = excluded.posted_date,
+        posted_year = excluded.posted_year, posted_month = excluded.posted_month,
+        detail_url = IFNULL(detail_url, excluded.detail_url)
+    WHERE price IS NOT excluded.price OR posted_time IS NOT excluded.posted_time
+       OR (detail_url IS NULL AND excluded.detail_url IS NOT NULL)
+    ON CONFLICT (detail_url) WHERE detail_url IS NOT NULL DO UPDATE SET
+        price = excluded.price, posted_time = excluded.posted_time, posted_date = excluded.posted_date,
+        posted_year = excluded.posted_year, posted_month = excluded.posted_month
+    WHERE price IS NOT excluded.price OR posted_time IS NOT excluded.posted_time;
+"""
+
 class RealEstateCrawler:
-    def __init__(self, db_name="data.db"):
+    def __init__(self, db_name=Config.DB_NAME, workers=1, requests_per_second=1.0, burst=1,
+                 max_retries=3, retry_backoff=1.0, cache_dir=None, cache_max_age=86400,
+                 cache_max_bytes=512 * 1024 * 1024, incremental=False, known_page_ratio=0.8,
+                 batch_size=200, parser=None, archive_path=None, max_in_flight=None):
         self.db_name = db_name
+        # Bộ đệm các tin chưa ghi; được ghi xuống DB mỗi khi đủ batch_size tin
         self.data = []
+        self.batch_size = batch_size
+        self.write_stats = {"rows": 0, "inserted": 0, "updated": 0, "batches": 0, "seconds": 0.0}
         self.conn = sqlite3.connect(self.db_name)
         self.cursor = self.conn.cursor()
+        # WAL cho phép dashboard đọc trong lúc crawler ghi từng batch
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.table_ready = False
+        # workers > 1 bật chế độ lấy trang chi tiết song song; số request đang chạy
+        # không vượt quá workers và mỗi host bị giới hạn requests_per_second
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawler") if workers > 1 else None
+        # Giới hạn chung số request đang chạy (mọi danh mục, cả trang danh sách lẫn chi tiết);
+        # tự giảm khi server trả lỗi hoặc chậm đi và tăng dần lại khi ổn định
+        self.concurrency = AdaptiveConcurrency(max_in_flight) if max_in_flight else None
+        # Một Session dùng chung giữ kết nối keep-alive tới mỗi host thay vì mở TCP/TLS mới cho từng request
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(workers, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.http_cache = HttpCache(cache_dir, cache_max_age, cache_max_bytes) if cache_dir else None
+        # Chế độ incremental: bỏ qua trang chi tiết của tin đã có trong DB và dừng khi
+        # tỷ lệ tin đã biết trên một trang đạt known_page_ratio
+        self.incremental = incremental
+        self.known_page_ratio = known_page_ratio
+        self.known = None
+        # "lxml" nếu đã cài, nếu không thì "html.parser" của BeautifulSoup
+        self.parser = parser or default_backend()
+        # url trang danh sách -> số trang cuối đọc từ phân trang (dùng bởi crawl_scheduler.py)
+        self.last_pages = {}
+        # HTML gốc của mọi trang được lưu lại để phân tích lại offline (parse_archive.py)
+        self.archive = PageArchive(archive_path) if archive_path else None
+        # Thời gian từng request/parse/ghi DB, số byte, tin bị lọc và lỗi theo loại (crawl_metrics.py)
+        self.metrics = CrawlMetrics()
 
     def create_table(self):
         self.cursor.execute("""
@@ -29,12 +107,58 @@ class RealEstateCrawler:
                 posted_time TEXT,
                 is_selling BOOLEAN,
                 property_code TEXT,
-                coordinates TEXT
+                coordinates TEXT,
+                posted_date TEXT,
+                posted_year INTEGER,
+                posted_month INTEGER,
+                latitude REAL,
+                longitude REAL,
+                detail_url TEXT
             );
         """)
         self.conn.commit()
+        # Cột ngày/tọa độ dạng số, rollup và khóa duy nhất property_code/detail_url (services/schema.py);
+        # bản sao cũ của cùng một tin được chuyển sang danang_batdongsan_superseded, không bị xóa
+        migrate(self.db_name)
+        # Tiến độ crawl của từng danh mục: trang cuối cùng đã được ghi xuống DB
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_checkpoint (
+                base_url TEXT PRIMARY KEY,
+                page INTEGER NOT NULL,
+                last_listing TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+        self.table_ready = True
+
+    def load_known_listings(self):
+        if not self.table_ready:
+            self.create_table()
+        self.known = {}
+        for detail_url, property_code, *details in self.cursor.execute("""
+            SELECT detail_url, property_code, street, ward, district, city, coordinates
+            FROM danang_batdongsan WHERE property_code <> ''
+        """):
+            self.known[property_code] = (property_code, *details)
+            if detail_url:
+                self.known[detail_url] = self.known[property_code]
+        print(f"Đã có {len(self.known)} khóa tin đăng trong {self.db_name}")
 
-    def convert_price_to_number(self, price):
+    def known_details(self, detail_url):
+        """Thông tin chi tiết đã lưu của tin đăng (tra theo URL hoặc Mã BĐS trong URL), None nếu là tin mới."""
+        if not self.incremental:
+            return None
+        if self.known is None:
+            self.load_known_listings()
+        if detail_url in self.known:
+            return self.known[detail_url]
+        match = LISTING_ID_PATTERN.search(detail_url)
+        return self.known.get(match.group(1)) if match else None
+
+    @staticmethod
+    def convert_price_to_number(price):
         price = price.lower().strip()
         if 'tỷ' in price and 'triệu' in price:
             ty, trieu = map(float, re.findall(r'(\d+)', price))
@@ -52,125 +176,380 @@ class RealEstateCrawler:
             return 0
         return price
 
-    def convert_posted_time(self, posted_time):
+    @staticmethod
+    def convert_posted_time(posted_time, today=None):
+        # today: ngày trang được tải về; khi phân tích lại từ archive không được dùng ngày hiện tại
+        today = today or datetime.now()
         posted_time = posted_time.replace("-", "/")
         if "Hôm nay" in posted_time:
-            return datetime.now().strftime("%d-%m-%Y")
+            return today.strftime("%d-%m-%Y")
         elif "Hôm qua" in posted_time:
-            return (datetime.now() - timedelta(days=1)).strftime("%d-%m-%Y")
+            return (today - timedelta(days=1)).strftime("%d-%m-%Y")
         else:
             return posted_time.replace("/", "-")
 
+    def parse_coordinates(self, coordinates):
+        try:
+            latitude, longitude = coordinates.split(",")
+            return float(latitude), float(longitude)
+        except (AttributeError, ValueError):
+            return None, None
+
+    def retry_delay(self, response, attempt):
+        # Full jitter: ngẫu nhiên trong [0, backoff * 2^attempt], tôn trọng Retry-After nếu có
+        delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def send(self, url, kind):
+        """Một lần gửi request: chờ slot đồng thời (nếu có) và token của host, đo thời gian phản hồi."""
+        if self.concurrency:
+            self.concurrency.acquire()
+        ok = False
+        started = time.perf_counter()
+        try:
+            self.metrics.inc("crawler_rate_limit_wait_seconds_total", self.rate_limiter.acquire(url))
+            started = time.perf_counter()
+            if self.http_cache:
+                response = self.http_cache.fetch(self.session, url, timeout=30)
+            else:
+                response = self.session.get(url, timeout=30)
+            ok = response.status_code not in RETRY_STATUSES
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.observe("crawler_request_seconds", elapsed, kind=kind)
+            if self.concurrency and self.concurrency.release(elapsed, ok):
+                self.metrics.inc("crawler_concurrency_decreases_total")
+
+    def get(self, url, max_age=None, kind="detail"):
+        metrics = self.metrics
+        if self.http_cache:
+            cached = self.http_cache.fresh(url, max_age)
+            if cached is not None:
+                metrics.inc("crawler_cache_hits_total", kind=kind)
+                return cached
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.send(url, kind)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                response, reason = None, e
+                metrics.inc("crawler_retries_total", kind=kind, reason=type(e).__name__)
+            else:
+                revalidated = getattr(response, "from_cache", False)
+                metrics.inc("crawler_requests_total", kind=kind, status=str(304 if revalidated else response.status_code))
+                if not revalidated:
+                    metrics.inc("crawler_downloaded_bytes_total", len(response.content), kind=kind)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    break
+                reason = f"HTTP {response.status_code}"
+                metrics.inc("crawler_retries_total", kind=kind, reason=reason)
+            delay = self.retry_delay(response, attempt)
+            print(f"Thử lại {url} sau {delay:.1f}s ({reason})")
+            time.sleep(delay)
+        response.raise_for_status()
+        return response
+
     def fetch_details(self, detail_url):
         try:
-            response = requests.get(detail_url, timeout=30)
-            response.raise_for_status()
+            response = self.get(detail_url)
         except requests.exceptions.RequestException as e:
             print(f"Lỗi khi lấy dữ liệu chi tiết từ {detail_url}: {e}")
+            self.metrics.error("detail_fetch", e)
             return '', '', '', '', '', ''
 
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        coordinates = ''
-        iframe_tag = soup.find("iframe", title="map")
-        if iframe_tag:
-            iframe_src = iframe_tag.get("data-src")
-            if iframe_src and "q=" in iframe_src:
-                coords = iframe_src.split("q=")[-1].split("&")[0]
-                coordinates = coords
-
-        property_code = ''
-        info_attrs = soup.find("div", class_="info-attrs")
-        if info_attrs:
-            for info_attr in info_attrs.find_all("div", class_="info-attr"):
-                label = info_attr.find("span", text="Mã BĐS")
-                if label:
-                    property_code = info_attr.find_all("span")[1].text.strip()
-                    break
+        if self.archive:
+            self.archive.add(detail_url, "detail", response.text)
+        with self.metrics.timer("crawler_parse_seconds", PARSE_BUCKETS, kind="detail"):
+            details = parse_detail_page(response.text, self.parser)
+        self.metrics.inc("crawler_pages_total", kind="detail")
+        return details
+
+    def fetch_details_safely(self, detail_url):
+        # Lỗi phân tích trang chi tiết chỉ làm bỏ qua tin đăng đó, như khi chạy tuần tự
+        try:
+            return self.fetch_details(detail_url)
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            return e
+
+    @classmethod
+    def listing_candidate(cls, listing, url, is_selling, today=None, metrics=None):
+        """([title, price, area, location, bedrooms, bathrooms, posted_time], detail_url), None nếu tin bị lọc bỏ.
+
+        Lý do lọc (bedrooms, price, area, selling_price) được đếm vào metrics nếu có.
+        """
+        if isinstance(listing, Exception):
+            raise listing
+        title, price, area, bedrooms, bathrooms, location, posted_time, href = listing
+        posted_time = cls.convert_posted_time(posted_time, today)
+
+        price = cls.convert_price_to_number(price)
+
+        if bedrooms > 5:
+            reason = "bedrooms"
+        elif price < 1_000_000:
+            reason = "price"
+        elif area < 10:
+            reason = "area"
+        elif is_selling and price < 100_000_000:
+            reason = "selling_price"
+        else:
+            reason = None
+        if reason:
+            if metrics:
+                metrics.inc("crawler_listings_skipped_total", reason=reason)
+            return None
+
+        if href is None:
+            raise TypeError("tin đăng không có link chi tiết")
+        return [title, price, area, location, bedrooms, bathrooms, posted_time], urljoin(url, href)
 
-        address_tag = soup.find("div", class_="address")
-        detailed_address = address_tag.text.strip() if address_tag else ''
-        street, ward, district, city = None, None, None, None
-        if detailed_address:
-            location_parts = detailed_address.split(", ")
-            if len(location_parts) >= 4:
-                street, ward, district, city = location_parts[:4]
+    def add_listing(self, fields, detail_url, details, is_selling, verbose=True, rows=None):
+        if isinstance(details, Exception):
+            print(f"Lỗi khi xử lý 1 tin đăng: {details}")
+            self.metrics.error("detail_parse", details)
+            return
+        title, price, area, location, bedrooms, bathrooms, posted_time = fields
+        property_code, street, ward, district, city, coordinates = details
+        if self.incremental and property_code:
+            self.known[detail_url] = self.known[property_code] = details
 
-        return property_code, street, ward, district, city, coordinates
+        if verbose:
+            print(f"- {title} | {price} | {area} | {location} | {street} | {ward} | {district} | {city} | {bedrooms} PN | {bathrooms} WC | {posted_time} | {'Mua' if is_selling else 'Thuê'} | Mã BĐS: {property_code} | Tọa độ: {coordinates}")
+        (self.data if rows is None else rows).append([title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates, detail_url])
+        self.metrics.inc("crawler_listings_total", kind="mua" if is_selling else "thue")
 
-    def fetch_page_data(self, url, is_selling):
+    def fetch_page_data(self, url, is_selling, rows=None):
+        """True nếu trang có tin, False nếu hết dữ liệu (hoặc dừng sớm), None nếu lỗi mạng.
+
+        Tin được thêm vào rows (mặc định self.data) để scheduler crawl nhiều trang cùng lúc.
+        """
         print(f"Đang crawl trang: {url}")
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            # Trang danh sách thay đổi liên tục nên luôn được kiểm tra lại với server
+            response = self.get(url, max_age=0, kind="listing")
         except requests.exceptions.RequestException as e:
             print(f"Lỗi khi lấy dữ liệu từ {url}: {e}")
-            return False
+            self.metrics.error("listing_fetch", e)
+            # None (khác False) báo trang lỗi chứ không phải hết dữ liệu, để lần sau crawl tiếp từ đây
+            return None
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        listings = soup.find("ul", class_="props")
-
-        if listings is None or not listings.find_all("li"):
+        if self.archive:
+            self.archive.add(url, "listing", response.text)
+        with self.metrics.timer("crawler_parse_seconds", PARSE_BUCKETS, kind="listing"):
+            listings = parse_listing_page(response.text, self.parser)
+            last_page = parse_last_page(response.text, self.parser)
+        self.metrics.inc("crawler_pages_total", kind="listing")
+        if last_page:
+            self.last_pages[url] = last_page
+        if listings is None:
             print("Không còn dữ liệu nào trên trang này.")
             return False
 
-        for listing in listings.find_all("li"):
+        candidates = []
+        for listing in listings:
             try:
-                title = listing.find("h2", class_="prop-title").text.strip()
-                price = listing.find("div", class_="price").text.strip()
-                area = float(re.findall(r'(\d+)', listing.find("ul", class_="prop-attr").find_all("li")[0].text.strip())[0])
-                bedrooms = int(re.search(r'(\d+) PN', listing.text).group(1)) if re.search(r'(\d+) PN', listing.text) else 0
-                bathrooms = int(re.search(r'(\d+) WC', listing.text).group(1)) if re.search(r'(\d+) WC', listing.text) else 0
-                location = listing.find("div", class_="prop-addr").text.strip()
-                posted_time = self.convert_posted_time(listing.find("div", class_="prop-created").text.strip())
-
-                price = self.convert_price_to_number(price)
-
-                if bedrooms > 5 or price < 1_000_000 or area < 10 or (is_selling and price < 100_000_000):
-                    continue
-
-                detail_url = listing.find("a", class_="link-overlay")["href"]
-                property_code, street, ward, district, city, coordinates = self.fetch_details(detail_url)
-
-                print(f"- {title} | {price} | {area} | {location} | {street} | {ward} | {district} | {city} | {bedrooms} PN | {bathrooms} WC | {posted_time} | {'Mua' if is_selling else 'Thuê'} | Mã BĐS: {property_code} | Tọa độ: {coordinates}")
-                self.data.append([title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates])
+                candidate = self.listing_candidate(listing, url, is_selling, metrics=self.metrics)
             except (AttributeError, IndexError, TypeError, ValueError) as e:
                 print(f"Lỗi khi xử lý 1 tin đăng: {e}")
+                self.metrics.error("listing_parse", e)
                 continue
-            time.sleep(1)
+            if candidate:
+                candidates.append(candidate)
+
+        known = {detail_url: self.known_details(detail_url) for _, detail_url in candidates}
+        detail_urls = [detail_url for detail_url, details in known.items() if details is None]
+
+        # Trang chi tiết được lấy song song (nếu workers > 1) nhưng kết quả giữ đúng thứ tự tin đăng
+        if self.executor:
+            results = self.executor.map(self.fetch_details_safely, detail_urls)
+        else:
+            results = map(self.fetch_details_safely, detail_urls)
+        fetched = dict(zip(detail_urls, results))
+
+        for fields, detail_url in candidates:
+            self.add_listing(fields, detail_url, known[detail_url] or fetched[detail_url], is_selling, rows=rows)
 
+        known_count = sum(details is not None for details in known.values())
+        if self.incremental and known and known_count >= self.known_page_ratio * len(known):
+            print(f"{known_count}/{len(known)} tin trên trang đã có trong DB, dừng crawl danh mục này.")
+            return False
         return True
 
-    def save_to_database(self):
-        self.create_table()
+    def flush(self, base_url=None, page=None, completed=False):
+        """Ghi các tin trong bộ đệm bằng một transaction executemany, cùng checkpoint của trang vừa xong."""
+        if not self.table_ready:
+            self.create_table()
+        params = []
         for row in self.data:
-            row[10] = datetime.strptime(row[10], "%d-%m-%Y").strftime("%d-%m-%Y")
-            self.cursor.execute("""
-                INSERT INTO danang_batdongsan (title, price, area, location, street, ward, district, city, bedrooms, bathrooms, posted_time, is_selling, property_code, coordinates)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """, row)
-        self.conn.commit()
-        print("Dữ liệu đã được lưu vào bảng danang_batdongsan trong cơ sở dữ liệu.")
+            posted = datetime.strptime(row[10], "%d-%m-%Y")
+            row[10] = posted.strftime("%d-%m-%Y")
+            latitude, longitude = self.parse_coordinates(row[13])
+            params.append(row + [posted.strftime("%Y-%m-%d"), posted.year, posted.month, latitude, longitude])
+
+        if self.archive:
+            self.archive.commit()
+        started = time.perf_counter()
+        with self.conn:
+            last_id = self.cursor.execute("SELECT IFNULL(MAX(id), 0) FROM danang_batdongsan").fetchone()[0]
+            self.cursor.executemany(UPSERT_LISTING_SQL, params)
+            changed = self.cursor.rowcount if params else 0
+            inserted = self.cursor.execute("SELECT COUNT(*) FROM danang_batdongsan WHERE id > ?", (last_id,)).fetchone()[0]
+            if base_url is not None:
+                self.cursor.execute("""
+                    INSERT INTO crawl_checkpoint (base_url, page, last_listing, completed, updated_at)
+                    VALUES (?, ?, ?, ?, datetime('now'))
+                    ON CONFLICT (base_url) DO UPDATE SET
+                        page = excluded.page, last_listing = IFNULL(excluded.last_listing, last_listing),
+                        completed = excluded.completed, updated_at = excluded.updated_at;
+                """, (base_url, page, self.data[-1][14] if self.data else None, int(completed)))
+        elapsed = time.perf_counter() - started
+
+        if params:
+            self.metrics.observe("crawler_db_write_seconds", elapsed)
+            self.metrics.inc("crawler_db_rows_total", len(params))
+        stats = self.write_stats
+        stats["rows"] += len(params)
+        stats["inserted"] += inserted
+        stats["updated"] += changed - inserted
+        stats["batches"] += 1 if params else 0
+        stats["seconds"] += elapsed
+        if params:
+            print(f"Đã ghi {len(params)} tin ({inserted} mới, {changed - inserted} cập nhật) trong {elapsed * 1000:.0f} ms")
+        self.data.clear()
+
+    def save_to_database(self):
+        self.flush()
+        stats = self.write_stats
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        print(f"Dữ liệu đã được lưu vào bảng danang_batdongsan: {stats['inserted']} tin mới, {stats['updated']} tin cập nhật, "
+              f"{stats['rows'] - stats['inserted'] - stats['updated']} tin không đổi.")
+        print(f"Ghi {stats['rows']} tin trong {stats['batches']} batch, {stats['seconds']:.2f}s ({rate:,.0f} tin/giây)")
 
-    def start_crawling(self, base_url):
+    def start_crawling(self, base_url, resume=True):
+        if not self.table_ready:
+            self.create_table()
         page_number = 1
+        checkpoint = self.cursor.execute(
+            "SELECT page, last_listing, completed FROM crawl_checkpoint WHERE base_url = ?", (base_url,)
+        ).fetchone()
+        if resume and checkpoint and not checkpoint[2]:
+            page_number = checkpoint[0] + 1
+            print(f"Tiếp tục {base_url} từ trang {page_number} (tin cuối đã lưu: {checkpoint[1]})")
+
         while True:
             url = f"{base_url}?cp={page_number}"
-            if not self.fetch_page_data(url, "mua" in base_url):
+            has_more = self.fetch_page_data(url, "mua" in base_url)
+            if not has_more:
                 break
+            if len(self.data) >= self.batch_size:
+                self.flush(base_url, page_number)
             page_number += 1
-            time.sleep(2)
+        # Trang lỗi mạng (None) không đánh dấu hoàn tất để lần chạy sau tiếp tục từ trang đó
+        self.flush(base_url, page_number - 1 if has_more is None else page_number, completed=has_more is not None)
+
+    def print_cache_report(self):
+        if not self.http_cache:
+            return
+        report = self.http_cache.report()
+        print(f"HTTP cache: {report['lookups']} lượt tra cứu, tỷ lệ trúng {report['hit_ratio']:.1%} "
+              f"({report['fresh_hits']} còn hạn, {report['revalidated']} xác nhận 304, {report['misses']} tải mới)")
+        print(f"Tiết kiệm {report['bytes_saved'] / 1024 / 1024:.2f} MB, tải về {report['bytes_downloaded'] / 1024 / 1024:.2f} MB; "
+              f"cache {report['entries']} mục / {report['size_bytes'] / 1024 / 1024:.2f} MB, đã xóa {report['evictions']}")
+
+    def export_metrics(self, json_path=None, prometheus_path=None):
+        metrics = self.metrics
+        summary = metrics.summary()
+        print(f"Crawl {summary['elapsed_seconds']:.1f}s: {summary['listings']} tin ({summary['listings_per_second']:.1f} tin/giây), "
+              f"tải về {summary['downloaded_bytes'] / 1024 / 1024:.2f} MB, "
+              f"{metrics.total('crawler_listings_skipped_total')} tin bị lọc, {summary['errors']} lỗi")
+        for stage in ("request", "parse", "db_write"):
+            histogram = metrics.merged_histogram(f"crawler_{stage}_seconds")
+            if histogram and histogram.count:
+                print(f"  {stage}: {histogram.count} lần, trung bình {histogram.sum / histogram.count * 1000:.1f} ms, "
+                      f"p50 <= {histogram.quantile(0.5) * 1000:g} ms, p99 <= {histogram.quantile(0.99) * 1000:g} ms")
+        if json_path:
+            metrics.write_json(json_path)
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path)
+        if json_path or prometheus_path:
+            print(f"Đã xuất metrics ra {', '.join(path for path in (json_path, prometheus_path) if path)}")
 
     def close_connection(self):
+        self.metrics.stop_live()
+        if self.executor:
+            self.executor.shutdown()
+        self.session.close()
+        if self.archive:
+            self.archive.close()
         self.conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl real estate data from mogi.vn")
+    parser.add_argument("--workers", type=int, default=1, help="số trang chi tiết được lấy song song")
+    parser.add_argument("--rate", type=float, default=1.0, help="số request mỗi giây cho mỗi host")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--host", default="https://mogi.vn", help="ví dụ http://127.0.0.1:8765 để crawl server fixture cục bộ")
+    parser.add_argument("--cache-dir", default="cache/http", help="thư mục cache HTTP; để trống để tắt")
+    parser.add_argument("--cache-max-age", type=float, default=86400, help="số giây trang chi tiết được dùng lại mà không hỏi server")
+    parser.add_argument("--cache-max-mb", type=float, default=512)
+    parser.add_argument("--incremental", action="store_true", help="chỉ lấy tin mới và cập nhật giá/ngày đăng của tin đã có")
+    parser.add_argument("--known-page-ratio", type=float, default=0.8, help="dừng khi tỷ lệ tin đã biết trên một trang đạt ngưỡng này")
+    parser.add_argument("--batch-size", type=int, default=200, help="số tin mỗi lần ghi xuống DB")
+    parser.add_argument("--restart", action="store_true", help="bỏ qua checkpoint và crawl lại từ trang 1")
+    parser.add_argument("--parser", choices=["lxml", "html.parser"], help="mặc định lxml nếu đã cài")
+    parser.add_argument("--archive", default="crawl_archive.db", help="file lưu HTML gốc đã nén; để trống để tắt")
+    parser.add_argument("--city", nargs="+", default=[Config.DEFAULT_CITY],
+                        help="các thành phố cần crawl, mỗi thành phố ghi vào DB riêng (shard)")
+    parser.add_argument("--db", help=f"DB cho một thành phố; mặc định {Config.DB_NAME} cho {Config.DEFAULT_CITY}, "
+                                     "<shard-dir>/<city>.db cho thành phố khác")
+    parser.add_argument("--shard-dir", default=Config.SHARD_DIR)
+    parser.add_argument("--categories", nargs="+",
+                        help="đường dẫn danh mục trên host (mặc định <city>/mua-nha-dat và <city>/thue-nha-dat); "
+                             "danh mục có \"mua\" là tin bán")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="số trang danh sách crawl cùng lúc trên mọi danh mục; 1 = lần lượt từng danh mục như trước")
+    parser.add_argument("--max-in-flight", type=int, help="giới hạn chung số request đang chạy, tự giảm khi server chậm/lỗi")
+    parser.add_argument("--metrics-json", default="crawl_metrics.json", help="file tóm tắt metrics JSON; để trống để tắt")
+    parser.add_argument("--metrics-prom", default="crawl_metrics.prom", help="file metrics dạng text của Prometheus; để trống để tắt")
+    parser.add_argument("--metrics-interval", type=float, default=0, help="in tiến độ (và ghi lại file .prom) mỗi N giây; 0 để tắt")
+    args = parser.parse_args()
+    if args.db and len(args.city) > 1:
+        parser.error("--db chỉ dùng được với một --city; mỗi thành phố cần một DB riêng")
+
     print("CRAWL REAL ESTATE DATA from mogi.vn")
-    base_url_buy = "https://mogi.vn/da-nang/mua-nha-dat"
-    base_url_rent = "https://mogi.vn/da-nang/thue-nha-dat"
-
-    crawler = RealEstateCrawler()
-    crawler.start_crawling(base_url_buy)
-    crawler.start_crawling(base_url_rent)
-    crawler.save_to_database()
-    crawler.close_connection()
+    for city in args.city:
+        # Cùng cách bố trí shard với services/shards.py: thành phố mặc định ở Config.DB_NAME,
+        # thành phố khác ở <shard-dir>/<city>.db
+        db_name = args.db or (Config.DB_NAME if city == Config.DEFAULT_CITY
+                              else os.path.join(args.shard_dir, f"{city}.db"))
+        if os.path.dirname(db_name):
+            os.makedirs(os.path.dirname(db_name), exist_ok=True)
+        categories = args.categories or [f"{city}/mua-nha-dat", f"{city}/thue-nha-dat"]
+        base_urls = [f"{args.host}/{category}" for category in categories]
+        print(f"Thành phố {city} -> {db_name}")
+
+        crawler = RealEstateCrawler(db_name, workers=args.workers, requests_per_second=args.rate, burst=args.burst,
+                                    cache_dir=args.cache_dir or None, cache_max_age=args.cache_max_age,
+                                    cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                                    incremental=args.incremental, known_page_ratio=args.known_page_ratio,
+                                    batch_size=args.batch_size, parser=args.parser, archive_path=args.archive or None,
+                                    max_in_flight=args.max_in_flight)
+        if args.metrics_interval > 0:
+            crawler.metrics.start_live(args.metrics_interval, args.metrics_prom or None)
+        if args.page_workers > 1:
+            CrawlScheduler(crawler, args.page_workers).run(base_urls, resume=not args.restart)
+        else:
+            for base_url in base_urls:
+                crawler.start_crawling(base_url, resume=not args.restart)
+        crawler.print_cache_report()
+        crawler.save_to_database()
+        # Mỗi thành phố một bộ file metrics khi crawl nhiều thành phố
+        suffix = f"-{city}" if len(args.city) > 1 else ""
+        crawler.export_metrics(*(f"{os.path.splitext(path)[0]}{suffix}{os.path.splitext(path)[1]}" if path else None
+                                 for path in (args.metrics_json, args.metrics_prom)))
+        crawler.close_connection()
@@ -0,0 +1,245 @@
+import bisect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Upper bounds (seconds) of the histogram buckets, Prometheus "le" semantics
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# name -> (Prometheus type, help text); every metric the crawler records is listed here
+METRICS = {
+    "crawler_requests_total": ("counter", "HTTP responses received, by page kind and status code."),
+    "crawler_request_seconds": ("histogram", "Latency of one HTTP attempt, excluding rate-limit waits."),
+    "crawler_rate_limit_wait_seconds_total": ("counter", "Time spent waiting for a rate-limiter token."),
+    "crawler_retries_total": ("counter", "Requests retried, by page kind and reason."),
+    "crawler_concurrency_decreases_total": ("counter", "Times the adaptive in-flight limit was halved."),
+    "crawler_cache_hits_total": ("counter", "Pages served from the HTTP cache without a request."),
+    "crawler_downloaded_bytes_total": ("counter", "Response bytes received over the network."),
+    "crawler_parse_seconds": ("histogram", "Time to parse one page, by page kind."),
+    "crawler_pages_total": ("counter", "Pages parsed, by page kind."),
+    "crawler_listings_total": ("counter", "Listings collected for the database."),
+    "crawler_listings_skipped_total": ("counter", "Listings dropped by the bedroom/price/area filter, by reason."),
+    "crawler_errors_total": ("counter", "Errors, by crawl stage and exception type."),
+    "crawler_db_write_seconds": ("histogram", "Time of one batched database write."),
+    "crawler_db_rows_total": ("counter", "Rows sent to the database."),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the Prometheus estimate without interpolation)."""
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return bound
+        return math.inf
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {_format_bound(bound): total for bound, total in self.cumulative()},
+        }
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == math.inf else repr(bound)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _write_atomic(path, text):
+    # Readers (node_exporter's textfile collector, dashboards) never see a half-written file
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class CrawlMetrics:
+    """Thread-safe counters and histograms for one crawl run.
+
+    Values are keyed by metric name plus labels and exported as a JSON
+    summary or in the Prometheus text exposition format. ``start_live``
+    prints a progress line (and optionally rewrites the Prometheus file)
+    every few seconds while the crawl runs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.started = time.perf_counter()
+        self.counters = {}
+        self.histograms = {}
+        self.live_stop = None
+        self.live_thread = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, buckets=LATENCY_BUCKETS, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, buckets, **labels)
+
+    def error(self, stage, exc):
+        self.inc("crawler_errors_total", stage=stage, type=type(exc).__name__)
+
+    def total(self, name, **labels):
+        """Sum of a counter over every label set that contains ``labels``."""
+        wanted = set(labels.items())
+        with self.lock:
+            return sum(value for (key_name, key_labels), value in self.counters.items()
+                       if key_name == name and wanted <= set(key_labels))
+
+    def merged_histogram(self, name, **labels):
+        wanted = set(labels.items())
+        merged = None
+        with self.lock:
+            for (key_name, key_labels), histogram in self.histograms.items():
+                if key_name != name or not wanted <= set(key_labels):
+                    continue
+                if merged is None:
+                    merged = Histogram(histogram.buckets)
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+        return merged
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        elapsed = self.elapsed()
+        listings = self.total("crawler_listings_total")
+        with self.lock:
+            counters, histograms = dict(self.counters), dict(self.histograms)
+        grouped = {}
+        for (name, labels), value in sorted(counters.items()):
+            grouped.setdefault(name, []).append({**dict(labels), "value": value})
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": elapsed,
+            "listings": listings,
+            "listings_per_second": listings / elapsed if elapsed else 0.0,
+            "pages_per_second": self.total("crawler_pages_total", kind="listing") / elapsed if elapsed else 0.0,
+            "downloaded_bytes": self.total("crawler_downloaded_bytes_total"),
+            "errors": self.total("crawler_errors_total"),
+            "counters": grouped,
+            "histograms": [{"name": name, **dict(labels), **histogram.summary()}
+                           for (name, labels), histogram in sorted(histograms.items())],
+        }
+
+    def to_prometheus(self):
+        with self.lock:
+            counters, histograms = dict(self.counters), dict(self.histograms)
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (key_name, labels), value in sorted(counters.items()):
+                    if key_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+            else:
+                for (key_name, labels), histogram in sorted(histograms.items()):
+                    if key_name != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_bound(bound)),))} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        lines.append("# HELP crawler_elapsed_seconds Seconds since the crawl started.")
+        lines.append("# TYPE crawler_elapsed_seconds gauge")
+        lines.append(f"crawler_elapsed_seconds {self.elapsed()}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.summary(), ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
+
+    def progress_line(self):
+        elapsed = self.elapsed()
+        listings = self.total("crawler_listings_total")
+        latency = self.merged_histogram("crawler_request_seconds")
+        parse = self.merged_histogram("crawler_parse_seconds")
+        return (f"[metrics] {elapsed:.0f}s | {self.total('crawler_pages_total', kind='listing')} trang, "
+                f"{listings} tin ({listings / elapsed if elapsed else 0:.1f} tin/s) | "
+                f"{self.total('crawler_requests_total')} request, "
+                f"{self.total('crawler_downloaded_bytes_total') / 1024 / 1024:.1f} MB, "
+                f"p50/p90 {latency.quantile(0.5) if latency else 0:g}/{latency.quantile(0.9) if latency else 0:g}s | "
+                f"parse p50 {parse.quantile(0.5) if parse else 0:g}s | "
+                f"{self.total('crawler_listings_skipped_total')} bị lọc, {self.total('crawler_errors_total')} lỗi")
+
+    def start_live(self, interval, prometheus_path=None, stream=None):
+        stream = stream or sys.stderr
+        self.live_stop = threading.Event()
+
+        def report():
+            while not self.live_stop.wait(interval):
+                print(self.progress_line(), file=stream, flush=True)
+                if prometheus_path:
+                    self.write_prometheus(prometheus_path)
+
+        self.live_thread = threading.Thread(target=report, name="crawl-metrics", daemon=True)
+        self.live_thread.start()
+
+    def stop_live(self):
+        if self.live_thread:
+            self.live_stop.set()
+            self.live_thread.join()
+            self.live_thread = None
@@ -0,0 +1,131 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Category:
+    """Trạng thái crawl của một base_url trong CrawlScheduler."""
+
+    def __init__(self, base_url, first_page):
+        self.base_url = base_url
+        self.next_page = first_page
+        # Trang lớn nhất thấy trong phân trang tới giờ; None khi chưa biết (khi đó chỉ crawl trước một trang)
+        self.last_page = None
+        # Trang đầu tiên báo hết dữ liệu / dừng sớm / lỗi mạng; không xếp thêm trang sau nó
+        self.stop_page = None
+        self.committed = first_page - 1
+        # Kết quả các trang đã xong nhưng chưa tới lượt ghi: page -> (has_more, rows)
+        self.finished = {}
+        self.rows = []
+        self.done = False
+
+    def can_schedule(self):
+        if self.done:
+            return False
+        limit = self.last_page if self.last_page is not None else self.committed + 1
+        if self.stop_page is not None:
+            limit = min(limit, self.stop_page - 1)
+        return self.next_page <= limit
+
+
+class CrawlScheduler:
+    """Crawl nhiều danh mục song song như một hàng đợi công việc (base_url, trang).
+
+    Trang 1 (hoặc trang tiếp theo checkpoint) của mỗi danh mục được lấy trước
+    để đọc số trang cuối từ phân trang; sau đó các trang còn lại của mọi danh
+    mục được xếp xen kẽ vào tối đa ``page_workers`` luồng. Số request đang chạy
+    trên toàn bộ crawl do ``RealEstateCrawler.concurrency`` giới hạn và tự giảm
+    khi server chậm lại hoặc trả lỗi.
+
+    Kết quả mỗi trang được giữ lại tới khi mọi trang trước nó của cùng danh mục
+    xong, nên tin được ghi và checkpoint được cập nhật theo đúng thứ tự trang
+    như khi crawl tuần tự. Mọi thao tác với SQLite chạy trên luồng gọi run().
+    """
+
+    def __init__(self, crawler, page_workers=4):
+        self.crawler = crawler
+        self.page_workers = page_workers
+
+    def run(self, base_urls, resume=True):
+        crawler = self.crawler
+        if not crawler.table_ready:
+            crawler.create_table()
+        if crawler.incremental and crawler.known is None:
+            crawler.load_known_listings()
+
+        categories = []
+        for base_url in base_urls:
+            first_page = 1
+            checkpoint = crawler.cursor.execute(
+                "SELECT page, last_listing, completed FROM crawl_checkpoint WHERE base_url = ?", (base_url,)
+            ).fetchone()
+            if resume and checkpoint and not checkpoint[2]:
+                first_page = checkpoint[0] + 1
+                print(f"Tiếp tục {base_url} từ trang {first_page} (tin cuối đã lưu: {checkpoint[1]})")
+            categories.append(Category(base_url, first_page))
+
+        pending = {}
+        turn = 0
+        with ThreadPoolExecutor(max_workers=self.page_workers, thread_name_prefix="scheduler") as pool:
+            while True:
+                # Xếp việc xoay vòng giữa các danh mục để danh mục lớn không chiếm hết luồng
+                while len(pending) < self.page_workers:
+                    ready = [category for category in categories if category.can_schedule()]
+                    if not ready:
+                        break
+                    category = ready[turn % len(ready)]
+                    turn += 1
+                    page = category.next_page
+                    category.next_page += 1
+                    url = f"{category.base_url}?cp={page}"
+                    rows = []
+                    future = pool.submit(crawler.fetch_page_data, url, "mua" in category.base_url, rows)
+                    pending[future] = (category, page, url, rows)
+                if not pending:
+                    break
+
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    category, page, url, rows = pending.pop(future)
+                    has_more = future.result()
+                    last_page = crawler.last_pages.pop(url, None)
+                    if last_page:
+                        # Phân trang có thể chỉ hiện vài trang kế tiếp, nên trang cuối được cập nhật dần
+                        category.last_page = max(category.last_page or 0, last_page)
+                    if not has_more and (category.stop_page is None or page < category.stop_page):
+                        category.stop_page = page
+                    category.finished[page] = (has_more, rows)
+                    self.commit_ready(category)
+
+        for category in categories:
+            # Checkpoint đã ở sau trang cuối hiện tại (số trang giảm từ lần chạy trước)
+            if not category.done:
+                self.flush(category, category.committed, completed=True)
+                category.done = True
+
+    def commit_ready(self, category):
+        """Ghi các trang liên tiếp đã xong của một danh mục; đóng danh mục khi tới trang cuối."""
+        crawler = self.crawler
+        while category.committed + 1 in category.finished:
+            page = category.committed + 1
+            has_more, rows = category.finished.pop(page)
+            category.committed = page
+            category.rows.extend(rows)
+            if not has_more:
+                # Trang lỗi mạng (None) không đánh dấu hoàn tất để lần chạy sau tiếp tục từ trang đó
+                self.flush(category, page - 1 if has_more is None else page, completed=has_more is not None)
+                category.done = True
+            elif page == category.last_page:
+                self.flush(category, page, completed=True)
+                category.done = True
+            elif len(category.rows) >= crawler.batch_size:
+                self.flush(category, page)
+            if category.done:
+                break
+        if category.done:
+            # Các trang sau trang dừng đã lấy song song thì bỏ, như crawl tuần tự không bao giờ tới chúng
+            category.finished.clear()
+
+    def flush(self, category, page, completed=False):
+        crawler = self.crawler
+        crawler.data.extend(category.rows)
+        category.rows = []
+        crawler.flush(category.base_url, page, completed=completed)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+
+class HttpCache:
+    """On-disk HTTP response cache keyed by URL.
+
+    Each entry is ``<sha1>.body`` plus ``<sha1>.json`` holding the ETag,
+    Last-Modified, encoding and fetch time. Entries younger than
+    ``max_age`` seconds are served without a request; older ones are
+    revalidated with If-None-Match / If-Modified-Since. When the cache
+    grows past ``max_bytes`` the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir, max_age=86400, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "fresh_hits": 0, "revalidated": 0, "misses": 0, "evictions": 0,
+                      "bytes_saved": 0, "bytes_downloaded": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # key -> [size on disk, last used]; rebuilt from the directory so the limit spans crawls
+        self.index = {}
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".json"):
+                key = entry.name[:-5]
+                body_path = self._path(key, ".body")
+                if os.path.exists(body_path):
+                    self.index[key] = [entry.stat().st_size + os.path.getsize(body_path), entry.stat().st_mtime]
+        self.total_bytes = sum(size for size, _ in self.index.values())
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _load(self, key):
+        try:
+            with open(self._path(key, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(key, ".body"), "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _write(self, key, suffix, data):
+        path = self._path(key, suffix)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _touch(self, key):
+        now = time.time()
+        with self.lock:
+            if key in self.index:
+                self.index[key][1] = now
+        try:
+            os.utime(self._path(key, ".json"), (now, now))
+        except OSError:
+            pass
+
+    def _to_response(self, url, meta, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.encoding = meta.get("encoding")
+        response.headers.update(meta.get("headers", {}))
+        # Lets callers tell a cached or revalidated body from a downloaded one
+        response.from_cache = True
+        return response
+
+    def fresh(self, url, max_age=None):
+        """The cached response for ``url`` if it is younger than ``max_age`` seconds, else None."""
+        max_age = self.max_age if max_age is None else max_age
+        key = self._key(url)
+        meta, body = self._load(key)
+        with self.lock:
+            self.stats["lookups"] += 1
+        if meta is None or time.time() - meta["fetched_at"] >= max_age:
+            return None
+        with self.lock:
+            self.stats["fresh_hits"] += 1
+            self.stats["bytes_saved"] += len(body)
+        self._touch(key)
+        return self._to_response(url, meta, body)
+
+    def fetch(self, session, url, **kwargs):
+        """GET ``url`` through ``session``, revalidating a stale entry instead of re-downloading it."""
+        key = self._key(url)
+        meta, body = self._load(key)
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and meta is not None:
+            meta["fetched_at"] = time.time()
+            self._write(key, ".json", json.dumps(meta).encode("utf-8"))
+            with self.lock:
+                self.stats["revalidated"] += 1
+                self.stats["bytes_saved"] += len(body)
+            self._touch(key)
+            return self._to_response(url, meta, body)
+
+        with self.lock:
+            self.stats["bytes_downloaded"] += len(response.content)
+            if response.status_code == 200:
+                self.stats["misses"] += 1
+        if response.status_code == 200:
+            self.store(key, response)
+        return response
+
+    def store(self, key, response):
+        meta = json.dumps({
+            "url": response.url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+            "fetched_at": time.time(),
+        }).encode("utf-8")
+        self._write(key, ".body", response.content)
+        self._write(key, ".json", meta)
+
+        with self.lock:
+            previous = self.index.get(key)
+            if previous:
+                self.total_bytes -= previous[0]
+            size = len(meta) + len(response.content)
+            self.index[key] = [size, time.time()]
+            self.total_bytes += size
+            evicted = []
+            if self.total_bytes > self.max_bytes:
+                for old_key, (old_size, _) in sorted(self.index.items(), key=lambda item: item[1][1]):
+                    if self.total_bytes <= self.max_bytes or old_key == key:
+                        break
+                    del self.index[old_key]
+                    self.total_bytes -= old_size
+                    evicted.append(old_key)
+            self.stats["evictions"] += len(evicted)
+        for old_key in evicted:
+            for suffix in (".json", ".body"):
+                try:
+                    os.remove(self._path(old_key, suffix))
+                except OSError:
+                    pass
+
+    def report(self):
+        stats = dict(self.stats)
+        hits = stats["fresh_hits"] + stats["revalidated"]
+        stats["hit_ratio"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        stats["entries"] = len(self.index)
+        stats["size_bytes"] = self.total_bytes
+        return stats
@@ -0,0 +1,170 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+except ImportError:  # lxml là tùy chọn; không có thì dùng html.parser của BeautifulSoup
+    lxml = None
+
+# Một lần quét lấy cả số phòng ngủ (PN) và phòng vệ sinh (WC)
+ROOMS_PATTERN = re.compile(r'(\d+) (PN|WC)')
+NUMBER_PATTERN = re.compile(r'(\d+)')
+# Số trang trong link phân trang: "...?cp=12"
+PAGE_PATTERN = re.compile(r'[?&]cp=(\d+)')
+
+LISTINGS_STRAINER = SoupStrainer("ul", class_="props")
+PAGINATION_STRAINER = SoupStrainer("ul", class_="pagination")
+DETAIL_STRAINER = SoupStrainer(["iframe", "div"])
+
+
+def default_backend():
+    return "lxml" if lxml is not None else "html.parser"
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _count_rooms(text):
+    rooms = {}
+    for match in ROOMS_PATTERN.finditer(text):
+        rooms.setdefault(match.group(2), int(match.group(1)))
+    return rooms.get("PN", 0), rooms.get("WC", 0)
+
+
+def _split_address(detailed_address):
+    street, ward, district, city = None, None, None, None
+    if detailed_address:
+        location_parts = detailed_address.split(", ")
+        if len(location_parts) >= 4:
+            street, ward, district, city = location_parts[:4]
+    return street, ward, district, city
+
+
+def _coordinates(iframe_src):
+    if iframe_src and "q=" in iframe_src:
+        return iframe_src.split("q=")[-1].split("&")[0]
+    return ''
+
+
+def _lxml_document(html):
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # Chuỗi unicode có khai báo encoding kiểu XML: để lxml tự đọc từ bytes
+        return lxml.html.fromstring(html.encode("utf-8"))
+    except ParserError:
+        return None
+
+
+def _lxml_listing(listing):
+    def first(xpath):
+        found = listing.xpath(xpath)
+        if not found:
+            raise AttributeError(f"không tìm thấy {xpath}")
+        return found[0]
+
+    text = listing.text_content()
+    title = first(f".//h2[{_has_class('prop-title')}]").text_content().strip()
+    price = first(f".//div[{_has_class('price')}]").text_content().strip()
+    area = float(NUMBER_PATTERN.findall(first(f".//ul[{_has_class('prop-attr')}]").xpath(".//li")[0].text_content().strip())[0])
+    bedrooms, bathrooms = _count_rooms(text)
+    location = first(f".//div[{_has_class('prop-addr')}]").text_content().strip()
+    posted_time = first(f".//div[{_has_class('prop-created')}]").text_content().strip()
+    links = listing.xpath(f".//a[{_has_class('link-overlay')}]")
+    return title, price, area, bedrooms, bathrooms, location, posted_time, links[0].get("href") if links else None
+
+
+def _soup_listing(listing):
+    text = listing.text
+    title = listing.find("h2", class_="prop-title").text.strip()
+    price = listing.find("div", class_="price").text.strip()
+    area = float(NUMBER_PATTERN.findall(listing.find("ul", class_="prop-attr").find_all("li")[0].text.strip())[0])
+    bedrooms, bathrooms = _count_rooms(text)
+    location = listing.find("div", class_="prop-addr").text.strip()
+    posted_time = listing.find("div", class_="prop-created").text.strip()
+    link = listing.find("a", class_="link-overlay")
+    href = link.get("href") if link else None
+    return title, price, area, bedrooms, bathrooms, location, posted_time, href
+
+
+def parse_listing_page(html, backend=None):
+    """Các tin trên một trang danh sách, theo thứ tự.
+
+    Trả về None nếu trang không còn tin nào. Mỗi phần tử là tuple
+    (title, price, area, bedrooms, bathrooms, location, posted_time, href) với
+    price/posted_time còn ở dạng chữ và href là None nếu không có link chi tiết,
+    hoặc exception nếu thẻ <li> đó không phải một tin hợp lệ. Mọi <li> trong
+    ul.props đều được duyệt, như find_all("li").
+    """
+    backend = backend or default_backend()
+    if backend == "lxml":
+        document = _lxml_document(html)
+        found = document.xpath(f"//ul[{_has_class('props')}]") if document is not None else []
+        items = found[0].xpath(".//li") if found else []
+        parse = _lxml_listing
+    else:
+        soup = BeautifulSoup(html, backend, parse_only=LISTINGS_STRAINER)
+        listings = soup.find("ul", class_="props")
+        items = listings.find_all("li") if listings is not None else []
+        parse = _soup_listing
+    if not items:
+        return None
+
+    results = []
+    for item in items:
+        try:
+            results.append(parse(item))
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            results.append(e)
+    return results
+
+
+def parse_detail_page(html, backend=None):
+    """(property_code, street, ward, district, city, coordinates) của một trang chi tiết."""
+    backend = backend or default_backend()
+    property_code = ''
+    if backend == "lxml":
+        document = _lxml_document(html)
+        if document is None:
+            return property_code, None, None, None, None, ''
+        iframes = document.xpath("//iframe[@title='map']")
+        coordinates = _coordinates(iframes[0].get("data-src")) if iframes else ''
+        info_attrs = document.xpath(f"//div[{_has_class('info-attrs')}]")
+        if info_attrs:
+            for info_attr in info_attrs[0].xpath(f".//div[{_has_class('info-attr')}]"):
+                # Giống find("span", text="Mã BĐS"): span chỉ chứa đúng chuỗi đó
+                if any(len(span) == 0 and span.text == "Mã BĐS" for span in info_attr.iter("span")):
+                    property_code = info_attr.xpath(".//span")[1].text_content().strip()
+                    break
+        addresses = document.xpath(f"//div[{_has_class('address')}]")
+        detailed_address = addresses[0].text_content().strip() if addresses else ''
+    else:
+        soup = BeautifulSoup(html, backend, parse_only=DETAIL_STRAINER)
+        iframe_tag = soup.find("iframe", title="map")
+        coordinates = _coordinates(iframe_tag.get("data-src")) if iframe_tag else ''
+        info_attrs = soup.find("div", class_="info-attrs")
+        if info_attrs:
+            for info_attr in info_attrs.find_all("div", class_="info-attr"):
+                if info_attr.find("span", string="Mã BĐS"):
+                    property_code = info_attr.find_all("span")[1].text.strip()
+                    break
+        address_tag = soup.find("div", class_="address")
+        detailed_address = address_tag.text.strip() if address_tag else ''
+
+    return (property_code, *_split_address(detailed_address), coordinates)
+
+
+def parse_last_page(html, backend=None):
+    """Số trang lớn nhất trong ul.pagination của một trang danh sách, None nếu trang không có phân trang."""
+    backend = backend or default_backend()
+    if backend == "lxml":
+        document = _lxml_document(html)
+        hrefs = document.xpath(f"//ul[{_has_class('pagination')}]//a/@href") if document is not None else []
+    else:
+        soup = BeautifulSoup(html, backend, parse_only=PAGINATION_STRAINER)
+        hrefs = [link.get("href", "") for pagination in soup.find_all("ul", class_="pagination")
+                 for link in pagination.find_all("a")]
+    pages = [int(match.group(1)) for match in map(PAGE_PATTERN.search, hrefs) if match]
+    return max(pages) if pages else None
@@ -0,0 +1,66 @@
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+
+class PageArchive:
+    """Append-only archive of fetched HTML in its own SQLite file.
+
+    Every page the crawler fetches is stored zlib-compressed with its URL,
+    kind ("listing" or "detail") and fetch time, grouped by crawl run, so
+    parse_archive.py can rebuild danang_batdongsan without the network.
+    Rows are only ever inserted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS crawl_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL REFERENCES crawl_runs (id),
+                kind TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                html BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_run_kind ON pages (run_id, kind);
+            CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, kind, id);
+        """)
+        self.lock = threading.Lock()
+        self.run_id = None
+        self.stats = {"pages": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def add(self, url, kind, html):
+        raw = html.encode("utf-8")
+        compressed = zlib.compress(raw, 6)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            if self.run_id is None:
+                self.run_id = self.conn.execute("INSERT INTO crawl_runs (started_at) VALUES (?)", (now,)).lastrowid
+            self.conn.execute(
+                "INSERT INTO pages (run_id, kind, url, fetched_at, html) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, kind, url, now, compressed),
+            )
+            self.stats["pages"] += 1
+            self.stats["raw_bytes"] += len(raw)
+            self.stats["stored_bytes"] += len(compressed)
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+def read_html(blob):
+    return zlib.decompress(blob).decode("utf-8")
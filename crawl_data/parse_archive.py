@@ -0,0 +1,115 @@
+"""
+Phân tích lại một lần crawl từ archive HTML (page_archive.py) vào danang_batdongsan, không cần mạng.
+
+Các trang danh sách của lần crawl được chia thành nhiều phần và phân tích song
+song trên process pool; kết quả được ghép lại đúng thứ tự trang rồi ghi bằng
+cùng đường UPSERT theo batch với crawler.
+
+    python parse_archive.py --archive crawl_archive.db --db data.db
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from crawl_data_script import RealEstateCrawler
+from listing_parser import default_backend, parse_detail_page, parse_listing_page
+from page_archive import read_html
+
+
+def _detail_html(conn, detail_url, run_id, max_page_id):
+    """HTML chi tiết tải trong chính lần crawl; nếu không có thì bản mới nhất từ các lần trước."""
+    row = conn.execute("""
+        SELECT html, run_id = ? FROM pages
+        WHERE url = ? AND kind = 'detail' AND id <= ?
+        ORDER BY id DESC LIMIT 1
+    """, (run_id, detail_url, max_page_id)).fetchone()
+    return (read_html(row[0]), bool(row[1])) if row else (None, False)
+
+
+def parse_pages(archive_path, run_id, max_page_id, page_ids, parser):
+    """Chạy trong process con: (fields, detail_url, details, is_selling, same_run) cho mọi tin của một phần trang."""
+    conn = sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True)
+    results = []
+    for page_id in page_ids:
+        url, fetched_at, blob = conn.execute("SELECT url, fetched_at, html FROM pages WHERE id = ?", (page_id,)).fetchone()
+        today = datetime.fromisoformat(fetched_at)
+        is_selling = "mua" in url
+        listings = parse_listing_page(read_html(blob), parser) or []
+        for listing in listings:
+            try:
+                candidate = RealEstateCrawler.listing_candidate(listing, url, is_selling, today)
+            except (AttributeError, IndexError, TypeError, ValueError) as e:
+                results.append((None, None, e, is_selling, False))
+                continue
+            if candidate is None:
+                continue
+            fields, detail_url = candidate
+            html, same_run = _detail_html(conn, detail_url, run_id, max_page_id)
+            try:
+                details = parse_detail_page(html, parser) if html is not None else None
+            except (AttributeError, IndexError, TypeError, ValueError) as e:
+                details = e
+            results.append((fields, detail_url, details, is_selling, same_run))
+    conn.close()
+    return results
+
+
+def parse_archive(archive_path, db_name, run_id=None, processes=None, parser=None, batch_size=1000):
+    parser = parser or default_backend()
+    conn = sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True)
+    if run_id is None:
+        run_id = conn.execute("SELECT MAX(run_id) FROM pages").fetchone()[0]
+    page_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM pages WHERE run_id = ? AND kind = 'listing' ORDER BY id", (run_id,))]
+    max_page_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM pages WHERE run_id = ?", (run_id,)).fetchone()[0]
+    conn.close()
+    if not page_ids:
+        print(f"Archive {archive_path} không có trang danh sách nào cho lần crawl {run_id}")
+        return 0
+
+    started = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    # Mỗi process nhận vài phần liên tiếp để thứ tự tin đăng được giữ nguyên khi ghép lại
+    chunk_size = max(1, -(-len(page_ids) // (processes * 4)))
+    chunks = [page_ids[i:i + chunk_size] for i in range(0, len(page_ids), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        parsed = pool.map(parse_pages, *zip(*[(archive_path, run_id, max_page_id, chunk, parser) for chunk in chunks]))
+        parsed = [listing for chunk in parsed for listing in chunk]
+    parse_seconds = time.perf_counter() - started
+
+    # Tin không có trang chi tiết trong lần crawl này là tin crawler đã lấy từ DB (chế độ incremental)
+    crawler = RealEstateCrawler(db_name, batch_size=batch_size, parser=parser, incremental=True)
+    crawler.load_known_listings()
+    errors = 0
+    for fields, detail_url, details, is_selling, same_run in parsed:
+        if fields is None:
+            errors += 1
+            continue
+        if not same_run:
+            details = crawler.known_details(detail_url) or details or ('', '', '', '', '', '')
+        if isinstance(details, Exception):
+            errors += 1
+        crawler.add_listing(fields, detail_url, details, is_selling, verbose=False)
+        if len(crawler.data) >= batch_size:
+            crawler.flush()
+    crawler.save_to_database()
+    crawler.close_connection()
+    print(f"Phân tích {len(page_ids)} trang danh sách của lần crawl {run_id} bằng {processes} process "
+          f"trong {parse_seconds:.2f}s; {errors} tin lỗi bị bỏ qua")
+    return len(parsed) - errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phân tích lại HTML đã lưu trong archive vào danang_batdongsan")
+    parser.add_argument("--archive", default="crawl_archive.db")
+    parser.add_argument("--db", default="data.db")
+    parser.add_argument("--run", type=int, help="lần crawl cần phân tích (mặc định: lần mới nhất)")
+    parser.add_argument("--processes", type=int, help="mặc định: số CPU")
+    parser.add_argument("--parser", choices=["lxml", "html.parser"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    parse_archive(args.archive, args.db, args.run, args.processes, args.parser, args.batch_size)
@@ -0,0 +1,95 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average with bursts of up to ``capacity``.
+
+    Callers reserve a token under the lock and sleep outside it, so waiting
+    threads are served in arrival order and never hold the lock while idle.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket.acquire()
+
+
+class AdaptiveConcurrency:
+    """Global cap on requests in flight that adapts to how the server responds.
+
+    The limit grows by about one per round trip while responses are healthy
+    and halves (at most once per ``cooldown`` seconds) on an error or a
+    response slower than ``latency_factor`` times the running average
+    latency, never leaving ``[min_limit, max_limit]`` (AIMD).
+    """
+
+    def __init__(self, max_limit, min_limit=1, latency_factor=2.0, cooldown=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.average_latency = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, ok=True):
+        """Returns the request's slot; True if the limit was lowered because of it."""
+        with self.condition:
+            self.in_flight -= 1
+            slow = self.average_latency is not None and latency > self.latency_factor * self.average_latency
+            # Slow moving average, so a lasting rise in latency eventually becomes the new normal
+            self.average_latency = latency if self.average_latency is None else 0.95 * self.average_latency + 0.05 * latency
+            decreased = False
+            now = time.monotonic()
+            if not ok or slow:
+                if now - self.last_decrease >= self.cooldown and self.limit > self.min_limit:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self.last_decrease = now
+                    self.decreases += 1
+                    decreased = True
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+            return decreased
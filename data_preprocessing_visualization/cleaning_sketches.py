@@ -0,0 +1,271 @@
+"""
+Small, mergeable state for cleaning danang_batdongsan chunk by chunk.
+
+The in-memory cleaner needs the whole table for three things: percentiles
+(profiling, outlier bounds, report), duplicate detection and summary
+statistics. Here each of them is kept in memory that does not grow with
+the chunk size:
+
+- QuantileSketch: log-bucketed histogram with exact counts per bucket
+  (relative error ``relative_accuracy``), mergeable across chunks, plus an
+  exact percentile from a second pass over the values of two buckets.
+- SeenKeys: 64-bit row hashes of dedup keys, in sorted numpy runs (8 bytes
+  per distinct key) or in an on-disk SQLite index.
+- RunningStats: count/min/max/sum/sum of squares and a sketch per column.
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Bucket keys are shifted by this so that every finite magnitude maps to a
+# positive key; negative values get the negated key, zero gets 0.
+KEY_OFFSET = 1 << 20
+
+
+class QuantileSketch:
+    """Mergeable histogram of float values in buckets of relative width ``relative_accuracy``."""
+
+    def __init__(self, relative_accuracy=0.005):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.count = 0
+
+    def keys(self, values):
+        """Bucket key of each value; keys sort in the same order as the values."""
+        values = np.asarray(values, dtype=np.float64)
+        magnitude = np.abs(values)
+        with np.errstate(divide="ignore"):
+            index = np.ceil(np.log(np.where(magnitude > 0, magnitude, 1.0)) / self.log_gamma).astype(np.int64)
+        return np.where(values > 0, index + KEY_OFFSET, np.where(values < 0, -(index + KEY_OFFSET), 0))
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            keys, counts = np.unique(self.keys(values), return_counts=True)
+            self.buckets.update(dict(zip(keys.tolist(), counts.tolist())))
+            self.count += len(values)
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        return self
+
+    def value_of(self, key):
+        """Representative value of a bucket (its midpoint in relative terms)."""
+        if key == 0:
+            return 0.0
+        magnitude = 2 * self.gamma ** (abs(key) - KEY_OFFSET) / (self.gamma + 1)
+        return magnitude if key > 0 else -magnitude
+
+    def locate(self, rank):
+        """(bucket key, number of values in lower buckets) for the 0-based ``rank``."""
+        below = 0
+        for key in sorted(self.buckets):
+            if rank < below + self.buckets[key]:
+                return key, below
+            below += self.buckets[key]
+        raise IndexError(rank)
+
+    def quantile(self, q):
+        """Approximate linear-interpolated quantile, within ``relative_accuracy``."""
+        if not self.count:
+            return float("nan")
+        lower, upper, fraction = interpolation_ranks(self.count, q)
+        low = self.value_of(self.locate(lower)[0])
+        high = self.value_of(self.locate(upper)[0])
+        return lerp(low, high, fraction)
+
+    def count_outside(self, lower, upper):
+        """Approximate number of values below ``lower`` or above ``upper``."""
+        return sum(count for key, count in self.buckets.items()
+                   if self.value_of(key) < lower or self.value_of(key) > upper)
+
+
+def interpolation_ranks(n, q):
+    """Ranks and weight that Series.quantile(q) of ``n`` values combines, computed as pandas/numpy do."""
+    # Series.quantile hands np.percentile q * 100, which divides it by 100 again
+    q = q * 100.0 / 100.0
+    virtual = (n - 1) * q
+    lower = min(max(int(math.floor(virtual)), 0), n - 1)
+    upper = min(lower + 1, n - 1)
+    return lower, upper, virtual - math.floor(virtual)
+
+
+def lerp(a, b, t):
+    """numpy's percentile interpolation, so exact percentiles match Series.quantile bit for bit."""
+    diff = b - a
+    if t >= 0.5:
+        return b - diff * (1 - t)
+    return a + diff * t
+
+
+class ExactQuantile:
+    """Exact linear-interpolated quantile of the values summarized by a QuantileSketch.
+
+    The sketch's bucket counts are exact, so the bucket holding each of the
+    two needed ranks (and how many values lie below it) is known; a second
+    pass feeds the values again and only those falling in those buckets are
+    kept, as distinct value -> count.
+    """
+
+    def __init__(self, sketch, q):
+        self.sketch = sketch
+        self.n = sketch.count
+        self.lower, self.upper, self.fraction = interpolation_ranks(self.n, q) if self.n else (0, 0, 0.0)
+        self.targets = {}
+        if self.n:
+            for rank in (self.lower, self.upper):
+                key, below = sketch.locate(rank)
+                self.targets[key] = below
+        self.values = {key: Counter() for key in self.targets}
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        keys = self.sketch.keys(values)
+        for key, counter in self.values.items():
+            distinct, counts = np.unique(values[keys == key], return_counts=True)
+            counter.update(dict(zip(distinct.tolist(), counts.tolist())))
+
+    def _value_at(self, rank):
+        for key, below in self.targets.items():
+            counter = self.values[key]
+            if below <= rank < below + sum(counter.values()):
+                seen = below
+                for value in sorted(counter):
+                    seen += counter[value]
+                    if rank < seen:
+                        return value
+        raise IndexError(rank)
+
+    def result(self):
+        if not self.n:
+            return float("nan")
+        return lerp(self._value_at(self.lower), self._value_at(self.upper), self.fraction)
+
+
+def row_hashes(df, columns):
+    """64-bit hash per row of ``columns``, equal for rows that DataFrame.duplicated() treats as equal."""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+class SeenKeys:
+    """Set of row hashes seen so far, answering "which of these are new?" per chunk.
+
+    ``store='memory'`` keeps sorted numpy runs merged like an LSM tree
+    (8 bytes per distinct key, O(log n) runs to probe); ``store='disk'``
+    keeps them in an indexed SQLite table in ``directory``, for key sets
+    that should not live in RAM at all. Two different keys sharing a
+    64-bit hash would be treated as duplicates; at millions of rows the
+    odds are around one in a million.
+    """
+
+    def __init__(self, store="memory", directory=None):
+        self.store = store
+        self.runs = []
+        self.conn = None
+        if store == "disk":
+            fd, self.path = tempfile.mkstemp(prefix="seen_keys_", suffix=".db", dir=directory)
+            os.close(fd)
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+            self.conn.execute("CREATE TABLE seen (key INTEGER PRIMARY KEY)")
+            self.conn.execute("CREATE TEMP TABLE batch (key INTEGER PRIMARY KEY)")
+        elif store != "memory":
+            raise ValueError(f"Unknown dedup store: {store}")
+
+    def first_seen(self, keys):
+        """Boolean mask of ``keys`` not seen in earlier chunks nor earlier in this one; records them."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        new = ~pd.Index(keys).duplicated(keep="first")
+        candidates = keys[new]
+        if self.store == "memory":
+            known = np.zeros(len(candidates), dtype=bool)
+            for run in self.runs:
+                position = np.searchsorted(run, candidates)
+                known |= run[np.minimum(position, len(run) - 1)] == candidates
+            self._push(np.sort(candidates[~known]))
+        else:
+            signed = candidates.view(np.int64)
+            with self.conn:
+                self.conn.execute("DELETE FROM batch")
+                self.conn.executemany("INSERT INTO batch (key) VALUES (?)", ((key,) for key in signed.tolist()))
+                existing = [key for (key,) in self.conn.execute(
+                    "SELECT key FROM batch WHERE key IN (SELECT key FROM seen)")]
+                self.conn.execute("INSERT OR IGNORE INTO seen (key) SELECT key FROM batch")
+            known = np.isin(signed, np.array(existing, dtype=np.int64))
+        new[np.flatnonzero(new)[known]] = False
+        return new
+
+    def _push(self, run):
+        if not len(run):
+            return
+        self.runs.append(run)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind="mergesort")
+
+    def __len__(self):
+        if self.store == "memory":
+            return sum(len(run) for run in self.runs)
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            os.remove(self.path)
+            self.conn = None
+
+
+class RunningStats:
+    """Count, min, max, mean, std and approximate percentiles of one numeric column."""
+
+    def __init__(self, relative_accuracy=0.005):
+        self.count = 0
+        self.nulls = 0
+        self.zeros = 0
+        self.negatives = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.squares = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, series):
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        self.nulls += int(missing.sum())
+        values = values[~missing]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.zeros += int((values == 0).sum())
+        self.negatives += int((values < 0).sum())
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        self.total += values.sum()
+        self.squares += np.square(values).sum()
+        self.sketch.add(values)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return float("nan")
+        return math.sqrt(max(self.squares - self.count * self.mean ** 2, 0.0) / (self.count - 1))
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
@@ -4,7 +4,13 @@ Data Cleaning & Preprocessing for Danang Real Estate Database
 Senior Data Engineer Approach
 """
 
+import argparse
+import contextlib
+import io
+import json
+import os
 import sqlite3
+import tempfile
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -13,6 +19,8 @@ from datetime import datetime
 import re
 from typing import Tuple, List, Dict
 import warnings
+from cleaning_sketches import ExactQuantile, QuantileSketch, RunningStats, SeenKeys, row_hashes
+from listing_dedup import ListingDeduplicator
 warnings.filterwarnings('ignore')
 
 # Set Vietnamese locale for better display
@@ -20,11 +28,37 @@ plt.rcParams['font.family'] = ['DejaVu Sans']
 sns.set_style("whitegrid")
 
 class DanangRealEstateCleaner:
-    def __init__(self, db_path: str):
-        """Initialize the data cleaner with database path"""
+    # Cột địa chỉ lặp lại rất nhiều → category; các cột text còn lại → string (nullable)
+    CATEGORY_COLUMNS = ['location', 'ward', 'district', 'city']
+    # Chuỗi được coi là thiếu giống như NULL
+    MISSING_TEXT = ['', 'nan', 'None']
+    # Giá trị thiếu được giữ là NA/NaT trong khi xử lý và chỉ hiển thị thành "N/A" khi xuất file
+    MISSING_LABEL = "N/A"
+    # Khóa trùng lặp (remove_duplicates) và index tương ứng trên bảng đã cleaning
+    DEDUP_KEYS = {
+        'idx_cleaned_property_code': ['property_code'],
+        'idx_cleaned_listing': ['title', 'street', 'posted_time'],
+    }
+    # Cột nguồn tăng mỗi khi tin được thêm hoặc cập nhật tại chỗ (services/schema.py); chỉ dùng làm
+    # watermark nên không đưa vào dữ liệu đã cleaning
+    CHANGE_COLUMN = 'change_seq'
+
+    def __init__(self, db_path: str, deduplicator: ListingDeduplicator = None):
+        """Initialize the data cleaner with database path
+
+        deduplicator: ListingDeduplicator cho remove_duplicates (gộp cụm trùng lặp/gần trùng,
+        giữ bản ghi đầy đủ nhất); mặc định giữ bản ghi đầu tiên theo khóa chính xác
+        """
         self.db_path = db_path
+        self.deduplicator = deduplicator
+        self.duplicate_report = None
         self.df = None
         self.original_shape = None
+        # id và change_seq lớn nhất đã đọc từ bảng nguồn, ngưỡng outlier đã dùng: watermark cho
+        # chế độ incremental (last_change là None khi bảng nguồn chưa có cột change_seq)
+        self.last_source_id = 0
+        self.last_change = None
+        self.outlier_bounds = {}
         
     def load_data(self) -> pd.DataFrame:
         """Load data from SQLite database"""
@@ -35,7 +69,9 @@ class DanangRealEstateCleaner:
         self.df = pd.read_sql_query(query, conn)
         conn.close()
         
+        self.last_change = self._pop_change_marker(self.df)
         self.original_shape = self.df.shape
+        self.last_source_id = int(self.df['id'].max()) if len(self.df) else 0
         print(f"✓ Đã tải {self.original_shape[0]} bản ghi với {self.original_shape[1]} cột")
         
         return self.df
@@ -115,14 +151,11 @@ class DanangRealEstateCleaner:
         # 2.1. Xử lý giá trị null/empty cho tất cả các cột
         print("\n--- 2.1. Xử lý giá trị null/empty ---")
         
-        # Thay thế null và empty values bằng "N/A"
+        # Text: null và empty values giữ là NA (xuất ra "N/A", xem _csv_frame)
         for col in self.df.columns:
-            if self.df[col].dtype == 'object':  # Text columns
-                # Thay thế null và empty strings bằng "N/A"
-                self.df[col] = self.df[col].fillna("N/A")
-                self.df[col] = self.df[col].replace('', "N/A")
-                self.df[col] = self.df[col].replace('nan', "N/A")
-                self.df[col] = self.df[col].replace('None', "N/A")
+            if pd.api.types.is_string_dtype(self.df[col].dtype):  # Text columns
+                text = self.df[col].mask(self.df[col].isin(self.MISSING_TEXT))
+                self.df[col] = text.astype('category' if col in self.CATEGORY_COLUMNS else 'string')
             else:  # Numeric columns
                 # Giữ nguyên giá trị null cho numeric columns
                 self.df[col] = self.df[col].fillna(0)
@@ -157,21 +190,14 @@ class DanangRealEstateCleaner:
         # 2.3. Chuẩn hóa kiểu dữ liệu
         print("\n--- 2.3. Chuẩn hóa kiểu dữ liệu ---")
         
-        # Chuyển posted_time từ TEXT sang datetime
+        # Chuyển posted_time từ TEXT sang datetime64 (NaT cho ngày thiếu/không hợp lệ)
         if 'posted_time' in self.df.columns:
             print("  - Chuyển posted_time từ TEXT sang datetime")
-            # Chỉ xử lý các giá trị không phải "N/A"
-            mask = self.df['posted_time'] != "N/A"
-            self.df.loc[mask, 'posted_time'] = pd.to_datetime(
-                self.df.loc[mask, 'posted_time'], 
-                format='%d-%m-%Y', 
-                errors='coerce'
-            )
-            # Thay thế các giá trị không hợp lệ bằng "N/A"
-            invalid_dates = self.df['posted_time'].isnull().sum()
+            posted_time = pd.to_datetime(self.df['posted_time'], format='%d-%m-%Y', errors='coerce')
+            invalid_dates = (posted_time.isna() & self.df['posted_time'].notna()).sum()
             if invalid_dates > 0:
-                print(f"    → Thay thế {invalid_dates} bản ghi có ngày không hợp lệ bằng 'N/A'")
-                self.df['posted_time'] = self.df['posted_time'].fillna("N/A")
+                print(f"    → {invalid_dates} bản ghi có ngày không hợp lệ → NaT ('N/A' khi xuất)")
+            self.df['posted_time'] = posted_time
         
         # Chuyển is_selling từ BOOLEAN sang INTEGER
         if 'is_selling' in self.df.columns:
@@ -180,103 +206,156 @@ class DanangRealEstateCleaner:
             mask = self.df['is_selling'].notna()
             self.df.loc[mask, 'is_selling'] = self.df.loc[mask, 'is_selling'].astype(int)
         
-        # 2.4. Tách cột coordinates
+        # 2.4. Tách cột coordinates thành Float64 (NA khi thiếu/không hợp lệ)
         if 'coordinates' in self.df.columns:
             print("  - Tách cột coordinates thành latitude và longitude")
-            # Chỉ xử lý các giá trị không phải "N/A"
-            mask = self.df['coordinates'] != "N/A"
-            coords_data = self.df.loc[mask, 'coordinates'].str.extract(r'([\d.-]+),([\d.-]+)')
-            
-            # Khởi tạo cột latitude và longitude với "N/A"
-            self.df['latitude'] = "N/A"
-            self.df['longitude'] = "N/A"
-            
-            # Cập nhật các giá trị hợp lệ
-            if not coords_data.empty:
-                self.df.loc[mask, 'latitude'] = pd.to_numeric(coords_data[0], errors='coerce')
-                self.df.loc[mask, 'longitude'] = pd.to_numeric(coords_data[1], errors='coerce')
-                
-                # Thay thế các giá trị không hợp lệ bằng "N/A"
-                invalid_coords = self.df.loc[mask, 'latitude'].isnull().sum()
-                if invalid_coords > 0:
-                    print(f"    → Thay thế {invalid_coords} bản ghi có tọa độ không hợp lệ bằng 'N/A'")
-                    self.df.loc[mask, 'latitude'] = self.df.loc[mask, 'latitude'].fillna("N/A")
-                    self.df.loc[mask, 'longitude'] = self.df.loc[mask, 'longitude'].fillna("N/A")
+            coords_data = self.df['coordinates'].str.extract(r'([\d.-]+),([\d.-]+)')
+            # Parse từ object như trước để giá trị float giống hệt bit
+            self.df['latitude'] = pd.to_numeric(coords_data[0].astype(object), errors='coerce').astype('Float64')
+            self.df['longitude'] = pd.to_numeric(coords_data[1].astype(object), errors='coerce').astype('Float64')
+
+            invalid_coords = (self.df['latitude'].isna() & self.df['coordinates'].notna()).sum()
+            if invalid_coords > 0:
+                print(f"    → {invalid_coords} bản ghi có tọa độ không hợp lệ → NA ('N/A' khi xuất)")
         
         print(f"\n✓ Đã xử lý: {initial_count - len(self.df)} bản ghi bị loại bỏ")
         print(f"✓ Còn lại: {len(self.df)} bản ghi")
     
     def normalize_address_fields(self):
-        """Step 3: Chuẩn hóa trường địa chỉ"""
+        """Step 3: Chuẩn hóa trường địa chỉ
+
+        Địa chỉ lặp lại rất nhiều (vài quận, vài chục phường), nên mỗi giá trị khác nhau
+        chỉ được chuẩn hóa một lần: location/street theo từng giá trị (factorize), còn
+        ward/district/city theo từng tổ hợp khác nhau của ba cột vì chúng chuyển giá trị
+        cho nhau (phường điền nhầm vào district, quận điền nhầm vào city); kết quả được
+        ánh xạ lại cho từng dòng qua mã.
+        """
         print("\n=== 3. CHUẨN HÓA TRƯỜNG ĐỊA CHỈ ===")
         
         # 3.1. Loại bỏ khoảng trắng dư thừa và chuẩn hóa chữ hoa/thường
-        address_cols = ['location', 'street', 'ward', 'district', 'city']
-        
-        for col in address_cols:
+        for col in ['location', 'street']:
             if col in self.df.columns:
                 print(f"  - Chuẩn hóa {col}")
-                # Loại bỏ khoảng trắng dư thừa
-                self.df[col] = self.df[col].str.strip()
-                # Chuẩn hóa chữ hoa/thường
-                self.df[col] = self.df[col].str.title()
+                codes, uniques = self._factorize(self.df[col])
+                self.df[col] = self._expand(codes, uniques.str.strip().str.title(), self.df[col])
+
+        unit_cols = [col for col in ['ward', 'district', 'city'] if col in self.df.columns]
+        codes, units = self._factorize_rows(self.df[unit_cols])
+        units = self._normalize_address_units(units)
+        for col in unit_cols:
+            self.df[col] = self._expand(codes, units[col], self.df[col])
+         
+        print(f"✓ Hoàn thành chuẩn hóa địa chỉ ({len(units)} tổ hợp phường/quận/thành phố khác nhau)")
+
+    @classmethod
+    def _normalize_address_units(cls, units: pd.DataFrame) -> pd.DataFrame:
+        """Chuẩn hóa ward/district/city trên từng tổ hợp khác nhau (mỗi dòng của units)"""
+        for col in units.columns:
+            print(f"  - Chuẩn hóa {col}")
+            # Loại bỏ khoảng trắng dư thừa, chuẩn hóa chữ hoa/thường
+            units[col] = units[col].str.strip().str.title()
         
         # 3.2. Chuẩn hóa tên quận/huyện
         print("  - Chuẩn hóa tên quận/huyện")
         
         # Loại bỏ tiền tố Quận/Huyện ở đầu chuỗi: "Quận ", "Huyện ", "Q.", "H." (không ảnh hưởng vị trí khác)
-        self.df['district'] = self.df['district'].astype(str).str.strip()
-        self.df['district'] = self.df['district'].str.replace(r'^\s*(Quận|Huyện)\s+', '', regex=True)
-        self.df['district'] = self.df['district'].str.replace(r'^\s*(Q\.|H\.)\s*', '', regex=True)
+        units['district'] = units['district'].str.strip()
+        units['district'] = units['district'].str.replace(r'^\s*(Quận|Huyện)\s+', '', regex=True)
+        units['district'] = units['district'].str.replace(r'^\s*(Q\.|H\.)\s*', '', regex=True)
         # Chuẩn hóa lại khoảng trắng và chữ hoa/thường sau khi thay thế
-        self.df['district'] = self.df['district'].str.strip().str.title()
+        units['district'] = units['district'].str.strip().str.title()
 
         # Nếu district lại chứa tiền tố Phường/P. (bị điền nhầm), di chuyển sang ward nếu ward đang thiếu
-        mis_ward_in_district = self.df['district'].astype(str).str.match(r'^\s*(Phường|Phuong|P\.)\s*', case=False)
+        mis_ward_in_district = cls._matches(units['district'], r'^\s*(Phường|Phuong|P\.)\s*', case=False)
         if mis_ward_in_district.any():
             extracted_ward = (
-                self.df.loc[mis_ward_in_district, 'district']
+                units.loc[mis_ward_in_district, 'district']
                 .str.replace(r'^\s*(Phường|Phuong|P\.)\s*', '', regex=True)
                 .str.strip()
                 .str.title()
             )
-            ward_missing = self.df['ward'].astype(str).str.strip().str.upper().isin(['', 'N/A', 'NONE', 'NAN'])
+            ward_missing = cls._is_missing(units['ward'])
             move_mask = mis_ward_in_district & ward_missing
-            self.df.loc[move_mask, 'ward'] = extracted_ward.loc[move_mask]
-            # Đặt district thành N/A cho các dòng bị điền sai
-            self.df.loc[mis_ward_in_district, 'district'] = 'N/A'
+            units.loc[move_mask, 'ward'] = extracted_ward.loc[move_mask]
+            # Đặt district thành NA ("N/A" khi xuất) cho các dòng bị điền sai
+            units['district'] = units['district'].mask(mis_ward_in_district)
 
         # 3.3. Chuẩn hóa tên phường
         print("  - Chuẩn hóa tên phường")
         
         # Loại bỏ từ "Phường" và chuẩn hóa
-        self.df['ward'] = self.df['ward'].str.replace('Phường ', '', regex=False)
-        self.df['ward'] = self.df['ward'].str.replace('P.', '', regex=False)
+        units['ward'] = units['ward'].str.replace('Phường ', '', regex=False)
+        units['ward'] = units['ward'].str.replace('P.', '', regex=False)
         
         # 3.4. Nếu city chứa tiền tố Quận/Q. (bị điền nhầm), di chuyển sang district (sau khi clean ở trên)
-        if 'city' in self.df.columns:
-            self.df['city'] = self.df['city'].astype(str).str.strip()
-            mis_district_in_city = self.df['city'].str.match(r'^\s*(Quận|Q\.)\s*')
+        if 'city' in units.columns:
+            units['city'] = units['city'].str.strip()
+            mis_district_in_city = cls._matches(units['city'], r'^\s*(Quận|Q\.)\s*')
             if mis_district_in_city.any():
                 extracted_district = (
-                    self.df.loc[mis_district_in_city, 'city']
+                    units.loc[mis_district_in_city, 'city']
                     .str.replace(r'^\s*(Quận|Q\.)\s*', '', regex=True)
                     .str.strip()
                     .str.title()
                 )
-                district_missing = self.df['district'].astype(str).str.strip().str.upper().isin(['', 'N/A', 'NONE', 'NAN'])
+                district_missing = cls._is_missing(units['district'])
                 move_mask = mis_district_in_city & district_missing
-                self.df.loc[move_mask, 'district'] = extracted_district.loc[move_mask]
+                units.loc[move_mask, 'district'] = extracted_district.loc[move_mask]
                 # Đặt lại city về "Đà Nẵng" cho các dòng bị điền sai (vì bộ dữ liệu là Đà Nẵng)
-                self.df.loc[mis_district_in_city, 'city'] = 'Đà Nẵng'
-         
-        print("✓ Hoàn thành chuẩn hóa địa chỉ")
+                units['city'] = units['city'].mask(mis_district_in_city, 'Đà Nẵng')
+        return units
+
+    @staticmethod
+    def _factorize(values: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+        """Mã của từng dòng và các giá trị khác nhau (object); NA là giá trị cuối cùng"""
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(np.append(np.asarray(uniques, dtype=object), np.nan), dtype=object)
+        return np.where(codes < 0, len(uniques) - 1, codes), uniques
+
+    @classmethod
+    def _factorize_rows(cls, frame: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+        """Mã của từng dòng và các tổ hợp giá trị khác nhau của frame (không sắp xếp, O(n))"""
+        factorized = [cls._factorize(frame[col]) for col in frame.columns]
+        dims = [len(uniques) for _, uniques in factorized]
+        codes, keys = pd.factorize(np.ravel_multi_index([codes for codes, _ in factorized], dims))
+        unit_codes = np.unravel_index(keys, dims)
+        units = pd.DataFrame({col: uniques.take(unit_codes[i]).reset_index(drop=True)
+                              for i, (col, (_, uniques)) in enumerate(zip(frame.columns, factorized))})
+        return codes, units
+
+    @classmethod
+    def _expand(cls, codes: np.ndarray, normalized: pd.Series, like: pd.Series) -> pd.Series:
+        """Giá trị đã chuẩn hóa (mỗi giá trị khác nhau một lần) cho từng dòng, theo mã
+
+        Cột category được dựng thẳng từ mã (không băm lại chuỗi của từng dòng), các cột
+        còn lại giữ kiểu của cột gốc.
+        """
+        if like.name in cls.CATEGORY_COLUMNS:
+            normalized_codes, categories = pd.factorize(normalized, sort=True)
+            # Kiểu của categories suy lại như astype('category') (str thay vì object trên pandas 3)
+            categories = pd.Index(categories.tolist())
+            return pd.Series(pd.Categorical.from_codes(normalized_codes[codes], categories=categories), index=like.index)
+        return pd.Series(normalized.to_numpy(dtype=object)[codes], index=like.index, dtype=like.dtype)
+
+    @staticmethod
+    def _matches(values: pd.Series, pattern: str, case: bool = True) -> pd.Series:
+        """str.match cho cột có NA: giá trị thiếu không khớp"""
+        return values.str.match(pattern, case=case).fillna(False).astype(bool)
+
+    @classmethod
+    def _is_missing(cls, values: pd.Series) -> pd.Series:
+        """NA, hoặc chuỗi rỗng/"N/A"/"None"/"nan" (sau khi strip, không phân biệt hoa thường)"""
+        return values.isna() | values.str.strip().str.upper().isin(['', cls.MISSING_LABEL, 'NONE', 'NAN']).fillna(False).astype(bool)
     
     def remove_duplicates(self):
         """Step 4: Loại bỏ bản ghi trùng lặp"""
         print("\n=== 4. LOẠI BỎ BẢN GHI TRÙNG LẶP ===")
         
         initial_count = len(self.df)
+
+        if self.deduplicator is not None:
+            self._remove_duplicate_clusters()
+            return
         
         # 4.1. Kiểm tra trùng lặp dựa trên property_code
         if 'property_code' in self.df.columns:
@@ -285,11 +364,9 @@ class DanangRealEstateCleaner:
             print(f"  - Trùng lặp theo property_code: {duplicate_count} bản ghi")
             
             if duplicate_count > 0:
-                # Giữ lại bản ghi có ít null nhất
-                self.df = self.df.sort_values('property_code').drop_duplicates(
-                    subset=['property_code'], 
-                    keep='first'
-                )
+                # Giữ bản ghi xuất hiện trước (crawl sớm nhất) và giữ nguyên thứ tự,
+                # để chế độ chunk (run_chunked_cleaning) giữ đúng cùng các bản ghi
+                self.df = self.df.drop_duplicates(subset=['property_code'], keep='first')
         
         # 4.2. Kiểm tra trùng lặp dựa trên tổ hợp (title + street + posted_time)
         duplicate_cols = ['title', 'street', 'posted_time']
@@ -299,34 +376,53 @@ class DanangRealEstateCleaner:
             print(f"  - Trùng lặp theo tổ hợp (title + street + posted_time): {duplicate_count} bản ghi")
             
             if duplicate_count > 0:
-                # Giữ lại bản ghi có ít null nhất
-                self.df = self.df.sort_values(duplicate_cols).drop_duplicates(
-                    subset=duplicate_cols, 
-                    keep='first'
-                )
+                self.df = self.df.drop_duplicates(subset=duplicate_cols, keep='first')
         
         final_count = len(self.df)
         removed_count = initial_count - final_count
         
         print(f"✓ Đã loại bỏ {removed_count} bản ghi trùng lặp")
         print(f"✓ Còn lại: {final_count} bản ghi")
+
+    def _remove_duplicate_clusters(self):
+        """Step 4 bằng ListingDeduplicator: mỗi cụm (trùng khóa hoặc gần trùng) giữ một bản ghi"""
+        initial_count = len(self.df)
+        self.df, self.duplicate_report = self.deduplicator.deduplicate(self.df)
+        report = self.duplicate_report
+        near = report['match'] == 'near'
+        print(f"  - Cụm trùng lặp theo khóa (property_code, title + street + posted_time): {(~near).sum()} "
+              f"({report.loc[~near, 'size'].sum() - (~near).sum()} bản ghi thừa)")
+        if self.deduplicator.near_duplicates:
+            print(f"  - Cụm có bản ghi gần trùng (tiêu đề ≥ {self.deduplicator.title_similarity:.0%} giống, "
+                  f"giá/diện tích/tọa độ gần nhau, cùng đường/quận): {near.sum()} ({report.loc[near, 'size'].sum() - near.sum()} bản ghi thừa)")
+        print(f"  - Giữ bản ghi: {'đầy đủ nhất' if self.deduplicator.survivorship == 'complete' else 'xuất hiện trước'}")
+        print(f"✓ Đã loại bỏ {initial_count - len(self.df)} bản ghi trùng lặp")
+        print(f"✓ Còn lại: {len(self.df)} bản ghi")
     
-    def handle_outliers_and_transformations(self):
-        """Step 5: Xử lý outlier & chuyển đổi thêm"""
+    def handle_outliers_and_transformations(self, bounds=None):
+        """Step 5: Xử lý outlier & chuyển đổi thêm
+
+        bounds: {col: (lower, upper)} tính trước trên toàn bộ dữ liệu (chế độ chunk);
+        mặc định tính percentile 1%-99% trên self.df
+        """
         print("\n=== 5. XỬ LÝ OUTLIER & CHUYỂN ĐỔI THÊM ===")
         
         # 5.1. Xác định và xử lý outliers cho price và area (không loại bỏ giá trị âm)
         print("\n--- 5.1. Xử lý outliers cho price và area (giữ nguyên giá trị âm) ---")
         
+        self.outlier_bounds = {}
         for col in ['price', 'area']:
             if col in self.df.columns:
                 # Chỉ xử lý các giá trị dương cho outlier detection
                 positive_mask = self.df[col] > 0
                 if positive_mask.sum() > 0:
-                    positive_data = self.df.loc[positive_mask, col]
-                    # Sử dụng percentile method (1% - 99%) chỉ cho giá trị dương
-                    lower_percentile = positive_data.quantile(0.01)
-                    upper_percentile = positive_data.quantile(0.99)
+                    if bounds is not None:
+                        lower_percentile, upper_percentile = bounds[col]
+                    else:
+                        positive_data = self.df.loc[positive_mask, col]
+                        # Sử dụng percentile method (1% - 99%) chỉ cho giá trị dương
+                        lower_percentile = positive_data.quantile(0.01)
+                        upper_percentile = positive_data.quantile(0.99)
                     
                     # Chỉ xử lý outliers cho giá trị dương
                     outlier_mask = positive_mask & ((self.df[col] < lower_percentile) | (self.df[col] > upper_percentile))
@@ -336,8 +432,10 @@ class DanangRealEstateCleaner:
                     
                     # Thay thế outliers bằng NaN thay vì loại bỏ
                     self.df.loc[outlier_mask, col] = np.nan
+                    self.outlier_bounds[col] = (lower_percentile, upper_percentile)
                 else:
                     print(f"  - {col}: Không có giá trị dương để xử lý outliers")
+                    self.outlier_bounds[col] = bounds[col] if bounds is not None else (np.nan, np.nan)
         
         # 5.2. Tạo cột dẫn xuất
         print("\n--- 5.2. Tạo cột dẫn xuất ---")
@@ -359,19 +457,12 @@ class DanangRealEstateCleaner:
                     self.df.loc[positive_mask, f'{col}_log'] = np.log1p(self.df.loc[positive_mask, col])
                 print(f"  - Tạo cột {col}_log (log transformation) - chỉ cho giá trị dương")
         
-        # 5.3. Tạo cột thời gian
+        # 5.3. Tạo cột thời gian (số nguyên nullable: NA cho ngày thiếu/không hợp lệ)
         if 'posted_time' in self.df.columns:
-            # Chỉ xử lý cho các giá trị datetime hợp lệ
-            datetime_mask = pd.to_datetime(self.df['posted_time'], errors='coerce').notna()
-            self.df['posted_year'] = "N/A"
-            self.df['posted_month'] = "N/A"
-            self.df['posted_day'] = "N/A"
-            
-            if datetime_mask.sum() > 0:
-                posted_time_dt = pd.to_datetime(self.df.loc[datetime_mask, 'posted_time'])
-                self.df.loc[datetime_mask, 'posted_year'] = posted_time_dt.dt.year
-                self.df.loc[datetime_mask, 'posted_month'] = posted_time_dt.dt.month
-                self.df.loc[datetime_mask, 'posted_day'] = posted_time_dt.dt.day
+            posted_time = self.df['posted_time'].dt
+            self.df['posted_year'] = posted_time.year.astype('Int16')
+            self.df['posted_month'] = posted_time.month.astype('Int8')
+            self.df['posted_day'] = posted_time.day.astype('Int8')
             print("  - Tạo cột thời gian (year, month, day) - chỉ cho ngày hợp lệ")
         
         # 5.4. Đảm bảo price/area không còn NaN (thay bằng 0 để phục vụ trực quan hoá area vs price)
@@ -438,23 +529,56 @@ class DanangRealEstateCleaner:
         
         print(f"\n🗺️ PHÂN BỐ THEO QUẬN:")
         if 'district' in self.df.columns:
-            district_counts = self.df['district'].value_counts()
+            district_counts = self._with_missing_label(self.df['district']).value_counts()
             for district, count in district_counts.head().items():
                 print(f"  - {district}: {count:,} bản ghi")
+
+        if self.duplicate_report is not None and len(self.duplicate_report):
+            print(f"\n🔁 CỤM TRÙNG LẶP LỚN NHẤT:")
+            for _, cluster in self.duplicate_report.head().iterrows():
+                print(f"  - {cluster['size']} bản ghi ({cluster['match']}), giữ id {cluster['survivor_id']}: "
+                      f"{cluster['member_ids']}")
+
+        print(f"\n🧮 BỘ NHỚ THEO CỘT:")
+        memory = self.column_memory_report()
+        print(memory.to_string(float_format=lambda mb: f"{mb:,.2f}"))
+        print(f"  - Tổng: {memory['MB'].sum():,.2f} MB")
         
         print("\n✅ HOÀN THÀNH DATA CLEANING & PREPROCESSING!")
+
+    def column_memory_report(self) -> pd.DataFrame:
+        """Kiểu dữ liệu và bộ nhớ (MB, tính cả nội dung chuỗi) của từng cột trong self.df"""
+        usage = self.df.memory_usage(index=False, deep=True)
+        return pd.DataFrame({
+            'dtype': self.df.dtypes.astype(str),
+            'MB': usage / 1024 / 1024,
+        }).sort_values('MB', ascending=False)
     
+    @classmethod
+    def _with_missing_label(cls, values: pd.Series) -> pd.Series:
+        """Cột object với NA/NaT thay bằng "N/A" (định dạng file xuất)"""
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = values.dt.strftime('%Y-%m-%d %H:%M:%S')
+        values = values.astype(object)
+        return values.mask(values.isna(), cls.MISSING_LABEL)
+
+    @classmethod
+    def _csv_frame(cls, df):
+        """Bản sao để lưu CSV/SQLite: datetime thành string, cột nullable/category thành object, NA → "N/A" """
+        df_to_save = df.copy()
+        for col in df_to_save.columns:
+            dtype = df_to_save[col].dtype
+            if pd.api.types.is_extension_array_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+                df_to_save[col] = cls._with_missing_label(df_to_save[col])
+        return df_to_save
+
     def save_cleaned_data(self, output_path: str = None):
         """Lưu dữ liệu đã được cleaning"""
         if output_path is None:
             output_path = "cleaned_danang_real_estate.csv"
         
         # Tạo bản sao để xử lý datetime trước khi lưu
-        df_to_save = self.df.copy()
-        
-        # Chuyển đổi datetime thành string để lưu vào CSV
-        if 'posted_time' in df_to_save.columns:
-            df_to_save['posted_time'] = df_to_save['posted_time'].astype(str)
+        df_to_save = self._csv_frame(self.df)
         
         df_to_save.to_csv(output_path, index=False, encoding='utf-8-sig')
         print(f"\n💾 Đã lưu dữ liệu đã cleaning vào: {output_path}")
@@ -463,15 +587,62 @@ class DanangRealEstateCleaner:
         sqlite_output = output_path.replace('.csv', '.db')
         conn = sqlite3.connect(sqlite_output)
         
-        # Chuyển đổi datetime thành string cho SQLite
-        if 'posted_time' in df_to_save.columns:
-            df_to_save['posted_time'] = df_to_save['posted_time'].replace('NaT', 'N/A')
-        
         df_to_save.to_sql('cleaned_danang_batdongsan', conn, if_exists='replace', index=False)
+        self._save_state(conn, self.last_source_id, self.outlier_bounds, self.last_change)
         conn.close()
         print(f"💾 Đã lưu dữ liệu đã cleaning vào SQLite: {sqlite_output}")
+
+    @classmethod
+    def _pop_change_marker(cls, df: pd.DataFrame, last_change: int = None):
+        """Bỏ cột change_seq khỏi df, trả về giá trị lớn nhất (hoặc last_change nếu lớn hơn/không có cột)"""
+        if cls.CHANGE_COLUMN not in df.columns:
+            return last_change
+        values = df.pop(cls.CHANGE_COLUMN)
+        return max(last_change or 0, int(values.max()) if values.notna().any() else 0)
+
+    @classmethod
+    def _save_state(cls, conn, last_source_id: int, bounds: Dict[str, Tuple[float, float]], last_change: int = None):
+        """Tạo index khóa trùng lặp trên bảng đã cleaning và ghi watermark (id, change_seq nguồn + ngưỡng outlier)"""
+        with conn:
+            for name, cols in cls.DEDUP_KEYS.items():
+                col_list = ", ".join(f'"{col}"' for col in cols)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON cleaned_danang_batdongsan ({col_list})")
+            # Bản ghi nguồn được cập nhật tại chỗ thay thế dòng cùng id
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cleaned_id ON cleaned_danang_batdongsan ("id")')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cleaning_state (
+                    source_table TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL,
+                    bounds TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    last_change INTEGER
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cleaning_state)")}
+            if 'last_change' not in columns:
+                conn.execute("ALTER TABLE cleaning_state ADD COLUMN last_change INTEGER")
+            conn.execute(
+                "INSERT OR REPLACE INTO cleaning_state (source_table, last_id, bounds, updated_at, last_change) "
+                "VALUES ('danang_batdongsan', ?, ?, ?, ?)",
+                (last_source_id, json.dumps({col: list(map(float, b)) for col, b in bounds.items()}),
+                 datetime.now().isoformat(timespec='seconds'), last_change)
+            )
+
+    @staticmethod
+    def _load_state(conn):
+        """(last_id, bounds, last_change) của lần cleaning trước, hoặc None nếu chưa có bảng đã cleaning/watermark"""
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'cleaned_danang_batdongsan', 'cleaning_state'} <= tables:
+            return None
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cleaning_state)")}
+        last_change = "last_change" if "last_change" in columns else "NULL"
+        row = conn.execute(f"SELECT last_id, bounds, {last_change} FROM cleaning_state "
+                           "WHERE source_table = 'danang_batdongsan'").fetchone()
+        if row is None:
+            return None
+        return row[0], {col: tuple(b) for col, b in json.loads(row[1]).items()}, row[2]
     
-    def run_complete_cleaning(self):
+    def run_complete_cleaning(self, output_path: str = None):
         """Chạy toàn bộ quy trình cleaning"""
         # Load data
         self.load_data()
@@ -495,20 +666,501 @@ class DanangRealEstateCleaner:
         self.generate_cleaning_report()
         
         # Save cleaned data
-        self.save_cleaned_data()
+        self.save_cleaned_data(output_path)
         
         return self.df
 
+    # ------------------------------------------------------------------
+    # Chế độ chunk: bộ nhớ giới hạn theo chunk_size thay vì kích thước bảng
+    # ------------------------------------------------------------------
+
+    def _column_dtypes(self, conn) -> Dict[str, str]:
+        """Kiểu pandas của từng cột khi đọc cả bảng một lần (như load_data).
+
+        pandas suy kiểu riêng cho mỗi chunk (cột INTEGER có NULL trong chunk này
+        thành float, chunk khác thành int), nên các chunk được ép về kiểu của
+        toàn bảng để mọi bước xử lý cho kết quả giống hệt chế độ in-memory.
+        """
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan)")]
+        checks = ", ".join(
+            f'SUM(typeof("{col}") IN (\'text\', \'blob\')), SUM(typeof("{col}") = \'real\'), '
+            f'SUM(typeof("{col}") = \'integer\'), SUM("{col}" IS NULL)'
+            for col in columns
+        )
+        counts = conn.execute(f"SELECT {checks} FROM danang_batdongsan").fetchone()
+        dtypes = {}
+        for i, col in enumerate(columns):
+            text, real, integer, null = (value or 0 for value in counts[4 * i:4 * i + 4])
+            if text or not (real or integer):
+                dtypes[col] = 'object'
+            elif real or null:
+                dtypes[col] = 'float64'
+            else:
+                dtypes[col] = 'int64'
+        return dtypes
+
+    @staticmethod
+    def _type_sample(df) -> pd.DataFrame:
+        """Một dòng cho mỗi kiểu giá trị của mỗi cột object: đủ để to_sql chọn cùng kiểu cột SQL như với toàn bảng"""
+        rows = set()
+        for col in df.columns[df.dtypes == object]:
+            rows.update(df[col].map(type).drop_duplicates().index)
+        return df.loc[sorted(rows)] if rows else df.iloc[:1]
+
+    def run_chunked_cleaning(self, chunk_size: int = 50000, dedup_store: str = "memory",
+                             output_path: str = None, work_dir: str = None) -> Dict[str, int]:
+        """Chạy toàn bộ quy trình cleaning theo từng chunk, kết quả giống run_complete_cleaning
+
+        - Lượt 1: đọc bảng theo chunk, xử lý dữ liệu thiếu và chuẩn hóa địa chỉ trên
+          từng chunk, loại trùng lặp bằng hash của khóa (SeenKeys, trong RAM hoặc
+          trên đĩa), cộng dồn sketch percentile của price/area; ghi chunk tạm ra đĩa.
+        - Lượt 2: tính chính xác ngưỡng 1%-99% từ sketch (chỉ giữ giá trị của hai
+          bucket chứa percentile), rồi xử lý outlier/cột dẫn xuất từng chunk và ghi
+          CSV + SQLite.
+        Bộ nhớ chỉ phụ thuộc chunk_size và số khóa trùng lặp (8 byte/khóa với
+        dedup_store="memory"), không phụ thuộc số bản ghi.
+        """
+        if output_path is None:
+            output_path = "cleaned_danang_real_estate.csv"
+        numeric_cols = ['price', 'area', 'bedrooms', 'bathrooms']
+        quiet = lambda: contextlib.redirect_stdout(io.StringIO())  # noqa: E731
+
+        print("=== 1. KHẢO SÁT SƠ BỘ (DATA PROFILING) - THEO CHUNK ===")
+        conn = sqlite3.connect(self.db_path)
+        dtypes = self._column_dtypes(conn)
+        seen_codes = SeenKeys(dedup_store, work_dir)
+        seen_combos = SeenKeys(dedup_store, work_dir)
+        profile = {col: RunningStats() for col in numeric_cols}
+        null_counts = None
+        sketches = {col: QuantileSketch() for col in ['price', 'area']}
+        total = removed_by_code = removed_by_combo = last_id = 0
+        last_change = None
+
+        with tempfile.TemporaryDirectory(prefix="cleaning_chunks_", dir=work_dir) as spill_dir:
+            spills = []
+            for chunk in pd.read_sql_query("SELECT * FROM danang_batdongsan", conn, chunksize=chunk_size):
+                chunk = chunk.astype(dtypes)
+                last_change = self._pop_change_marker(chunk, last_change)
+                total += len(chunk)
+                last_id = max(last_id, int(chunk['id'].max()))
+                nulls = chunk.isnull().sum()
+                null_counts = nulls if null_counts is None else null_counts + nulls
+                for col in numeric_cols:
+                    if col in chunk.columns:
+                        profile[col].add(chunk[col])
+
+                self.df = chunk
+                with quiet():
+                    self.handle_missing_invalid_data()
+                    self.normalize_address_fields()
+
+                # Giữ bản ghi xuất hiện trước, như remove_duplicates: khóa property_code được
+                # ghi nhận cho mọi dòng, khóa tổ hợp chỉ cho các dòng còn lại sau bước đó
+                if 'property_code' in self.df.columns:
+                    keep = seen_codes.first_seen(row_hashes(self.df, ['property_code']))
+                    removed_by_code += int((~keep).sum())
+                    self.df = self.df[keep]
+                duplicate_cols = ['title', 'street', 'posted_time']
+                if all(col in self.df.columns for col in duplicate_cols):
+                    keep = seen_combos.first_seen(row_hashes(self.df, duplicate_cols))
+                    removed_by_combo += int((~keep).sum())
+                    self.df = self.df[keep]
+
+                for col, sketch in sketches.items():
+                    values = self.df[col]
+                    sketch.add(values[values > 0])
+                spills.append(os.path.join(spill_dir, f"{len(spills):06d}.pkl"))
+                self.df.to_pickle(spills[-1])
+            conn.close()
+            self.original_shape = (total, len([col for col in dtypes if col != self.CHANGE_COLUMN]))
+            self._print_chunked_profile(total, null_counts, profile)
+
+            print("\n=== 2-4. XỬ LÝ DỮ LIỆU THIẾU, CHUẨN HÓA ĐỊA CHỈ, LOẠI TRÙNG LẶP ===")
+            print(f"  - Trùng lặp theo property_code: đã loại {removed_by_code} bản ghi")
+            print(f"  - Trùng lặp theo tổ hợp (title + street + posted_time): đã loại {removed_by_combo} bản ghi")
+            print(f"  - Khóa đã ghi nhận: {len(seen_codes):,} property_code, {len(seen_combos):,} tổ hợp ({dedup_store})")
+            seen_codes.close()
+            seen_combos.close()
+
+            # Ngưỡng outlier chính xác: lượt đọc lại chỉ giữ giá trị nằm trong bucket của percentile
+            exact = {col: (ExactQuantile(sketch, 0.01), ExactQuantile(sketch, 0.99)) for col, sketch in sketches.items()}
+            for path in spills:
+                part = pd.read_pickle(path)
+                for col, quantiles in exact.items():
+                    values = part[col]
+                    for quantile in quantiles:
+                        quantile.add(values[values > 0])
+            bounds = {col: (lower.result(), upper.result()) for col, (lower, upper) in exact.items()}
+
+            print("\n=== 5. XỬ LÝ OUTLIER & CHUYỂN ĐỔI THÊM ===")
+            report = {col: RunningStats() for col in numeric_cols + ['price_per_sqm']}
+            district_counts = pd.Series(dtype='int64')
+            outliers = {col: 0 for col in bounds}
+            samples = []
+            csv_output = output_path
+            for i, path in enumerate(spills):
+                self.df = pd.read_pickle(path)
+                for col, (lower, upper) in bounds.items():
+                    values = self.df[col]
+                    outliers[col] += int(((values > 0) & ((values < lower) | (values > upper))).sum())
+                with quiet():
+                    self.handle_outliers_and_transformations(bounds)
+                for col, stats in report.items():
+                    if col in self.df.columns:
+                        values = pd.to_numeric(self.df[col], errors='coerce')
+                        stats.add(values[values > 0] if col in ['bedrooms', 'bathrooms'] else values)
+                if 'district' in self.df.columns:
+                    district_counts = district_counts.add(
+                        self._with_missing_label(self.df['district']).value_counts(), fill_value=0)
+
+                df_to_save = self._csv_frame(self.df)
+                # utf-8-sig chỉ ghi BOM ở đầu file
+                df_to_save.to_csv(csv_output, index=False, header=i == 0, mode='w' if i == 0 else 'a',
+                                  encoding='utf-8-sig' if i == 0 else 'utf-8')
+                samples.append(self._type_sample(df_to_save))
+                df_to_save.to_pickle(path)
+            for col, (lower, upper) in bounds.items():
+                print(f"  - {col}: {outliers[col]} outliers dương (1%-99%: {lower:,.0f} - {upper:,.0f})")
+            print("✓ Hoàn thành xử lý outliers và tạo cột dẫn xuất")
+            print(f"\n💾 Đã lưu dữ liệu đã cleaning vào: {csv_output}")
+
+            # Kiểu cột SQL lấy từ mẫu của mọi chunk, rồi ghi nối tiếp từng chunk
+            sqlite_output = output_path.replace('.csv', '.db')
+            conn = sqlite3.connect(sqlite_output)
+            conn.execute("DROP TABLE IF EXISTS cleaned_danang_batdongsan")
+            conn.execute(pd.io.sql.get_schema(pd.concat(samples), 'cleaned_danang_batdongsan', con=conn))
+            final_count = 0
+            for path in spills:
+                part = pd.read_pickle(path)
+                final_count += len(part)
+                part.to_sql('cleaned_danang_batdongsan', conn, if_exists='append', index=False)
+            conn.commit()
+            self._save_state(conn, last_id, bounds, last_change)
+            conn.close()
+            print(f"💾 Đã lưu dữ liệu đã cleaning vào SQLite: {sqlite_output}")
+
+        self.df = None
+        self._print_chunked_report(final_count, report, district_counts)
+        return {"source_rows": total, "cleaned_rows": final_count,
+                "removed_by_code": removed_by_code, "removed_by_combo": removed_by_combo}
+
+    def _print_chunked_profile(self, total, null_counts, profile):
+        """Bản rút gọn của data_profiling từ thống kê cộng dồn (median/IQR xấp xỉ từ sketch)"""
+        print("\n--- 1.1. Thống kê cơ bản ---")
+        print(f"Tổng số bản ghi: {total:,}")
+        print(f"Số cột: {self.original_shape[1]}")
+
+        print("\n--- 1.2. Kiểm tra giá trị null ---")
+        null_summary = pd.DataFrame({
+            'Null Count': null_counts,
+            'Null Percentage': (null_counts / max(total, 1)) * 100
+        })
+        print(null_summary[null_summary['Null Count'] > 0])
+
+        print(f"\n--- 1.3. Phân tích cột số: {list(profile)} ---")
+        for col, stats in profile.items():
+            if stats.count:
+                print(f"\n{col.upper()}:")
+                print(f"  - Min: {stats.minimum:,.0f}")
+                print(f"  - Max: {stats.maximum:,.0f}")
+                print(f"  - Mean: {stats.mean:,.2f}")
+                print(f"  - Median (≈): {stats.quantile(0.5):,.2f}")
+                print(f"  - Std: {stats.std:,.2f}")
+                print(f"  - Giá trị = 0: {stats.zeros}")
+                print(f"  - Giá trị < 0: {stats.negatives}")
+
+        print("\n--- 1.4. Phân tích Outliers (IQR Method, ≈ theo sketch) ---")
+        for col, stats in profile.items():
+            if stats.count:
+                q1, q3 = stats.quantile(0.25), stats.quantile(0.75)
+                iqr = q3 - q1
+                lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+                outlier_count = stats.sketch.count_outside(lower_bound, upper_bound)
+                print(f"\n{col.upper()}:")
+                print(f"  - Q1: {q1:,.2f}")
+                print(f"  - Q3: {q3:,.2f}")
+                print(f"  - IQR: {iqr:,.2f}")
+                print(f"  - Lower bound: {lower_bound:,.2f}")
+                print(f"  - Upper bound: {upper_bound:,.2f}")
+                print(f"  - Outliers: {outlier_count} ({outlier_count / max(total, 1) * 100:.2f}%)")
+
+    def _print_chunked_report(self, final_count, report, district_counts):
+        """generate_cleaning_report từ thống kê cộng dồn của lượt 2 (median xấp xỉ từ sketch)"""
+        print("\n" + "="*60)
+        print("BÁO CÁO TỔNG HỢP DATA CLEANING & PREPROCESSING")
+        print("="*60)
+
+        print(f"\n📊 THỐNG KÊ TỔNG QUAN:")
+        print(f"  - Bản ghi ban đầu: {self.original_shape[0]:,}")
+        print(f"  - Bản ghi sau cleaning: {final_count:,}")
+        print(f"  - Bản ghi bị loại bỏ: {self.original_shape[0] - final_count:,}")
+        print(f"  - Tỷ lệ giữ lại: {(final_count / max(self.original_shape[0], 1)) * 100:.2f}%")
+
+        print(f"\n📈 THỐNG KÊ SAU CLEANING:")
+        for col in ['price', 'area', 'bedrooms', 'bathrooms']:
+            stats = report[col]
+            if stats.count:
+                print(f"  - {col}:")
+                print(f"    Min: {stats.minimum:,.0f}")
+                print(f"    Max: {stats.maximum:,.0f}")
+                print(f"    Mean: {stats.mean:,.2f}")
+                print(f"    Median (≈): {stats.quantile(0.5):,.2f}")
+                print(f"    Valid records: {stats.count:,}")
+                if col in ['bedrooms', 'bathrooms']:
+                    print(f"    Note: Đã loại bỏ các bản ghi {col}=0 khi tính thống kê")
+                print(f"    Invalid/NA records: {final_count - stats.count:,}")
+            else:
+                print(f"  - {col}: Không có giá trị số hợp lệ")
+
+        stats = report['price_per_sqm']
+        if stats.count:
+            print(f"\n💰 GIÁ TRUNG BÌNH:")
+            print(f"  - Giá/m² (mean): {stats.mean:,.0f} VND/m²")
+            print(f"  - Giá/m² (median ≈): {stats.quantile(0.5):,.0f} VND/m²")
+            print(f"  - Valid price/m² records: {stats.count:,}")
+        else:
+            print(f"\n💰 GIÁ TRUNG BÌNH: Không có dữ liệu hợp lệ")
+
+        print(f"\n🗺️ PHÂN BỐ THEO QUẬN:")
+        for district, count in district_counts.sort_values(ascending=False, kind='stable').head().items():
+            print(f"  - {district}: {int(count):,} bản ghi")
+
+        print("\n✅ HOÀN THÀNH DATA CLEANING & PREPROCESSING!")
+
+    # ------------------------------------------------------------------
+    # Chế độ incremental: chỉ xử lý bản ghi nguồn mới hoặc đã thay đổi từ lần chạy trước
+    # ------------------------------------------------------------------
+
+    def run_incremental_cleaning(self, output_path: str = None, on_duplicate: str = "skip") -> Dict[str, int]:
+        """Cleaning các bản ghi nguồn mới/đã thay đổi (change_seq > watermark) vào bảng đã cleaning
+
+        - Watermark (change_seq và id nguồn lớn nhất đã xử lý) và ngưỡng outlier 1%-99% được
+          lưu trong bảng cleaning_state của file SQLite đầu ra sau mỗi lần chạy; bản ghi mới
+          dùng lại ngưỡng của lần chạy đầy đủ gần nhất (chạy đầy đủ định kỳ để tính lại).
+        - Tin được crawler cập nhật tại chỗ (giá, ngày đăng; cùng id) có change_seq mới nên
+          được cleaning lại và thay thế dòng cùng id trong bảng đã cleaning.
+        - Trùng lặp theo thứ tự của remove_duplicates: property_code rồi tổ hợp
+          (title + street + posted_time), mỗi khóa kiểm tra trong lô mới rồi với bảng
+          đã cleaning qua index của khóa đó.
+        - on_duplicate="skip": bỏ bản ghi mới trùng bản ghi đã có (giữ bản ghi xuất hiện
+          trước, như chạy đầy đủ); "update": bản ghi mới thay thế bản ghi đã có.
+        Chưa có watermark, hoặc cột khác bảng đã cleaning → chạy đầy đủ. Thời gian tỉ lệ
+        với số bản ghi mới/đã thay đổi, không phải kích thước bảng.
+
+        Bảng nguồn chưa migrate (không có cột change_seq) chỉ theo dõi được id > watermark:
+        tin cập nhật tại chỗ giữ nguyên dòng cũ trong bảng đã cleaning cho tới lần chạy đầy đủ.
+        Tin cập nhật làm đổi khóa trùng lặp (title, street, posted_time) không trả lại các bản
+        ghi trước đó đã bị loại vì trùng khóa cũ; chúng chỉ quay lại ở lần chạy đầy đủ.
+        Ngoài ngưỡng outlier và thứ tự dòng, kết quả khi đó có thể khác một lần chạy đầy đủ.
+        """
+        if on_duplicate not in ("skip", "update"):
+            raise ValueError(f"Unknown on_duplicate: {on_duplicate}")
+        if output_path is None:
+            output_path = "cleaned_danang_real_estate.csv"
+        sqlite_output = output_path.replace('.csv', '.db')
+
+        print("=== CLEANING INCREMENTAL ===")
+        conn = sqlite3.connect(sqlite_output)
+        state = self._load_state(conn)
+        if state is None:
+            conn.close()
+            print("  - Chưa có watermark → chạy cleaning đầy đủ")
+            return self._full_rebuild(output_path)
+        last_id, bounds, last_change = state
+        column_types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(cleaned_danang_batdongsan)")}
+
+        source = sqlite3.connect(self.db_path)
+        source_columns = {row[1] for row in source.execute("PRAGMA table_info(danang_batdongsan)")}
+        if self.CHANGE_COLUMN in source_columns and last_change is None:
+            source.close()
+            conn.close()
+            print("  - Watermark chưa có change_seq → chạy cleaning đầy đủ")
+            return self._full_rebuild(output_path)
+        if self.CHANGE_COLUMN in source_columns:
+            query = f"SELECT * FROM danang_batdongsan WHERE {self.CHANGE_COLUMN} > ? ORDER BY id"
+            watermark = last_change
+        else:
+            print("  - Bảng nguồn chưa có change_seq: chỉ lấy id mới, bỏ sót tin cập nhật tại chỗ")
+            query, watermark = "SELECT * FROM danang_batdongsan WHERE id > ? ORDER BY id", last_id
+        self.df = pd.read_sql_query(query, source, params=(watermark,))
+        source.close()
+        new_last_change = self._pop_change_marker(self.df, last_change)
+        self.original_shape = self.df.shape
+        print(f"  - Watermark {'change_seq' if new_last_change is not None else 'id'} = {watermark}: "
+              f"{len(self.df)} bản ghi mới/đã thay đổi")
+        result = {"source_rows": len(self.df), "appended": 0, "skipped": 0, "replaced": 0, "refreshed": 0,
+                  "rebuilt": False}
+        if self.df.empty:
+            conn.close()
+            return result
+        new_last_id = max(last_id, int(self.df['id'].max()))
+        # Cột số toàn NULL trong lô mới được pandas đọc thành object
+        for col in self.df.columns:
+            if column_types.get(col) in ('INTEGER', 'REAL') and self.df[col].dtype == object:
+                self.df[col] = self.df[col].astype('float64')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.handle_missing_invalid_data()
+            self.normalize_address_fields()
+            self.handle_outliers_and_transformations(bounds)
+        df_to_save = self._conform_types(self._csv_frame(self.df), column_types)
+        if list(df_to_save.columns) != list(column_types):
+            conn.close()
+            print("  - Cột dữ liệu khác bảng đã cleaning → chạy cleaning đầy đủ")
+            return self._full_rebuild(output_path)
+
+        # Bản ghi nguồn cập nhật tại chỗ: dòng cùng id trong bảng đã cleaning là bản cũ của chính nó
+        stale = self._match_cleaned(conn, df_to_save[['id']])
+        refreshed = {rowid for rowids in stale.values() for rowid in rowids}
+        print(f"  - Cập nhật tại chỗ: {len(stale)} bản ghi thay dòng cùng id")
+
+        keep = pd.Series(True, index=df_to_save.index)
+        replaced = set()
+        for cols in self.DEDUP_KEYS.values():
+            candidates = df_to_save.loc[keep, cols]
+            duplicated = candidates.duplicated(keep='last' if on_duplicate == "update" else 'first')
+            keep[duplicated[duplicated].index] = False
+            matches = self._match_cleaned(conn, df_to_save.loc[keep, cols])
+            matches = {pos: [rowid for rowid in rowids if rowid not in refreshed] for pos, rowids in matches.items()}
+            matches = {pos: rowids for pos, rowids in matches.items() if rowids}
+            if on_duplicate == "skip":
+                # Bản cập nhật của một dòng đã có giữ chỗ của dòng đó, như khi chạy đầy đủ
+                keep[[pos for pos in matches if pos not in stale]] = False
+            else:
+                replaced.update(rowid for rowids in matches.values() for rowid in rowids)
+            print(f"  - Trùng lặp theo {' + '.join(cols)}: {int(duplicated.sum())} trong lô mới, "
+                  f"{len(matches)} với bảng đã cleaning")
+        new_rows = df_to_save[keep]
+
+        with conn:
+            conn.executemany("DELETE FROM cleaned_danang_batdongsan WHERE rowid = ?",
+                             [(rowid,) for rowid in sorted(replaced | refreshed)])
+            new_rows.to_sql('cleaned_danang_batdongsan', conn, if_exists='append', index=False)
+        self._save_state(conn, new_last_id, bounds, new_last_change)
+        print(f"💾 SQLite {sqlite_output}: thêm {len(new_rows)}, thay thế {len(replaced)}, cập nhật {len(refreshed)} "
+              f"bản ghi; watermark id = {new_last_id}, change_seq = {new_last_change}")
+
+        # CSV chỉ ghi nối được; khi có bản ghi bị thay thế/cập nhật thì xuất lại từ bảng
+        if replaced or refreshed or not os.path.exists(output_path):
+            self._export_table_csv(conn, output_path)
+            print(f"💾 Đã xuất lại {output_path} từ bảng đã cleaning")
+        else:
+            new_rows.to_csv(output_path, index=False, header=False, mode='a', encoding='utf-8')
+            print(f"💾 Đã ghi nối {len(new_rows)} bản ghi vào: {output_path}")
+        conn.close()
+
+        self.df = None
+        result.update(appended=len(new_rows), skipped=len(df_to_save) - len(new_rows), replaced=len(replaced),
+                      refreshed=len(refreshed))
+        return result
+
+    def _full_rebuild(self, output_path: str) -> Dict[str, int]:
+        self.run_complete_cleaning(output_path)
+        return {"source_rows": self.original_shape[0], "appended": len(self.df),
+                "skipped": self.original_shape[0] - len(self.df), "replaced": 0, "refreshed": 0, "rebuilt": True}
+
+    @staticmethod
+    def _conform_types(df, column_types: Dict[str, str]) -> pd.DataFrame:
+        """Ép cột số của lô mới về kiểu cột của bảng đã cleaning
+
+        pandas suy kiểu theo từng lô (cột INTEGER có NULL → float), nên không ép thì
+        CSV ghi "2.0" ở chỗ lần chạy đầy đủ ghi "2".
+        """
+        for col, sql_type in column_types.items():
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if sql_type == 'INTEGER' and values.dtype == 'float64' and (values % 1 == 0).all():
+                df[col] = values.astype('int64')
+            elif sql_type == 'REAL' and pd.api.types.is_integer_dtype(values.dtype):
+                df[col] = values.astype('float64')
+        return df
+
+    @staticmethod
+    def _match_cleaned(conn, keys: pd.DataFrame) -> Dict[int, List[int]]:
+        """Dòng nào của keys đã có trong bảng đã cleaning: {index của dòng: [rowid trong bảng]}
+
+        Khóa của lô mới được đưa vào bảng tạm rồi join với bảng đã cleaning, để SQLite
+        tra index khóa (DEDUP_KEYS) cho từng dòng mới thay vì quét cả bảng.
+        """
+        cols = list(keys.columns)
+        slots = [f"k{i}" for i in range(len(cols))]
+        conn.execute(f"CREATE TEMP TABLE incoming_keys (pos INTEGER PRIMARY KEY, {', '.join(slots)})")
+        try:
+            conn.executemany(
+                f"INSERT INTO incoming_keys VALUES (?{', ?' * len(cols)})",
+                ((pos, *values) for pos, values in zip(keys.index.tolist(), keys.itertuples(index=False, name=None)))
+            )
+            on = " AND ".join(f'c."{col}" = k.{slot}' for col, slot in zip(cols, slots))
+            matches = {}
+            for pos, rowid in conn.execute(f"SELECT k.pos, c.rowid FROM incoming_keys k "
+                                           f"JOIN cleaned_danang_batdongsan c ON {on}"):
+                matches.setdefault(pos, []).append(rowid)
+        finally:
+            conn.execute("DROP TABLE incoming_keys")
+        return matches
+
+    @staticmethod
+    def _export_table_csv(conn, output_path: str, chunk_size: int = 50000):
+        """Xuất bảng đã cleaning ra CSV theo từng chunk"""
+        query = "SELECT * FROM cleaned_danang_batdongsan ORDER BY rowid"
+        for i, part in enumerate(pd.read_sql_query(query, conn, chunksize=chunk_size)):
+            part.to_csv(output_path, index=False, header=i == 0, mode='w' if i == 0 else 'a',
+                        encoding='utf-8-sig' if i == 0 else 'utf-8')
+
 def main():
     """Main function to run the data cleaning process"""
+    parser = argparse.ArgumentParser(description="Data cleaning & preprocessing cho danang_batdongsan")
+    parser.add_argument("--db", default="../../../FinalReport/data.db")
+    parser.add_argument("--output", default=None, help="file CSV đầu ra (SQLite cùng tên .db)")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="đọc và xử lý theo chunk bao nhiêu dòng (0 = cả bảng trong bộ nhớ)")
+    parser.add_argument("--dedup-store", choices=["memory", "disk"], default="memory",
+                        help="nơi giữ hash khóa trùng lặp ở chế độ chunk")
+    parser.add_argument("--dedup", choices=["first", "engine"], default="first",
+                        help="first: giữ bản ghi đầu tiên theo khóa chính xác; engine: ListingDeduplicator "
+                             "(cụm trùng lặp/gần trùng, chỉ khi cleaning trong bộ nhớ)")
+    parser.add_argument("--exact-only", action="store_true", help="engine: không tìm bản ghi gần trùng")
+    parser.add_argument("--title-similarity", type=float, default=0.7, help="engine: độ giống tối thiểu của tiêu đề")
+    parser.add_argument("--price-tolerance", type=float, default=0.05, help="engine: chênh lệch giá tương đối tối đa")
+    parser.add_argument("--area-tolerance", type=float, default=0.05, help="engine: chênh lệch diện tích tương đối tối đa")
+    parser.add_argument("--max-distance-m", type=float, default=300.0, help="engine: khoảng cách tọa độ tối đa (m)")
+    parser.add_argument("--survivorship", choices=["complete", "first"], default="complete",
+                        help="engine: giữ bản ghi đầy đủ nhất hay xuất hiện trước trong mỗi cụm")
+    parser.add_argument("--dedup-report", default=None, help="engine: file CSV liệt kê các cụm trùng lặp")
+    parser.add_argument("--incremental", action="store_true",
+                        help="chỉ cleaning bản ghi nguồn mới hoặc đã cập nhật (change_seq lớn hơn watermark; "
+                             "bảng nguồn chưa migrate chỉ theo id, bỏ sót tin cập nhật tại chỗ) "
+                             "(mặc định: chạy lại toàn bộ)")
+    parser.add_argument("--on-duplicate", choices=["skip", "update"], default="skip",
+                        help="chế độ incremental: bỏ qua hay thay thế bản ghi đã có trong bảng đã cleaning")
+    args = parser.parse_args()
+    if args.dedup == "engine" and (args.chunk_size or args.incremental):
+        parser.error("--dedup engine cần toàn bộ bảng trong bộ nhớ (không dùng với --chunk-size/--incremental)")
+
     print("🏠 DATA CLEANING & PREPROCESSING - DANANG REAL ESTATE")
     print("="*60)
     
     # Initialize cleaner
-    cleaner = DanangRealEstateCleaner("../../../FinalReport/data.db")
+    deduplicator = None
+    if args.dedup == "engine":
+        deduplicator = ListingDeduplicator(
+            near_duplicates=not args.exact_only, title_similarity=args.title_similarity,
+            price_tolerance=args.price_tolerance, area_tolerance=args.area_tolerance,
+            max_distance_m=args.max_distance_m, survivorship=args.survivorship,
+        )
+    cleaner = DanangRealEstateCleaner(args.db, deduplicator)
     
     # Run complete cleaning process
-    cleaned_df = cleaner.run_complete_cleaning()
+    if args.incremental:
+        cleaned_df = cleaner.run_incremental_cleaning(args.output, args.on_duplicate)
+    elif args.chunk_size:
+        cleaned_df = cleaner.run_chunked_cleaning(args.chunk_size, args.dedup_store, args.output)
+    else:
+        cleaned_df = cleaner.run_complete_cleaning(args.output)
+        if args.dedup_report and cleaner.duplicate_report is not None:
+            cleaner.duplicate_report.to_csv(args.dedup_report, index=False, encoding='utf-8-sig')
+            print(f"💾 Đã lưu {len(cleaner.duplicate_report)} cụm trùng lặp vào: {args.dedup_report}")
     
     print("\n🎉 Quá trình Data Cleaning & Preprocessing đã hoàn thành!")
     return cleaned_df
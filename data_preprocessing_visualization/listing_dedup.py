@@ -0,0 +1,342 @@
+"""
+Duplicate and near-duplicate detection for danang_batdongsan listings.
+
+ListingDeduplicator groups rows into clusters of the same listing and keeps
+one survivor per cluster:
+
+- Exact keys (property_code; title + street + posted_time) are grouped by
+  64-bit row hashes through a hash table: no sort of the frame.
+- Near duplicates (a repost with an edited title and slightly different
+  price) are found by MinHash over character shingles of the normalized
+  title and LSH banding. Rows sharing a band bucket are paired with their
+  nearest neighbours by area inside the bucket, and a pair is merged only
+  if the estimated title similarity, the price, the area and (when both
+  rows have them) the coordinates are all close, and the street and the
+  district agree wherever both rows have one.
+- Clusters are the connected components of all merged pairs (a numpy
+  union-find), and the survivor of a cluster is its most complete row.
+
+Every step is linear in the number of rows apart from sorting the rows
+of multi-row buckets, so millions of rows take seconds, not hours.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from cleaning_sketches import row_hashes
+
+# Prime just above 2**32 for the MinHash permutations (a * x + b) % MINHASH_PRIME:
+# with x, a, b below 2**32 the product never overflows uint64
+MINHASH_PRIME = np.uint64(4294967311)
+EARTH_RADIUS_M = 6371000.0
+
+
+def components(n, left, right):
+    """Connected components of ``n`` nodes and edges (left[i], right[i]): label = smallest node of each component."""
+    labels = np.arange(n)
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    while len(left):
+        roots_left, roots_right = labels[left], labels[right]
+        pending = roots_left != roots_right
+        if not pending.any():
+            break
+        left, right = left[pending], right[pending]
+        roots_left, roots_right = roots_left[pending], roots_right[pending]
+        low = np.minimum(roots_left, roots_right)
+        # Hook each root under the smallest root it is joined with, then compress paths
+        np.minimum.at(labels, roots_left, low)
+        np.minimum.at(labels, roots_right, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def normalize_title(title):
+    """Lower case, punctuation collapsed to single spaces."""
+    return re.sub(r"[\W_]+", " ", title.lower()).strip()
+
+
+def shingle_hashes(titles, size):
+    """32-bit hashes of the character ``size``-grams of every title, and the index of each title's first one.
+
+    Titles are concatenated into one array of code points, so hashing is a
+    handful of numpy operations whatever the number of titles; a title
+    shorter than ``size`` gives one shingle padded with zeros.
+    """
+    lengths = np.fromiter((len(title) for title in titles), dtype=np.int64, count=len(titles))
+    text = "\0".join(titles)
+    points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    points = np.concatenate([points, np.zeros(size, dtype=np.uint64)])
+    starts = np.concatenate([[0], np.cumsum(lengths[:-1] + 1)]) if len(titles) else np.zeros(0, dtype=np.int64)
+    counts = np.maximum(lengths - size + 1, 1)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(titles) else np.zeros(0, dtype=np.int64)
+    positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+    hashes = np.zeros(len(positions), dtype=np.uint64)
+    for i in range(size):
+        hashes = hashes * np.uint64(1000003) + points[positions + i]
+    # splitmix64 finalizer, so neighbouring code points do not give neighbouring hashes
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return hashes & np.uint64(0xFFFFFFFF), offsets
+
+
+class ListingDeduplicator:
+    """Exact and near-duplicate clustering of listings with a survivorship rule.
+
+    title_similarity: minimum estimated Jaccard similarity of the titles'
+        character shingles for a near duplicate.
+    price_tolerance, area_tolerance: maximum relative difference
+        (|a - b| / max(a, b)); both rows need a positive value.
+    max_distance_m: maximum distance between the coordinates, checked only
+        when both rows have coordinates.
+    LOCATION_FIELDS (street, district) must be equal for a near duplicate
+        when both rows have a value, so the same template title on another
+        street is not merged; a repost without a street still can be.
+    num_perm, bands: MinHash size and LSH bands (num_perm / bands rows each);
+        more bands find less similar titles and produce more candidates.
+    window: neighbours (by area) each row is compared with in an LSH bucket.
+    survivorship: "complete" keeps the row with the most filled fields
+        (ties: the earliest row), "first" the earliest row.
+    """
+
+    EXACT_KEYS = [['property_code'], ['title', 'street', 'posted_time']]
+    # Fields a near duplicate must agree on when both rows have them
+    LOCATION_FIELDS = ['street', 'district']
+    # Fields that count toward completeness; numeric ones count when > 0
+    COMPLETENESS_FIELDS = ['title', 'street', 'ward', 'district', 'posted_time', 'property_code', 'coordinates',
+                           'price', 'area', 'bedrooms', 'bathrooms']
+
+    def __init__(self, near_duplicates=True, title_similarity=0.7, price_tolerance=0.05, area_tolerance=0.05,
+                 max_distance_m=300.0, num_perm=60, bands=20, shingle_size=4, window=3,
+                 survivorship="complete", seed=2024):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        if survivorship not in ("complete", "first"):
+            raise ValueError(f"Unknown survivorship rule: {survivorship}")
+        self.near_duplicates = near_duplicates
+        self.title_similarity = title_similarity
+        self.price_tolerance = price_tolerance
+        self.area_tolerance = area_tolerance
+        self.max_distance_m = max_distance_m
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.window = window
+        self.survivorship = survivorship
+        rng = np.random.RandomState(seed)
+        self.perm_a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self.perm_b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    # ------------------------------------------------------------------
+    # Exact keys
+    # ------------------------------------------------------------------
+
+    def exact_pairs(self, df):
+        """Edges joining every row to the first row with the same key; keys whose first column is missing never match."""
+        left, right = [], []
+        positions = np.arange(len(df))
+        for cols in self.EXACT_KEYS:
+            if not all(col in df.columns for col in cols):
+                continue
+            present = df[cols[0]].notna().to_numpy()
+            codes, uniques = pd.factorize(row_hashes(df[present], cols))
+            first = np.full(len(uniques), len(df))
+            np.minimum.at(first, codes, positions[present])
+            left.append(positions[present])
+            right.append(first[codes])
+        if not left:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        left, right = np.concatenate(left), np.concatenate(right)
+        joined = left != right
+        return left[joined], right[joined]
+
+    # ------------------------------------------------------------------
+    # Near duplicates
+    # ------------------------------------------------------------------
+
+    def signatures(self, titles, batch_size=100000):
+        """MinHash signature (num_perm uint32 values) of each title."""
+        signatures = np.empty((len(titles), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(titles), batch_size):
+            hashes, offsets = shingle_hashes(titles[start:start + batch_size], self.shingle_size)
+            for i in range(self.num_perm):
+                values = (self.perm_a[i] * hashes + self.perm_b[i]) % MINHASH_PRIME
+                signatures[start:start + len(offsets), i] = np.minimum.reduceat(values, offsets)
+        return signatures
+
+    def candidate_pairs(self, signatures, rows_title, order_key):
+        """Row pairs worth verifying: rows with the same title, or with titles sharing an LSH bucket.
+
+        Within each bucket rows are ordered by ``order_key`` and paired with
+        their next ``window`` rows (sorted neighbourhood), so a bucket of m
+        rows gives at most m * window pairs instead of m * (m - 1) / 2.
+        Identical titles fall in the same bucket of every band; they are
+        paired once, by title, and bands only order buckets holding
+        different titles.
+        """
+        has_title = np.flatnonzero(rows_title >= 0)
+        titles_of = rows_title[has_title]
+        rows_per_title = np.bincount(titles_of, minlength=len(signatures))
+        rows = has_title[rows_per_title[titles_of] > 1]
+        pairs = self._neighbour_pairs(rows, rows_title[rows], order_key)
+
+        rows_per_band = self.num_perm // self.bands
+        for band in range(self.bands):
+            keys = np.zeros(len(signatures), dtype=np.uint64)
+            for column in signatures[:, band * rows_per_band:(band + 1) * rows_per_band].T:
+                keys = keys * np.uint64(0x100000001B3) + column.astype(np.uint64)
+            buckets, _ = pd.factorize(keys)
+            titles_per_bucket = np.bincount(buckets)
+            shared = titles_per_bucket[buckets] > 1
+            rows = has_title[shared[titles_of]]
+            pairs += self._neighbour_pairs(rows, buckets[rows_title[rows]], order_key)
+
+        pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+        pairs.sort(axis=1)
+        return pairs[~pd.Index(pairs[:, 0] * (len(rows_title) + 1) + pairs[:, 1]).duplicated()]
+
+    def _neighbour_pairs(self, rows, buckets, order_key):
+        if not len(rows):
+            return []
+        order = np.lexsort((rows, order_key[rows], buckets))
+        rows, buckets = rows[order], buckets[order]
+        pairs = []
+        for step in range(1, self.window + 1):
+            same = buckets[:-step] == buckets[step:]
+            pairs.append(np.stack([rows[:-step][same], rows[step:][same]], axis=1).astype(np.int64))
+        return pairs
+
+    @staticmethod
+    def _close(a, b, tolerance):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (a > 0) & (b > 0) & (np.abs(a - b) <= tolerance * np.maximum(a, b))
+
+    def near_pairs(self, df):
+        """Edges between near-duplicate rows, as arrays (left, right)."""
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if not self.near_duplicates or 'title' not in df.columns or len(df) < 2:
+            return empty
+        titles = df['title'].astype(object).where(df['title'].notna(), None)
+        codes, uniques = pd.factorize(titles.to_numpy())
+        normalized = [normalize_title(title) for title in uniques]
+        signatures = self.signatures(normalized)
+        # Titles that normalize to nothing (only punctuation) are not compared
+        blank = np.fromiter((not title for title in normalized), dtype=bool, count=len(normalized))
+        rows_title = np.where((codes >= 0) & ~blank[np.maximum(codes, 0)], codes, -1)
+        if not (rows_title >= 0).any():
+            return empty
+
+        price = self._numeric(df, 'price')
+        area = self._numeric(df, 'area')
+        pairs = self.candidate_pairs(signatures, rows_title, np.nan_to_num(area, nan=-1.0))
+        left, right = pairs[:, 0], pairs[:, 1]
+
+        match = self._close(price[left], price[right], self.price_tolerance)
+        match &= self._close(area[left], area[right], self.area_tolerance)
+        if 'is_selling' in df.columns:
+            selling = df['is_selling'].to_numpy()
+            match &= selling[left] == selling[right]
+        if 'latitude' in df.columns and 'longitude' in df.columns:
+            lat, lon = self._numeric(df, 'latitude'), self._numeric(df, 'longitude')
+            known = ~(np.isnan(lat[left]) | np.isnan(lat[right]) | np.isnan(lon[left]) | np.isnan(lon[right]))
+            distance = self.distance_m(lat[left], lon[left], lat[right], lon[right])
+            match &= ~known | (distance <= self.max_distance_m)
+        for col in self.LOCATION_FIELDS:
+            if col in df.columns:
+                codes, _ = pd.factorize(df[col].to_numpy())
+                match &= (codes[left] < 0) | (codes[right] < 0) | (codes[left] == codes[right])
+        left, right = left[match], right[match]
+
+        similarity = (signatures[rows_title[left]] == signatures[rows_title[right]]).mean(axis=1)
+        similar = similarity >= self.title_similarity
+        return left[similar], right[similar]
+
+    @staticmethod
+    def _numeric(df, col):
+        if col not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    @staticmethod
+    def distance_m(lat1, lon1, lat2, lon2):
+        """Haversine distance in metres."""
+        lat1, lon1, lat2, lon2 = (np.radians(values) for values in (lat1, lon1, lat2, lon2))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    # ------------------------------------------------------------------
+    # Clusters and survivors
+    # ------------------------------------------------------------------
+
+    def completeness(self, df):
+        """Number of filled fields of each row (numeric fields count when > 0)."""
+        score = np.zeros(len(df), dtype=np.int64)
+        for col in self.COMPLETENESS_FIELDS:
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+                filled = pd.to_numeric(values, errors='coerce').fillna(0) > 0
+            else:
+                filled = values.notna()
+            score += filled.to_numpy(dtype=bool)
+        return score
+
+    def cluster(self, df):
+        """Cluster label of each row (position of its earliest row), and the labels from exact keys alone."""
+        exact_left, exact_right = self.exact_pairs(df)
+        exact_labels = components(len(df), exact_left, exact_right)
+        near_left, near_right = self.near_pairs(df)
+        if not len(near_left):
+            return exact_labels, exact_labels
+        labels = components(len(df), np.concatenate([exact_left, near_left]), np.concatenate([exact_right, near_right]))
+        return labels, exact_labels
+
+    def survivors(self, df, labels):
+        """Boolean mask of the row kept in each cluster."""
+        positions = np.arange(len(df))
+        if self.survivorship == "first":
+            return labels == positions
+        # Highest completeness, then earliest row: one np.maximum.at over the clusters, no sort
+        rank = self.completeness(df) * (len(df) + 1) + (len(df) - positions)
+        best = np.zeros(len(df), dtype=np.int64)
+        np.maximum.at(best, labels, rank)
+        return rank == best[labels]
+
+    def deduplicate(self, df):
+        """(rows kept, report of every multi-row cluster)."""
+        labels, exact_labels = self.cluster(df)
+        keep = self.survivors(df, labels)
+        return df[keep], self.cluster_report(df, labels, exact_labels, keep)
+
+    @staticmethod
+    def cluster_report(df, labels, exact_labels, keep):
+        """One row per cluster of several listings: size, survivor, members and how they were matched."""
+        sizes = np.bincount(labels, minlength=len(df))
+        multi = sizes[labels] > 1
+        ids = df['id'].to_numpy() if 'id' in df.columns else np.arange(len(df))
+        members = pd.DataFrame({'cluster': labels[multi], 'exact': exact_labels[multi], 'id': ids[multi],
+                                'kept': keep[multi]})
+        if members.empty:
+            return pd.DataFrame(columns=['cluster', 'size', 'survivor_id', 'member_ids', 'match'])
+        grouped = members.groupby('cluster', sort=False)
+        report = pd.DataFrame({
+            'size': grouped.size(),
+            'survivor_id': members[members['kept']].set_index('cluster')['id'],
+            'member_ids': grouped['id'].agg(lambda values: ",".join(map(str, values))),
+            # Several exact groups in one cluster: joined by a near-duplicate match
+            'match': (grouped['exact'].nunique() > 1).map({True: 'near', False: 'exact'}),
+        }).reset_index()
+        report = report.sort_values(['size', 'cluster'], ascending=[False, True], kind='stable').reset_index(drop=True)
+        report['cluster'] = np.arange(1, len(report) + 1)
+        return report
@@ -1,70 +1,105 @@
+import math
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
 from services.database import Database
+from services.schema import AREA_GROUP_SQL
+from services.shards import UnknownCityError, shard_paths
+
+# Per-shard queries of FederatedAnalysis; separate from services.executor's pool,
+# whose tasks may themselves fan out here
+_shard_executor = ThreadPoolExecutor(max_workers=Config.SHARD_QUERY_WORKERS, thread_name_prefix="shard")
+
+
+def summarize_rollup(rows, year=None, month=None, district=None):
+    """get_dashboard_snapshot's widgets from listing_rollup rows, which may come from several shards."""
+    year = int(year) if year else None
+    month = int(month) if month else None
+
+    demand = {1: {}, 0: {}}
+    area = {1: {}, 0: {}}
+    price = {1: {}, 0: {}}
+    districts = set()
+    for is_selling, row_year, row_month, location, row_district, area_group, listings, priced, price_sum in rows:
+        if is_selling not in demand:
+            continue
+        if row_district:
+            districts.add(row_district)
+        area_key = (location, area_group)
+        area[is_selling][area_key] = area[is_selling].get(area_key, 0) + listings
+        if (year and row_year != year) or (month and row_month != month):
+            continue
+        demand[is_selling][location] = demand[is_selling].get(location, 0) + listings
+        if district and row_district != district:
+            continue
+        totals = price[is_selling].setdefault((row_year, row_month), [0.0, 0])
+        totals[0] += price_sum
+        totals[1] += priced
+
+    snapshot = {"demand": {}, "area": {}, "price_per_sqm": {}, "districts": sorted(districts)}
+    for is_selling in (1, 0):
+        snapshot["demand"][is_selling] = sorted(
+            ((location or None, count) for location, count in demand[is_selling].items() if count > 0),
+            key=lambda row: row[1], reverse=True,
+        )
+        snapshot["area"][is_selling] = [
+            (location or None, area_group, count)
+            for (location, area_group), count in sorted(area[is_selling].items())
+            if count > 0
+        ]
+        snapshot["price_per_sqm"][is_selling] = sorted(
+            ((f"{row_month:02d}-{row_year:04d}", total / priced)
+             for (row_year, row_month), (total, priced) in price[is_selling].items() if priced > 0),
+            reverse=True,
+        )
+    return snapshot
+
 
 class Analysis:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db_name=Config.DB_NAME):
+        self.db = Database(db_name)
+
+    # The dashboard aggregates are answered from listing_rollup (see
+    # services/schema.py), which triggers keep in step with danang_batdongsan,
+    # so their cost depends on the number of groups rather than listings.
 
     def get_apartment_demand(self, is_selling, year=None, month=None):
         query = """
-        SELECT location, COUNT(*) as num_listings
-        FROM danang_batdongsan
+        SELECT NULLIF(location, '') AS location, SUM(listings) as num_listings
+        FROM listing_rollup
         WHERE is_selling = ?
         """
         params = [is_selling]
 
         if year:
-            query += " AND substr(posted_time, 7, 4) = ?"
-            params.append(str(year))
+            query += " AND posted_year = ?"
+            params.append(int(year))
 
         if month:
-            query += " AND substr(posted_time, 4, 2) = ?"
-            params.append(f"{int(month):02d}")
+            query += " AND posted_month = ?"
+            params.append(int(month))
 
-        query += " GROUP BY location ORDER BY num_listings DESC;"
+        query += " GROUP BY location HAVING num_listings > 0 ORDER BY num_listings DESC;"
         return self.db.query(query, tuple(params))
-    
-    def get_apartment_area_selling(self):
+
+    def _get_apartment_area(self, is_selling):
         query = """
-        SELECT 
-            location,
-            CASE 
-                WHEN area < 30 THEN '<30'
-                WHEN area BETWEEN 30 AND 50 THEN '30-50'
-                WHEN area BETWEEN 50 AND 100 THEN '50-100'
-                ELSE '>100'
-            END AS area_group,
-            COUNT(*) AS count
-        FROM danang_batdongsan
-        WHERE is_selling = 1
+        SELECT NULLIF(location, '') AS location, area_group, SUM(listings) AS count
+        FROM listing_rollup
+        WHERE is_selling = ?
         GROUP BY location, area_group
+        HAVING count > 0
         ORDER BY location, area_group;
         """
-        return self.db.query(query)
-    
+        return self.db.query(query, (is_selling,))
+
+    def get_apartment_area_selling(self):
+        return self._get_apartment_area(1)
+
     def get_apartment_area_renting(self):
-        query = """
-        SELECT 
-            location,
-            CASE 
-                WHEN area < 30 THEN '<30'
-                WHEN area BETWEEN 30 AND 50 THEN '30-50'
-                WHEN area BETWEEN 50 AND 100 THEN '50-100'
-                ELSE '>100'
-            END AS area_group,
-            COUNT(*) AS count
-        FROM danang_batdongsan
-        WHERE is_selling = 0
-        GROUP BY location, area_group
-        ORDER BY location, area_group;
-        """
-        return self.db.query(query)
+        return self._get_apartment_area(0)
 
-    def get_avg_price_data(self, is_selling, year=None, month=None, district=None):
-        query = """
-        SELECT substr(posted_time, 4, 7) AS month_year, AVG(price / area) AS avg_price_per_sqm
-        FROM danang_batdongsan
-        WHERE is_selling = ? AND area > 0
-        """
+    def _price_filters(self, query, is_selling, year=None, month=None, district=None):
         params = [is_selling]
 
         if district:
@@ -72,19 +107,89 @@ class Analysis:
             params.append(str(district))
 
         if year:
-            query += " AND substr(posted_time, 7, 4) = ?"
-            params.append(str(year))
+            query += " AND posted_year = ?"
+            params.append(int(year))
 
         if month:
-            query += " AND substr(posted_time, 4, 2) = ?"
-            params.append(f"{int(month):02d}")
+            query += " AND posted_month = ?"
+            params.append(int(month))
 
-        query += "GROUP BY month_year ORDER BY month_year DESC;"
-        print(query)
+        return query, params
+
+    def get_avg_price_data(self, is_selling, year=None, month=None, district=None):
+        query, params = self._price_filters("""
+        SELECT printf('%02d-%04d', posted_month, posted_year) AS month_year,
+               SUM(price_per_sqm_sum) / SUM(priced_listings) AS avg_price_per_sqm
+        FROM listing_rollup
+        WHERE is_selling = ?
+        """, is_selling, year, month, district)
+        query += " GROUP BY posted_year, posted_month HAVING SUM(priced_listings) > 0 ORDER BY month_year DESC;"
         return self.db.query(query, tuple(params))
 
+    def get_price_per_sqm_sums(self, is_selling, year=None, month=None, district=None):
+        """get_avg_price_data as additive (year, month, price/m2 sum, priced listings) partials."""
+        query, params = self._price_filters("""
+        SELECT posted_year, posted_month, SUM(price_per_sqm_sum), SUM(priced_listings)
+        FROM listing_rollup
+        WHERE is_selling = ?
+        """, is_selling, year, month, district)
+        query += " GROUP BY posted_year, posted_month;"
+        return self.db.query(query, tuple(params))
+
+    def get_dashboard_snapshot(self, year=None, month=None, district=None):
+        """Demand, area buckets and price/m2 series for sale and rent from one rollup read.
+
+        Each widget keeps the filters of its standalone method: demand uses
+        year/month, price/m2 uses year/month/district and the area buckets are
+        unfiltered. Values have the same row shapes as get_apartment_demand,
+        get_apartment_area_selling/renting and get_avg_price_data.
+        """
+        return summarize_rollup(self.get_rollup_rows(), year, month, district)
+
+    def get_rollup_rows(self):
+        return self.db.query("""
+        SELECT is_selling, posted_year, posted_month, location, district, area_group,
+               listings, priced_listings, price_per_sqm_sum
+        FROM listing_rollup
+        WHERE listings != 0;
+        """)
+
+    def check_rollup_consistency(self, rel_tol=1e-6):
+        """Compare listing_rollup with a fresh aggregation of danang_batdongsan.
+
+        Returns a list of (key, rollup_values, raw_values) for every group that
+        differs; an empty list means the rollup is consistent.
+        """
+        columns = "listings, priced_listings, price_per_sqm_sum, price_sum, area_sum"
+        keys = "is_selling, posted_year, posted_month, location, district, area_group"
+        rollup = {
+            row[:6]: row[6:]
+            for row in self.db.query(f"SELECT {keys}, {columns} FROM listing_rollup WHERE listings != 0")
+        }
+        raw = {
+            row[:6]: row[6:]
+            for row in self.db.query(f"""
+                SELECT is_selling, IFNULL(posted_year, 0), IFNULL(posted_month, 0),
+                       IFNULL(location, ''), IFNULL(district, ''), {AREA_GROUP_SQL.format(area='area')},
+                       COUNT(*), SUM(area > 0 AND price IS NOT NULL),
+                       IFNULL(SUM(IIF(area > 0, price / area, NULL)), 0),
+                       IFNULL(SUM(price), 0), IFNULL(SUM(area), 0)
+                FROM danang_batdongsan
+                GROUP BY 1, 2, 3, 4, 5, 6;
+            """)
+        }
+        mismatches = []
+        for key in rollup.keys() | raw.keys():
+            expected, actual = raw.get(key), rollup.get(key)
+            if expected is None or actual is None or not all(
+                math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-6) for a, b in zip(actual, expected)
+            ):
+                mismatches.append((key, actual, expected))
+        return mismatches
+
     def api_available_districts(self):
-        query = "SELECT DISTINCT district FROM danang_batdongsan WHERE district IS NOT NULL;"
+        # The rollup holds every district (NULL as '') in a few thousand rows, not one per listing
+        query = "SELECT DISTINCT district FROM listing_rollup WHERE listings != 0 AND district != '' ORDER BY district;"
         return self.db.query(query)
     
     def get_apartment_locations(self, is_selling, min_price=None, max_price=None, district=None, limit=500):
@@ -112,6 +217,197 @@ class Analysis:
 
         return self.db.query(query, tuple(params))
 
+    def _map_filters(self, is_selling, bbox, min_price=None, max_price=None, district=None):
+        south, west, north, east = bbox
+        query = """
+        FROM danang_batdongsan
+        WHERE is_selling = ? AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+        """
+        params = [is_selling, south, north, west, east]
+
+        if min_price is not None:
+            query += " AND price >= ?"
+            params.append(min_price)
+
+        if max_price is not None:
+            query += " AND price <= ?"
+            params.append(max_price)
+
+        if district:
+            query += " AND district = ?"
+            params.append(district)
+
+        return query, params
+
+    def count_apartments_in_bbox(self, is_selling, bbox, min_price=None, max_price=None, district=None):
+        query, params = self._map_filters(is_selling, bbox, min_price, max_price, district)
+        return self.db.query("SELECT COUNT(*) " + query, tuple(params))[0][0]
+
+    def get_apartments_in_bbox(self, is_selling, bbox, min_price=None, max_price=None, district=None, limit=None):
+        """Listings inside bbox = (south, west, north, east) as (latitude, longitude, price, area)."""
+        query, params = self._map_filters(is_selling, bbox, min_price, max_price, district)
+        query = "SELECT latitude, longitude, price, area " + query
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.db.query(query, tuple(params))
+
+    def get_apartment_clusters(self, is_selling, bbox, cell_size, min_price=None, max_price=None, district=None):
+        """Grid clusters of cell_size degrees inside bbox.
+
+        Rows are (latitude, longitude, count, avg_price, min_price, max_price, avg_area)
+        with the cluster positioned at the mean of its members.
+        """
+        query, params = self._map_filters(is_selling, bbox, min_price, max_price, district)
+        south, west = bbox[0], bbox[1]
+        query = """
+        SELECT AVG(latitude), AVG(longitude), COUNT(*), AVG(price), MIN(price), MAX(price), AVG(area)
+        """ + query + """
+        GROUP BY CAST((latitude - ?) / ? AS INTEGER), CAST((longitude - ?) / ? AS INTEGER);
+        """
+        params += [south, cell_size, west, cell_size]
+        return self.db.query(query, tuple(params))
+
+    def get_apartment_cluster_sums(self, is_selling, bbox, cell_size, min_price=None, max_price=None, district=None):
+        """get_apartment_clusters as additive partials keyed by grid cell, for merging across shards.
+
+        Rows are (cell_x, cell_y, latitude_sum, longitude_sum, count, price_sum, priced,
+        min_price, max_price, area_sum, with_area).
+        """
+        query, params = self._map_filters(is_selling, bbox, min_price, max_price, district)
+        south, west = bbox[0], bbox[1]
+        query = """
+        SELECT CAST((latitude - ?) / ? AS INTEGER) AS cell_x, CAST((longitude - ?) / ? AS INTEGER) AS cell_y,
+               SUM(latitude), SUM(longitude), COUNT(*), SUM(price), COUNT(price), MIN(price), MAX(price),
+               SUM(area), COUNT(area)
+        """ + query + """
+        GROUP BY cell_x, cell_y;
+        """
+        params = [south, cell_size, west, cell_size] + params
+        return self.db.query(query, tuple(params))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# How each get_apartment_cluster_sums value after the cell key combines across shards
+_CLUSTER_MERGE = (operator.add,) * 5 + (min, max) + (operator.add,) * 2
+
+
+class FederatedAnalysis:
+    """The Analysis queries over several city shards at once.
+
+    Each query runs on every shard in parallel, on that shard's own pooled
+    connection, and only additive partials (counts, sums, min/max) are
+    merged, so results equal those of one table holding every city. A large
+    shard only slows down its own part of the fan-out.
+    """
+
+    def __init__(self, shards=None, executor=None):
+        self.shards = shards if shards is not None else shard_paths()
+        self.executor = executor or _shard_executor
+
+    def _fan_out(self, method_name, *args, **kwargs):
+        def run(db_name):
+            with Analysis(db_name) as analysis:
+                return getattr(analysis, method_name)(*args, **kwargs)
+        futures = [self.executor.submit(run, db_name) for db_name in self.shards.values()]
+        return [future.result() for future in futures]
+
+    def get_apartment_demand(self, is_selling, year=None, month=None):
+        counts = {}
+        for rows in self._fan_out("get_apartment_demand", is_selling, year, month):
+            for location, count in rows:
+                counts[location] = counts.get(location, 0) + count
+        return sorted(counts.items(), key=lambda row: row[1], reverse=True)
+
+    def _get_apartment_area(self, is_selling):
+        counts = {}
+        for rows in self._fan_out("_get_apartment_area", is_selling):
+            for location, area_group, count in rows:
+                counts[(location, area_group)] = counts.get((location, area_group), 0) + count
+        # ORDER BY location, area_group with SQLite's NULLs first
+        return [(location, area_group, count) for (location, area_group), count
+                in sorted(counts.items(), key=lambda item: (item[0][0] is not None, item[0][0] or "", item[0][1]))]
+
+    def get_apartment_area_selling(self):
+        return self._get_apartment_area(1)
+
+    def get_apartment_area_renting(self):
+        return self._get_apartment_area(0)
+
+    def get_avg_price_data(self, is_selling, year=None, month=None, district=None):
+        totals = {}
+        for rows in self._fan_out("get_price_per_sqm_sums", is_selling, year, month, district):
+            for row_year, row_month, price_sum, priced in rows:
+                total = totals.setdefault((row_year, row_month), [0.0, 0])
+                total[0] += price_sum
+                total[1] += priced
+        return sorted(((f"{row_month:02d}-{row_year:04d}", price_sum / priced)
+                       for (row_year, row_month), (price_sum, priced) in totals.items() if priced > 0),
+                      reverse=True)
+
+    def get_dashboard_snapshot(self, year=None, month=None, district=None):
+        rows = [row for shard_rows in self._fan_out("get_rollup_rows") for row in shard_rows]
+        return summarize_rollup(rows, year, month, district)
+
+    def api_available_districts(self):
+        districts = {row for rows in self._fan_out("api_available_districts") for row in rows}
+        return sorted(districts)
+
+    def get_apartment_locations(self, is_selling, min_price=None, max_price=None, district=None, limit=500):
+        rows = self._fan_out("get_apartment_locations", is_selling, min_price, max_price, district, limit)
+        return [row for shard_rows in rows for row in shard_rows][:limit]
+
+    def count_apartments_in_bbox(self, is_selling, bbox, min_price=None, max_price=None, district=None):
+        return sum(self._fan_out("count_apartments_in_bbox", is_selling, bbox, min_price, max_price, district))
+
+    def get_apartments_in_bbox(self, is_selling, bbox, min_price=None, max_price=None, district=None, limit=None):
+        rows = self._fan_out("get_apartments_in_bbox", is_selling, bbox, min_price, max_price, district, limit)
+        rows = [row for shard_rows in rows for row in shard_rows]
+        return rows if limit is None else rows[:limit]
+
+    def get_apartment_clusters(self, is_selling, bbox, cell_size, min_price=None, max_price=None, district=None):
+        cells = {}
+        for rows in self._fan_out("get_apartment_cluster_sums", is_selling, bbox, cell_size, min_price, max_price, district):
+            for cell_x, cell_y, *values in rows:
+                cell = cells.get((cell_x, cell_y))
+                if cell is None:
+                    cells[(cell_x, cell_y)] = values
+                    continue
+                # SUM/MIN/MAX are NULL for a cell whose listings all lack a price or area
+                for index, (merge, value) in enumerate(zip(_CLUSTER_MERGE, values)):
+                    if value is not None:
+                        cell[index] = value if cell[index] is None else merge(cell[index], value)
+        return [
+            (lat_sum / count, lng_sum / count, count,
+             price_sum / priced if priced else None, min_p, max_p,
+             area_sum / with_area if with_area else None)
+            for lat_sum, lng_sum, count, price_sum, priced, min_p, max_p, area_sum, with_area in cells.values()
+        ]
 
     def close(self):
-        self.db.close()
\ No newline at end of file
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_analysis(city=None):
+    """Analysis of one city's shard (the default city when None), or FederatedAnalysis over all of them for "all"."""
+    shards = shard_paths()
+    if city == "all":
+        return FederatedAnalysis(shards)
+    city = city or Config.DEFAULT_CITY
+    if city not in shards:
+        raise UnknownCityError(city)
+    return Analysis(shards[city])
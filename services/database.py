@@ -1,15 +1,308 @@
 import sqlite3
+import threading
+import time
+from collections import deque
 from config import Config
 
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of read-only SQLite connections shared by all request threads.
+
+    Connections are opened lazily up to ``size``, tuned once with the PRAGMAs
+    from ``Config`` and then reused. Each connection keeps its own
+    prepared-statement cache (``cached_statements``), so repeated dashboard
+    queries skip the SQL compile step.
+    """
+
+    def __init__(self, db_name, size=Config.DB_POOL_SIZE, timeout=Config.DB_POOL_TIMEOUT):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = []
+        # Threads blocked in acquire(), served first-come first-served so a
+        # busy thread releasing and re-acquiring cannot starve them.
+        self._waiters = deque()
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            cached_statements=Config.DB_STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size={int(Config.DB_CACHE_SIZE)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def acquire(self):
+        start = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self._idle:
+                self._in_use += 1
+                self._acquired += 1
+                return self._idle.pop()
+            if self._created < self.size:
+                self._created += 1
+                self._in_use += 1
+                self._acquired += 1
+            else:
+                waiter = [threading.Event(), None]
+                self._waiters.append(waiter)
+
+        if waiter is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._acquired -= 1
+                raise
+
+        waiter[0].wait(self.timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            conn = waiter[1]
+            if conn is None:
+                self._waiters.remove(waiter)
+                self._timeouts += 1
+                raise PoolTimeoutError(
+                    f"No free connection to {self.db_name} after {self.timeout}s"
+                )
+            self._waits += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter[1] = conn
+                self._acquired += 1
+                waiter[0].set()
+                return
+            self._in_use -= 1
+            self._idle.append(conn)
+
+    def close(self):
+        """Close idle connections; connections still checked out are left alone."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "db_name": self.db_name,
+                "max_size": self.size,
+                "size": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._total_wait * 1000, 3),
+                "avg_wait_ms": round(self._total_wait * 1000 / self._waits, 3) if self._waits else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name=Config.DB_NAME):
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+class DataVersion:
+    """Monotonic change counter for a database file.
+
+    Backed by ``PRAGMA data_version`` on a dedicated connection, which changes
+    whenever any other connection or process commits to the file. Polling it
+    is cheap enough to do on every request.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._conn = sqlite3.connect(db_name, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._last = None
+        self._version = 0
+
+    def current(self):
+        with self._lock:
+            value = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if value != self._last:
+                self._last = value
+                self._version += 1
+            return self._version
+
+
+_versions = {}
+
+
+def data_version(db_name=Config.DB_NAME):
+    with _pools_lock:
+        version = _versions.get(db_name)
+        if version is None:
+            version = _versions[db_name] = DataVersion(db_name)
+    return version.current()
+
+
+def _column_chunk(values, dtype=None, interned=None):
+    """One fetched batch of a column (a tuple of Python values) as a numpy array.
+
+    sqlite3 builds a new str for every row, so a text column that repeats a
+    few values (district, ward, posted_time, ...) is stored once per row.
+    When at most half of a batch is distinct, its values are replaced by the
+    single copy kept in ``interned`` for the whole query.
+    """
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import infer_dtype
+
+    if dtype is not None:
+        return np.array(values, dtype=dtype)
+    chunk = np.array(values, dtype=object)
+    kind = infer_dtype(chunk, skipna=True)
+    if kind == "integer" and None not in values:
+        return chunk.astype(np.int64)
+    if kind in ("integer", "floating", "mixed-integer-float"):
+        # None becomes NaN
+        return np.array(values, dtype=np.float64)
+    if kind == "string" and interned is not None:
+        codes, uniques = pd.factorize(chunk)
+        if len(uniques) * 2 <= len(chunk):
+            shared = np.array([interned.setdefault(value, value) for value in uniques] + [None], dtype=object)
+            # code -1 (NULL) picks the trailing None
+            return shared[codes]
+    return chunk
+
+
+def _concat_chunks(chunks, dtype=None):
+    import numpy as np
+
+    if not chunks:
+        return np.array([], dtype=dtype or object)
+    if dtype is None:
+        typed = [chunk for chunk in chunks if chunk.dtype != object]
+        if typed and all(chunk.dtype != object or all(value is None for value in chunk) for chunk in chunks):
+            # Numeric column whose NULLs all fell into batches of their own
+            chunks = [chunk if chunk.dtype != object else np.full(len(chunk), np.nan) for chunk in chunks]
+    return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+
 class Database:
     def __init__(self, db_name=Config.DB_NAME):
         self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name)
+        self.pool = get_pool(self.db_name)
+        self.conn = self.pool.acquire()
         self.cursor = self.conn.cursor()
 
     def query(self, sql, params=()):
         self.cursor.execute(sql, params)
         return self.cursor.fetchall()
 
+    def iter_batches(self, sql, params=(), batch_size=Config.DB_FETCH_BATCH_SIZE):
+        """Run ``sql`` and yield its rows as lists of at most ``batch_size`` tuples.
+
+        Only one batch is alive at a time, so a full-table read costs one
+        batch of Python tuples instead of the whole result set. The query gets
+        a cursor of its own: other queries may run on this Database while the
+        generator is open, but it must be exhausted or closed before close().
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def iter_query(self, sql, params=(), batch_size=Config.DB_FETCH_BATCH_SIZE):
+        """Row-at-a-time view of iter_batches()."""
+        for rows in self.iter_batches(sql, params, batch_size):
+            yield from rows
+
+    def query_columns(self, sql, params=(), batch_size=Config.DB_FETCH_BATCH_SIZE, dtypes=None):
+        """Run ``sql`` and return its result as ``{column: numpy array}``, in select order.
+
+        Each fetched batch is transposed and converted to one array per
+        column before the next batch is read, so peak memory is the arrays
+        plus a single batch of tuples. Integer columns become int64 (float64
+        when they hold NULLs), REAL columns float64 with NaN for NULL, and
+        anything else an object array whose repeated strings share one
+        object; ``dtypes`` overrides that per column.
+        """
+        import numpy as np
+
+        dtypes = dtypes or {}
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            chunks = {name: [] for name in names}
+            interned = {name: {} for name in names}
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for name, values in zip(names, zip(*rows)):
+                    chunks[name].append(_column_chunk(values, dtypes.get(name), interned[name]))
+        finally:
+            cursor.close()
+        return {name: _concat_chunks(chunks[name], dtypes.get(name)) for name in names}
+
+    def query_frame(self, sql, params=(), batch_size=Config.DB_FETCH_BATCH_SIZE, dtypes=None):
+        """query_columns() as a pandas DataFrame, without a list-of-tuples intermediate."""
+        import pandas as pd
+
+        return pd.DataFrame(self.query_columns(sql, params, batch_size, dtypes), copy=False)
+
     def close(self):
-        self.conn.close()
+        if self.conn is None:
+            return
+        self.cursor.close()
+        self.pool.release(self.conn)
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
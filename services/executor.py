@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.analysis import open_analysis
+
+# Shared by all requests so the number of queries in flight stays bounded
+# no matter how many requests arrive at once.
+_executor = ThreadPoolExecutor(max_workers=Config.QUERY_WORKERS, thread_name_prefix="query")
+
+
+def analysis_task(method_name, *args, city=None, **kwargs):
+    """A callable running one Analysis method on its own pooled connection (see open_analysis for city)."""
+    def task():
+        with open_analysis(city) as analysis:
+            return getattr(analysis, method_name)(*args, **kwargs)
+    return task
+
+
+def run_concurrently(*tasks):
+    """Run independent tasks in parallel and return their results in order.
+
+    The first task runs on the calling thread, the rest on the shared query
+    executor; SQLite releases the GIL while a statement executes.
+    """
+    futures = [_executor.submit(task) for task in tasks[1:]]
+    results = [tasks[0]()] if tasks else []
+    return results + [future.result() for future in futures]
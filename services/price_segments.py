@@ -0,0 +1,135 @@
+import base64
+import io
+import threading
+from config import Config
+from services.database import Database, data_version
+
+LOCATIONS = [
+    "Quận Sơn Trà, Đà Nẵng",
+    "Quận Ngũ Hành Sơn, Đà Nẵng",
+    "Quận Hải Châu, Đà Nẵng",
+    "Quận Liên Chiểu, Đà Nẵng",
+    "Quận Thanh Khê, Đà Nẵng"
+]
+
+
+def get_data_from_db(db_name=Config.DB_NAME):
+    """Stream the listings batch by batch; the connection is returned to the pool once exhausted."""
+    with Database(db_name) as db:
+        yield from db.iter_query("SELECT id, title, price, location, is_selling FROM danang_batdongsan")
+
+
+def categorize_price(price, is_selling):
+    if is_selling:
+        if price < 3e9:
+            return "1-3 tỷ"
+        elif price < 5e9:
+            return "3-5 tỷ"
+        elif price < 10e9:
+            return "5-10 tỷ"
+        else:
+            return ">10 tỷ"
+    else:
+        if price < 5e6:
+            return "Dưới 5 triệu"
+        elif price < 10e6:
+            return "5-10 triệu"
+        elif price < 20e6:
+            return "10-20 triệu"
+        else:
+            return ">20 triệu"
+
+
+def empty_stats(is_selling):
+    if is_selling:
+        price_categories = ["1-3 tỷ", "3-5 tỷ", "5-10 tỷ", ">10 tỷ"]
+    else:
+        price_categories = ["Dưới 5 triệu", "5-10 triệu", "10-20 triệu", ">20 triệu"]
+
+    return {loc: {cat: 0 for cat in price_categories} for loc in LOCATIONS}
+
+
+def count_listings_by_price_and_location(data, is_selling):
+    stats = empty_stats(is_selling)
+
+    for _, _, price, location, selling in data:
+        if location in stats and selling == is_selling:
+            category = categorize_price(price, is_selling)
+            stats[location][category] += 1
+
+    return stats
+
+
+def analyze_data(data):
+    """Selling and renting stats in a single pass, so ``data`` may be a one-shot row stream."""
+    stats = {1: empty_stats(1), 0: empty_stats(0)}
+
+    for _, _, price, location, selling in data:
+        if selling in stats and location in stats[selling]:
+            stats[selling][location][categorize_price(price, selling)] += 1
+
+    return stats[1], stats[0]
+
+
+def plot_data(stats):
+    # Figure objects are independent of pyplot's global state, so plots can be
+    # rendered from the warm-up thread and from request threads alike.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    price_categories = list(next(iter(stats.values())).keys())
+
+    for location, values in stats.items():
+        y_values = [values[cat] for cat in price_categories]
+        ax.plot(price_categories, y_values, marker='o', label=location)
+
+    ax.set_xlabel("Mức giá")
+    ax.set_ylabel("Số lượng tin")
+    ax.set_title("Phân bố số lượng tin rao bán/cho thuê theo mức giá và khu vực")
+    ax.legend()
+    ax.grid()
+
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return base64.b64encode(img.getvalue()).decode('utf8')
+
+
+class PriceSegmentProvider:
+    """Lazily built, cached statistics and plots for the price-segment page.
+
+    Nothing is read or rendered until the first ``get()`` (or ``warm()``); the
+    result is reused until the database's data version changes.
+    """
+
+    def __init__(self, db_name=Config.DB_NAME):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = None
+
+    def _build(self):
+        selling_stats, renting_stats = analyze_data(get_data_from_db(self.db_name))
+        return {
+            "selling_stats": selling_stats,
+            "renting_stats": renting_stats,
+            "selling_plot": plot_data(selling_stats),
+            "renting_plot": plot_data(renting_stats),
+        }
+
+    def get(self):
+        version = data_version(self.db_name)
+        snapshot = self._snapshot
+        if snapshot is not None and self._version == version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._version != version:
+                self._snapshot = self._build()
+                self._version = version
+            return self._snapshot
+
+    def warm(self):
+        """Build the snapshot on a daemon thread so the first request finds it ready."""
+        thread = threading.Thread(target=self.get, name="price-segments-warmup", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,294 @@
+import sqlite3
+from config import Config
+
+
+def _add_calendar_columns(conn):
+    """Typed calendar columns derived from the dd-mm-YYYY ``posted_time`` text."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan)")}
+    for name, kind in (("posted_date", "TEXT"), ("posted_year", "INTEGER"), ("posted_month", "INTEGER")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE danang_batdongsan ADD COLUMN {name} {kind}")
+
+    conn.execute("""
+        UPDATE danang_batdongsan
+        SET posted_date = substr(posted_time, 7, 4) || '-' || substr(posted_time, 4, 2) || '-' || substr(posted_time, 1, 2),
+            posted_year = CAST(substr(posted_time, 7, 4) AS INTEGER),
+            posted_month = CAST(substr(posted_time, 4, 2) AS INTEGER)
+        WHERE posted_year IS NULL
+          AND posted_time GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]';
+    """)
+
+    # Q1 demand: WHERE is_selling [, year, month] GROUP BY location
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_batdongsan_calendar_location
+        ON danang_batdongsan (is_selling, posted_year, posted_month, location);
+    """)
+    # Q2 price/m2: WHERE is_selling [, year, month, district] AND area > 0, AVG(price / area)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_batdongsan_calendar_district
+        ON danang_batdongsan (is_selling, posted_year, posted_month, district, price, area);
+    """)
+
+
+AREA_GROUP_SQL = """
+    CASE
+        WHEN {area} < 30 THEN '<30'
+        WHEN {area} BETWEEN 30 AND 50 THEN '30-50'
+        WHEN {area} BETWEEN 50 AND 100 THEN '50-100'
+        ELSE '>100'
+    END
+"""
+
+
+def _rollup_delta_sql(row, sign):
+    """UPSERT adding (sign=+1) or removing (sign=-1) one listing from listing_rollup."""
+    return f"""
+        INSERT INTO listing_rollup (is_selling, posted_year, posted_month, location, district, area_group,
+                                    listings, priced_listings, price_per_sqm_sum, price_sum, area_sum)
+        VALUES ({row}.is_selling, IFNULL({row}.posted_year, 0), IFNULL({row}.posted_month, 0),
+                IFNULL({row}.location, ''), IFNULL({row}.district, ''), {AREA_GROUP_SQL.format(area=row + '.area')},
+                {sign}, {sign} * ({row}.area > 0 AND {row}.price IS NOT NULL),
+                {sign} * IIF({row}.area > 0, IFNULL({row}.price / {row}.area, 0), 0),
+                {sign} * IFNULL({row}.price, 0), {sign} * IFNULL({row}.area, 0))
+        ON CONFLICT (is_selling, posted_year, posted_month, location, district, area_group) DO UPDATE SET
+            listings = listings + excluded.listings,
+            priced_listings = priced_listings + excluded.priced_listings,
+            price_per_sqm_sum = price_per_sqm_sum + excluded.price_per_sqm_sum,
+            price_sum = price_sum + excluded.price_sum,
+            area_sum = area_sum + excluded.area_sum;
+    """
+
+
+def rebuild_rollups(conn):
+    """Recompute listing_rollup from danang_batdongsan in one grouped scan."""
+    conn.execute("DELETE FROM listing_rollup")
+    conn.execute(f"""
+        INSERT INTO listing_rollup
+        SELECT is_selling, IFNULL(posted_year, 0), IFNULL(posted_month, 0),
+               IFNULL(location, ''), IFNULL(district, ''), {AREA_GROUP_SQL.format(area='area')} AS area_group,
+               COUNT(*),
+               SUM(area > 0 AND price IS NOT NULL),
+               IFNULL(SUM(IIF(area > 0, price / area, NULL)), 0),
+               IFNULL(SUM(price), 0),
+               IFNULL(SUM(area), 0)
+        FROM danang_batdongsan
+        GROUP BY 1, 2, 3, 4, 5, 6;
+    """)
+
+
+def _create_listing_rollup(conn):
+    """Pre-aggregated counts and sums behind the dashboard queries, kept current by triggers."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS listing_rollup (
+            is_selling INTEGER NOT NULL,
+            posted_year INTEGER NOT NULL,
+            posted_month INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            district TEXT NOT NULL,
+            area_group TEXT NOT NULL,
+            listings INTEGER NOT NULL,
+            priced_listings INTEGER NOT NULL,
+            price_per_sqm_sum REAL NOT NULL,
+            price_sum REAL NOT NULL,
+            area_sum REAL NOT NULL,
+            PRIMARY KEY (is_selling, posted_year, posted_month, location, district, area_group)
+        ) WITHOUT ROWID;
+    """)
+    rebuild_rollups(conn)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_listing_rollup_insert AFTER INSERT ON danang_batdongsan
+        BEGIN {_rollup_delta_sql('NEW', 1)} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_listing_rollup_delete AFTER DELETE ON danang_batdongsan
+        BEGIN {_rollup_delta_sql('OLD', -1)} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_listing_rollup_update
+        AFTER UPDATE OF is_selling, posted_year, posted_month, location, district, area, price ON danang_batdongsan
+        BEGIN {_rollup_delta_sql('OLD', -1)} {_rollup_delta_sql('NEW', 1)} END;
+    """)
+
+
+def _decimal_sql(value):
+    """SQL condition: ``value`` is a plain decimal number ("-12.5"), as CAST would read it in full."""
+    value = f"trim({value})"
+    return (f"({value} GLOB '[0-9-]*' AND substr({value}, 2) NOT GLOB '*[^0-9.]*'"
+            f" AND {value} GLOB '*[0-9]*' AND {value} NOT GLOB '*.*.*')")
+
+
+LATITUDE_SQL = "substr(coordinates, 1, instr(coordinates, ',') - 1)"
+LONGITUDE_SQL = "substr(coordinates, instr(coordinates, ',') + 1)"
+# CAST turns any text into a number (0.0 for garbage), so only parse "lat,lng" pairs of two numbers
+VALID_COORDINATES_SQL = f"instr(coordinates, ',') > 0 AND {_decimal_sql(LATITUDE_SQL)} AND {_decimal_sql(LONGITUDE_SQL)}"
+
+
+def _add_coordinate_columns(conn):
+    """Numeric latitude/longitude parsed once from the "lat,lng" ``coordinates`` text."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan)")}
+    for name in ("latitude", "longitude"):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE danang_batdongsan ADD COLUMN {name} REAL")
+
+    conn.execute(f"""
+        UPDATE danang_batdongsan
+        SET latitude = CAST({LATITUDE_SQL} AS REAL),
+            longitude = CAST({LONGITUDE_SQL} AS REAL)
+        WHERE latitude IS NULL AND {VALID_COORDINATES_SQL};
+    """)
+    # Map viewport queries: WHERE is_selling AND latitude BETWEEN .. AND longitude BETWEEN ..
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_batdongsan_coordinates
+        ON danang_batdongsan (is_selling, latitude, longitude, price, area);
+    """)
+
+
+def archive_superseded_listings(conn):
+    """Move every copy of a listing but its first (lowest id) into danang_batdongsan_superseded.
+
+    Crawls before the upsert appended one row per run. The first row is the
+    one the cleaner's remove_duplicates keeps and the one later upserts
+    update, so it stays; the other copies are kept, not deleted, with the id
+    of the row that superseded them. Returns the number of rows moved.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS danang_batdongsan_superseded AS SELECT * FROM danang_batdongsan WHERE 0")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan_superseded)")}
+    for name, kind in (("superseded_by", "INTEGER"), ("moved_at", "TEXT")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE danang_batdongsan_superseded ADD COLUMN {name} {kind}")
+
+    conn.execute("""
+        CREATE TEMP TABLE superseded_listing AS
+        SELECT d.id, s.first_id
+        FROM danang_batdongsan d
+        JOIN (SELECT property_code, MIN(id) AS first_id FROM danang_batdongsan
+              WHERE property_code <> '' GROUP BY property_code HAVING COUNT(*) > 1) s USING (property_code)
+        WHERE d.id <> s.first_id;
+    """)
+    try:
+        conn.execute("""
+            INSERT INTO danang_batdongsan_superseded
+            SELECT d.*, s.first_id, datetime('now')
+            FROM danang_batdongsan d JOIN superseded_listing s USING (id);
+        """)
+        moved = conn.execute("DELETE FROM danang_batdongsan WHERE id IN (SELECT id FROM superseded_listing)").rowcount
+    finally:
+        conn.execute("DROP TABLE superseded_listing")
+    return moved
+
+
+def _add_listing_keys(conn):
+    """Unique property_code / detail_url so re-crawls upsert instead of appending duplicates."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan)")}
+    if "detail_url" not in columns:
+        conn.execute("ALTER TABLE danang_batdongsan ADD COLUMN detail_url TEXT")
+
+    # The unique index needs one row per listing; earlier copies go to danang_batdongsan_superseded
+    moved = archive_superseded_listings(conn)
+    if moved:
+        database = conn.execute("PRAGMA database_list").fetchone()[2]
+        print(f"{database}: đã chuyển {moved} bản sao cũ của tin đăng sang danang_batdongsan_superseded")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_batdongsan_property_code
+        ON danang_batdongsan (property_code) WHERE property_code <> '';
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_batdongsan_detail_url
+        ON danang_batdongsan (detail_url) WHERE detail_url IS NOT NULL;
+    """)
+
+
+def _clear_malformed_coordinates(conn):
+    """NULL the (0, 0) points the first version of _add_coordinate_columns cast from malformed text."""
+    conn.execute(f"""
+        UPDATE danang_batdongsan
+        SET latitude = NULL, longitude = NULL
+        WHERE (latitude IS NOT NULL OR longitude IS NOT NULL)
+          AND NOT (IFNULL({VALID_COORDINATES_SQL}, 0));
+    """)
+
+
+def _add_change_sequence(conn):
+    """``change_seq``, raised to a new maximum whenever a listing is inserted or updated in place.
+
+    The crawler's upsert reprices a listing under its old id, so "id > last
+    seen" misses those changes; readers such as the cleaner's incremental
+    mode keep the largest change_seq they have processed instead.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(danang_batdongsan)")}
+    if "change_seq" not in columns:
+        conn.execute("ALTER TABLE danang_batdongsan ADD COLUMN change_seq INTEGER")
+    conn.execute("UPDATE danang_batdongsan SET change_seq = id WHERE change_seq IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_batdongsan_change_seq ON danang_batdongsan (change_seq)")
+
+    # One writer at a time, so the sequence increases in commit order
+    bump = """
+        UPDATE danang_batdongsan
+        SET change_seq = (SELECT IFNULL(MAX(change_seq), 0) + 1 FROM danang_batdongsan)
+        WHERE id = NEW.id;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_batdongsan_change_seq_insert AFTER INSERT ON danang_batdongsan
+        BEGIN {bump} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_batdongsan_change_seq_update AFTER UPDATE ON danang_batdongsan
+        WHEN NEW.change_seq IS OLD.change_seq
+        BEGIN {bump} END;
+    """)
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    _add_calendar_columns,
+    _create_listing_rollup,
+    _add_coordinate_columns,
+    _add_listing_keys,
+    _clear_malformed_coordinates,
+    _add_change_sequence,
+]
+
+
+def schema_version(db_name=Config.DB_NAME):
+    """Migrations applied to ``db_name``; None while it has no danang_batdongsan table."""
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute("PRAGMA query_only=ON")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'danang_batdongsan'"
+        ).fetchone()
+        return conn.execute("PRAGMA user_version").fetchone()[0] if exists else None
+    finally:
+        conn.close()
+
+
+def migrate(db_name=Config.DB_NAME):
+    # The CLI and a crawler may migrate the same shard at once: each step
+    # re-reads user_version under a write lock, so none is applied twice.
+    # A shard that is already current is left without taking the lock.
+    version = schema_version(db_name)
+    if version is None or version >= len(MIGRATIONS):
+        return 0
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        applied = 0
+        while True:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    break
+                MIGRATIONS[version](conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+            applied += 1
+        if applied:
+            conn.execute("ANALYZE")
+        return applied
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    applied = migrate()
+    print(f"Đã áp dụng {applied} migration cho {Config.DB_NAME}")
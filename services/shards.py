@@ -0,0 +1,134 @@
+import argparse
+import os
+import sqlite3
+import time
+from config import Config
+from services.database import data_version
+from services.schema import MIGRATIONS, migrate, rebuild_rollups, schema_version
+
+# City slug (as in mogi.vn URLs and the crawler's --city) -> the name that ends
+# the crawled "Quận …, <city>" location strings
+CITY_NAMES = {
+    "da-nang": "Đà Nẵng",
+    "ha-noi": "Hà Nội",
+    "ho-chi-minh": "Hồ Chí Minh",
+    "hai-phong": "Hải Phòng",
+    "can-tho": "Cần Thơ",
+    "khanh-hoa": "Khánh Hòa",
+    "binh-duong": "Bình Dương",
+    "quang-nam": "Quảng Nam",
+}
+
+
+class UnknownCityError(KeyError):
+    pass
+
+
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+
+def shard_path(city):
+    if city == Config.DEFAULT_CITY:
+        return Config.DB_NAME
+    return os.path.join(Config.SHARD_DIR, f"{city}.db")
+
+
+# Shard files seen with every migration applied; a crawler's --city may add new ones at any time
+_current = set()
+
+
+def _shard_files():
+    shards = {Config.DEFAULT_CITY: Config.DB_NAME}
+    try:
+        names = sorted(os.listdir(Config.SHARD_DIR))
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if name.endswith(".db"):
+            shards.setdefault(name[:-3], os.path.join(Config.SHARD_DIR, name))
+    return shards
+
+
+def _ready(path):
+    """True once a shard has every migration applied; only reads its user_version, never migrates."""
+    if path in _current:
+        return True
+    if schema_version(path) != len(MIGRATIONS):
+        return False
+    _current.add(path)
+    return True
+
+
+def shard_paths():
+    """city -> database file for every shard on disk, the default city first.
+
+    Each shard is a complete database with the danang_batdongsan schema,
+    migrations and rollup of its own, so shards are written, migrated and
+    rebuilt independently. A shard that is not fully migrated yet (one a
+    crawler has only just created, or copied in from elsewhere) is left out
+    until the crawler or ``python -m services.shards migrate`` migrates it.
+    """
+    return {city: path for city, path in _shard_files().items()
+            if _ready(path) or city == Config.DEFAULT_CITY}
+
+
+def outdated_shards():
+    """city -> database file of every shard missing migrations (the default city also when it has no table)."""
+    outdated = {}
+    for city, path in _shard_files().items():
+        version = schema_version(path)
+        if version != len(MIGRATIONS) and (version is not None or city == Config.DEFAULT_CITY):
+            outdated[city] = path
+    return outdated
+
+
+def migrate_shards():
+    return {city: migrate(path) for city, path in _shard_files().items()}
+
+
+def shard_versions(cities=None):
+    """Data version of each shard, changing whenever any of them is written."""
+    return tuple((city, data_version(path)) for city, path in shard_paths().items()
+                 if cities is None or city in cities)
+
+
+def rebuild_shard(city):
+    """Recompute one shard's rollup and planner statistics.
+
+    Only that shard's file is locked while it runs: dashboards keep reading
+    every shard (WAL) and crawlers keep writing to the other ones.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(shard_path(city), timeout=30)
+    try:
+        with conn:
+            rebuild_rollups(conn)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the per-city listing databases")
+    parser.add_argument("command", choices=["list", "migrate", "rebuild"])
+    parser.add_argument("cities", nargs="*", help="cities to rebuild (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for city, applied in migrate_shards().items():
+            print(f"{city}: đã áp dụng {applied} migration")
+        return
+    for city, path in shard_paths().items():
+        if args.command == "rebuild" and (not args.cities or city in args.cities):
+            print(f"{city}: rebuild rollup {path} trong {rebuild_shard(city):.2f}s")
+        elif args.command == "list":
+            conn = sqlite3.connect(path)
+            count = conn.execute("SELECT COUNT(*) FROM danang_batdongsan").fetchone()[0]
+            conn.close()
+            print(f"{city}: {path}, {count} tin, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
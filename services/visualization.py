@@ -1,5 +1,4 @@
 from services.database import Database
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
@@ -9,7 +8,7 @@ class Visualization:
 
     def visualize_apartment_area_selling_data(self, selling_query):
         # Fetch data from database
-        df = pd.DataFrame(self.db.query(selling_query), columns=['location', 'area_group', 'count'])
+        df = self.db.query_frame(selling_query).set_axis(['location', 'area_group', 'count'], axis=1)
         df['location'] = df['location'].str[5:-9]
         df['type'] = 'Bán'
 
@@ -29,7 +28,7 @@ class Visualization:
 
     def visualize_apartment_area_renting_data(self, renting_query):
         # Fetch data from database
-        df = pd.DataFrame(self.db.query(renting_query), columns=['location', 'area_group', 'count'])
+        df = self.db.query_frame(renting_query).set_axis(['location', 'area_group', 'count'], axis=1)
         df['location'] = df['location'].str[5:-9]
         df['type'] = 'Cho thuê'
         
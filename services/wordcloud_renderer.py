@@ -0,0 +1,119 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from config import Config
+from services.analysis import Analysis
+from services.database import data_version
+
+
+class WordcloudRenderer:
+    """Rendered district word clouds, cached in memory and on disk.
+
+    Images are keyed by ``(is_selling, data version)`` in memory and by a hash
+    of the district frequencies on disk, so a restart or another process that
+    already rendered the same data only costs a file read. Concurrent requests
+    for the same image wait on one render instead of each drawing their own.
+    """
+
+    def __init__(self, db_name=Config.DB_NAME, cache_dir=Config.WORDCLOUD_CACHE_DIR):
+        self.db_name = db_name
+        self.cache_dir = cache_dir
+        self._images = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.renders = 0
+        self.disk_hits = 0
+
+    def _lock_for(self, is_selling):
+        with self._locks_guard:
+            return self._locks.setdefault(is_selling, threading.Lock())
+
+    def frequencies(self, is_selling):
+        analysis = Analysis(self.db_name)
+        try:
+            data = analysis.get_apartment_demand(is_selling=is_selling)
+        finally:
+            analysis.close()
+        return {(row[0]).replace("Quận ", "").replace(", Đà Nẵng", ""): row[1] for row in data}
+
+    def render(self, frequencies):
+        # WordCloud draws with PIL directly; going through to_image() avoids
+        # creating a matplotlib figure per request.
+        from wordcloud import WordCloud
+
+        wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(frequencies)
+        img_io = io.BytesIO()
+        wordcloud.to_image().save(img_io, format="PNG")
+        return img_io.getvalue()
+
+    def _load(self, is_selling):
+        frequencies = self.frequencies(is_selling)
+        digest = hashlib.sha1(
+            json.dumps(sorted(frequencies.items()), ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        path = os.path.join(self.cache_dir, f"wordcloud_{is_selling}_{digest}.png")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                self.disk_hits += 1
+                return digest, f.read()
+
+        png = self.render(frequencies)
+        self.renders += 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+        for stale in glob.glob(os.path.join(self.cache_dir, f"wordcloud_{is_selling}_*.png")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+        return digest, png
+
+    def get(self, is_selling):
+        """Return ``(etag, png_bytes)`` for the current data version."""
+        version = data_version(self.db_name)
+        cached = self._images.get(is_selling)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        with self._lock_for(is_selling):
+            cached = self._images.get(is_selling)
+            if cached is None or cached[0] != version:
+                digest, png = self._load(is_selling)
+                cached = self._images[is_selling] = (version, digest, png)
+            return cached[1], cached[2]
+
+    def prerender(self):
+        for is_selling in (1, 0):
+            self.get(is_selling)
+
+    def watch(self, interval=Config.WORDCLOUD_WATCH_INTERVAL):
+        """Re-render on a daemon thread whenever the data version moves."""
+        def loop():
+            last = None
+            while True:
+                version = data_version(self.db_name)
+                if version != last:
+                    try:
+                        self.prerender()
+                        last = version
+                    except Exception as e:
+                        print(f"Lỗi khi dựng trước wordcloud: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="wordcloud-prerender", daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    # Chạy sau mỗi lần crawl để ảnh được dựng sẵn trên đĩa
+    renderer = WordcloudRenderer()
+    renderer.prerender()
+    print(f"Đã dựng {renderer.renders} wordcloud vào {renderer.cache_dir}")
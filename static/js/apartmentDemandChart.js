@@ -4,23 +4,13 @@ async function fetchData() {
     const year = document.getElementById("yearSelect").value;
     const month = document.getElementById("monthSelect").value;
 
-    let url = "/api/apartment-demand";
-    let params = [];
-    
-    if (year) params.push(`year=${year}`);
-    if (month) params.push(`month=${month}`);
-    
-    if (params.length > 0) {
-        url += "?" + params.join("&");
-    }
-
-    const response = await fetch(url);
-    const data = await response.json();
+    const dashboard = await fetchDashboard({ year, month });
 
-    if (data.error) {
-        alert(data.error);
+    if (dashboard.error) {
+        alert(dashboard.error);
         return;
     }
+    const data = dashboard.demand;
 
     const labels = data.sale.map(item => item.district);
     const valuesSale = data.sale.map(item => item.count);
@@ -2,8 +2,7 @@ let chartPricePerSqm = null;
 let currentMode = "sale"; // Default mode
 
 async function fetchDistricts() {
-    const response = await fetch('/api/available-districts');
-    const data = await response.json();
+    const data = await fetchDashboard();
 
     const districtSelect = document.getElementById("districtSelect");
     districtSelect.innerHTML = `<option value="">Tất cả Quận</option>`;
@@ -19,21 +18,9 @@ async function fetchPricePerSqmData() {
     const year = document.getElementById("yearSelect").value;
     const district = document.getElementById("districtSelect").value;
 
-    let url = currentMode === "sale" ? "/api/average-sale-price-per-sqm" : "/api/average-rent-price-per-sqm";
-    let params = [];
-
-    if (year) params.push(`year=${year}`);
-    if (district) params.push(`district=${encodeURIComponent(district)}`);
-
-    if (params.length > 0) {
-        url += "?" + params.join("&");
-    }
-
-    const response = await fetch(url);
-    const data = await response.json();
-
-    const key = currentMode === "sale" ? "average_price_data_sale" : "average_price_data_rent";
-    const fetchedData = data[key];
+    // Sale and rent series come in the same snapshot, so switching mode needs no new request
+    const data = await fetchDashboard({ year, district });
+    const fetchedData = data.price_per_sqm[currentMode];
 
     if (!fetchedData || fetchedData.length === 0) {
         alert("Không có dữ liệu.");
@@ -1,7 +1,5 @@
 async function fetchData() {
-    const response = await fetch("/api/apartment-area-renting")
-    const data = await response.json();
-    console.log(data)
+    const data = (await fetchDashboard()).area.renting;
     const districts = Object.keys(data);
     const areaGroups = ["<30", "30-50", "50-100", ">100"];
     
@@ -1,9 +1,5 @@
 async function fetchData() {
-    const response = await fetch("/api/apartment-area-selling", {
-        headers: { "Accept": "application/json" }  // ✅ Ensure JSON response
-    });
-    const data = await response.json();
-    console.log(data)
+    const data = (await fetchDashboard()).area.selling;
     const districts = Object.keys(data);
     const areaGroups = ["<30", "30-50", "50-100", ">100"];
     
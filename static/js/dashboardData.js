@@ -0,0 +1,18 @@
+// Shared loader for /api/dashboard: every chart on a page asks for the same
+// snapshot, so one request per filter combination serves them all.
+const dashboardRequests = {};
+
+function fetchDashboard(filters = {}) {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+    });
+    const query = params.toString();
+
+    if (!dashboardRequests[query]) {
+        dashboardRequests[query] = fetch("/api/dashboard" + (query ? "?" + query : ""), {
+            headers: { "Accept": "application/json" }
+        }).then(response => response.json());
+    }
+    return dashboardRequests[query];
+}
@@ -6,24 +6,57 @@ L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
     attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
 }).addTo(map);
 
+// Markers of the current viewport, replaced on every pan/zoom
+const markersLayer = L.layerGroup().addTo(map);
+let latestRequest = 0;
+
+function clusterIcon(count) {
+    const size = count < 10 ? 30 : count < 100 ? 38 : 46;
+    return L.divIcon({
+        html: `<div style="width:${size}px;height:${size}px;line-height:${size}px;border-radius:50%;background:rgba(54, 162, 235, 0.8);color:#fff;text-align:center;font-weight:bold;">${count}</div>`,
+        className: '',
+        iconSize: [size, size]
+    });
+}
+
 async function fetchData() {
-    const response = await fetch("/api/apartment-map", {
+    const bounds = map.getBounds();
+    const params = new URLSearchParams({
+        bbox: [bounds.getSouth(), bounds.getWest(), bounds.getNorth(), bounds.getEast()].map(v => v.toFixed(5)).join(","),
+        zoom: map.getZoom(),
+        is_selling: 1
+    });
+
+    const requestId = ++latestRequest;
+    const response = await fetch(`/api/apartment-map?${params}`, {
         headers: { "Accept": "application/json" }  // ✅ Ensure JSON response
     });
     const data = await response.json();
-    console.log(data)
-    // Filter data for Da Nang city
-    // Da Nang coordinates approximately: 15.9750° N to 16.1250° N, 108.1500° E to 108.2500° E
-    const daNangData = data.filter(item => 
-        item.latitude >= 15.9750 && item.latitude <= 16.1250 &&
-        item.longitude >= 108.1500 && item.longitude <= 108.2500
-    );
-
-    // Add Markers to Map
-    daNangData.forEach(location => {
-        const marker = L.marker([location.latitude, location.longitude]).addTo(map);
-        marker.bindPopup(`<b>Area:</b> ${location.area} m²<br><b>Price:</b> ${location.price.toLocaleString()} VND`);
+    if (requestId !== latestRequest) return;  // a newer viewport is already loading
+
+    if (data.error) {
+        alert(data.error);
+        return;
+    }
+
+    markersLayer.clearLayers();
+    data.items.forEach(item => {
+        if (data.mode === "points" || item.count === 1) {
+            const price = data.mode === "points" ? item.price : item.avg_price;
+            const area = data.mode === "points" ? item.area : item.avg_area;
+            L.marker([item.latitude, item.longitude])
+                .bindPopup(`<b>Area:</b> ${area} m²<br><b>Price:</b> ${price.toLocaleString()} VND`)
+                .addTo(markersLayer);
+        } else {
+            L.marker([item.latitude, item.longitude], { icon: clusterIcon(item.count) })
+                .bindPopup(`<b>${item.count}</b> tin<br><b>Giá TB:</b> ${Math.round(item.avg_price).toLocaleString()} VND<br>`
+                    + `<b>Giá:</b> ${item.min_price.toLocaleString()} - ${item.max_price.toLocaleString()} VND`)
+                .on('dblclick', () => map.setView([item.latitude, item.longitude], map.getZoom() + 2))
+                .addTo(markersLayer);
+        }
     });
 }
 
-fetchData()
\ No newline at end of file
+map.on('moveend', fetchData);
+
+fetchData()